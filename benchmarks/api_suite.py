@@ -0,0 +1,330 @@
+"""GraphQL API 벤치마크 스위트: 데이터 규모별 주요 operation 의 지연 시간, 쿼리 수, 메모리
+
+    python benchmarks/api_suite.py --books 1000 100000 1000000 --output results.json
+    python benchmarks/api_suite.py --books 1000 --baseline benchmarks/baseline.json
+    python benchmarks/api_suite.py --books 1000 --baseline benchmarks/baseline.json --save-baseline
+
+`--books` 규모마다 팩토리(LibraryFactory/AuthorFactory/BookFactory)로 만든 값을 bulk_create 로 한 번에 넣은 데이터셋을
+쓴다. 데이터셋은 이름 앞에 `Bench<규모>` 를 붙여 구분하고, 이미 있으면 다시 만들지 않는다.
+
+시나리오마다 `--iterations` 번 실행해 p50/p99 지연 시간(ms)과 operation 당 SQL 쿼리 수를 재고, tracemalloc 을 켠
+별도 실행에서 operation 당 최대 Python 메모리(KiB)를 잰다. 결과는 JSON 으로 남기고, `--baseline` 을 주면 기준 결과와
+비교해 `--tolerance` 를 넘게 나빠진 지표가 있으면 종료 코드 1 로 끝난다. 쿼리 수는 하나라도 늘면 회귀로 본다.
+
+- node: `node(id)` 로 책 한 권 조회
+- library_books: `node(id)` 로 도서관과 books 한 페이지(작가 포함) 조회
+- library_books_deep: 같은 조회를 마지막 근처 페이지(`after` 커서)로. keyset 이라 첫 페이지와 비슷해야 한다
+- books_filtered: 최상위 `books(filters: {title: {startsWith}})`
+- update_book / delete_book: 단건 mutation
+- library_permission: 사서 권한 검사가 있는 `library(nodeId)`
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "play_with_gql.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connections  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from strawberry.relay.utils import to_base64  # noqa: E402
+
+from play_with_gql.api.libraries.connections import KEYSET_CURSOR_PREFIX  # noqa: E402
+from play_with_gql.api.libraries.loaders import ModelLoaders  # noqa: E402
+from play_with_gql.libraries.factories import AuthorFactory, BookFactory, LibraryFactory  # noqa: E402
+from play_with_gql.libraries.models import Author, Book, Librarian, Library  # noqa: E402
+from play_with_gql.libraries.signals import refresh_book_counts  # noqa: E402
+from play_with_gql.schema import schema  # noqa: E402
+from play_with_gql.users.models import User  # noqa: E402
+
+BOOKS_PER_LIBRARY = 1_000
+BOOKS_PER_AUTHOR = 50
+# 책 제목은 팩토리로 만든 이 개수의 제목을 돌려 쓴다. 행마다 Faker 를 부르면 100만 권에서 수 분이 걸린다
+TITLE_POOL_SIZE = 1_000
+SEED_BATCH_SIZE = 10_000
+
+NODE_QUERY = """
+query Node($id: GlobalID!) {
+  node(id: $id) { ... on BookNode { title publishedDate } }
+}
+"""
+LIBRARY_BOOKS_QUERY = """
+query LibraryBooks($id: GlobalID!, $after: String) {
+  node(id: $id) {
+    ... on LibraryNode {
+      name
+      books(first: 20, after: $after) {
+        totalCount
+        pageInfo { hasNextPage endCursor }
+        edges { node { title author { name } } }
+      }
+    }
+  }
+}
+"""
+BOOKS_FILTERED_QUERY = """
+query BooksFiltered($prefix: String!) {
+  books(filters: {title: {startsWith: $prefix}}) { title }
+}
+"""
+UPDATE_BOOK_MUTATION = """
+mutation UpdateBook($id: GlobalID!, $title: String) {
+  updateBook(id: $id, title: $title) { id title }
+}
+"""
+DELETE_BOOK_MUTATION = """
+mutation DeleteBook($id: GlobalID!) {
+  deleteBook(id: $id)
+}
+"""
+LIBRARY_PERMISSION_QUERY = """
+query Library($id: String!) {
+  library(nodeId: $id) { name }
+}
+"""
+
+# 지금 재고 있는 operation 이 실행한 SQL 수. sync_to_async 스레드의 커넥션에서도 센다
+_query_count: ContextVar[list[int] | None] = ContextVar("benchmark_query_count", default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs) -> None:
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+connection_created.connect(install_query_counter)
+for _connection in connections.all(initialized_only=True):
+    install_query_counter(_connection)
+
+
+def global_id(instance: Any) -> str:
+    return base64.b64encode(f"{type(instance).__name__}Node:{instance.pk}".encode()).decode()
+
+
+@dataclass
+class Dataset:
+    size: int
+    prefix: str
+    libraries: list[Library]
+    authors: list[Author]
+    user: User
+
+
+def seed(size: int) -> Dataset:
+    """`size` 권 규모의 데이터셋을 만들거나 이미 만든 것을 돌려준다"""
+    prefix = f"Bench{size}"
+    libraries = list(Library.objects.filter(name__startswith=f"{prefix} ").order_by("pk"))
+    if not libraries:
+        libraries = LibraryFactory.build_batch(max(1, size // BOOKS_PER_LIBRARY))
+        authors = AuthorFactory.build_batch(max(1, size // BOOKS_PER_AUTHOR))
+        for instance in [*libraries, *authors]:
+            instance.name = f"{prefix} {instance.name}"
+        libraries = Library.objects.bulk_create(libraries, batch_size=SEED_BATCH_SIZE)
+        authors = Author.objects.bulk_create(authors, batch_size=SEED_BATCH_SIZE)
+
+        titles = [book.title for book in BookFactory.build_batch(TITLE_POOL_SIZE)]
+        for start in range(0, size, SEED_BATCH_SIZE):
+            Book.objects.bulk_create(
+                Book(
+                    title=f"{prefix} {titles[i % TITLE_POOL_SIZE]}",
+                    library=libraries[i % len(libraries)],
+                    author=authors[i % len(authors)],
+                    published_date=date(2024, 1, 1),
+                )
+                for i in range(start, min(start + SEED_BATCH_SIZE, size))
+            )
+        refresh_book_counts()
+
+    authors = list(Author.objects.filter(name__startswith=f"{prefix} ").order_by("pk")[:1])
+    user, _ = User.objects.get_or_create(username=f"bench-librarian-{size}")
+    Librarian.objects.get_or_create(user=user, library=libraries[0], defaults={"name": user.username})
+    return Dataset(size=size, prefix=prefix, libraries=libraries, authors=authors, user=user)
+
+
+def create_books(dataset: Dataset, count: int) -> list[Book]:
+    """mutation 시나리오가 바꾸거나 지울 책. 데이터셋 크기가 실행마다 달라지지 않게 따로 만든다"""
+    books = Book.objects.bulk_create(
+        Book(
+            title=f"{dataset.prefix} Mutation {i}",
+            library=dataset.libraries[0],
+            author=dataset.authors[0],
+            published_date=date(2024, 1, 1),
+        )
+        for i in range(count)
+    )
+    refresh_book_counts()
+    return books
+
+
+@dataclass
+class Scenario:
+    query: str
+    # 반복 i 에 쓸 변수
+    variables: Callable[[int], dict[str, Any]]
+    authenticated: bool = False
+
+
+def prepare_scenarios(dataset: Dataset, iterations: int) -> dict[str, Scenario]:
+    library = dataset.libraries[0]
+    sample_books = list(Book.objects.filter(library=library).order_by("pk")[:iterations])
+    deep_cursor = to_base64(
+        KEYSET_CURSOR_PREFIX, json.dumps([Book.objects.filter(library=library).order_by("-pk").values("pk")[20]["pk"]])
+    )
+    update_books = create_books(dataset, iterations)
+    delete_books = create_books(dataset, iterations)
+    return {
+        "node": Scenario(NODE_QUERY, lambda i: {"id": global_id(sample_books[i % len(sample_books)])}),
+        "library_books": Scenario(LIBRARY_BOOKS_QUERY, lambda i: {"id": global_id(library)}),
+        "library_books_deep": Scenario(
+            LIBRARY_BOOKS_QUERY, lambda i: {"id": global_id(library), "after": deep_cursor}
+        ),
+        "books_filtered": Scenario(BOOKS_FILTERED_QUERY, lambda i: {"prefix": f"{dataset.prefix} A"}),
+        "update_book": Scenario(
+            UPDATE_BOOK_MUTATION, lambda i: {"id": global_id(update_books[i]), "title": f"{dataset.prefix} Updated"}
+        ),
+        "delete_book": Scenario(DELETE_BOOK_MUTATION, lambda i: {"id": global_id(delete_books[i])}),
+        "library_permission": Scenario(
+            LIBRARY_PERMISSION_QUERY, lambda i: {"id": global_id(library)}, authenticated=True
+        ),
+    }
+
+
+async def execute(scenario: Scenario, i: int, user: User) -> int:
+    """operation 을 한 번 실행하고 실행한 SQL 수를 돌려준다"""
+    context = SimpleNamespace(loaders=ModelLoaders())
+    if scenario.authenticated:
+        context.user = user
+    counter = [0]
+    token = _query_count.set(counter)
+    try:
+        result = await schema.execute(scenario.query, variable_values=scenario.variables(i), context_value=context)
+    finally:
+        _query_count.reset(token)
+    assert result.errors is None, result.errors
+    return counter[0]
+
+
+async def measure(scenario: Scenario, iterations: int, memory_iterations: int, user: User) -> dict[str, float]:
+    # 문서 캐시·커넥션 준비 비용이 측정에 섞이지 않도록 한 번 먼저 실행한다.
+    # 반복마다 변수 번호가 달라 mutation 은 매번 다른 책을 바꾸거나 지운다
+    await execute(scenario, iterations - 1, user)
+
+    latencies, query_counts = [], []
+    for i in range(iterations - 1):
+        started = time.perf_counter()
+        query_counts.append(await execute(scenario, i, user))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    peak = 0
+    try:
+        for i in range(iterations, iterations + memory_iterations):
+            tracemalloc.reset_peak()
+            await execute(scenario, i, user)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50_ms": round(percentiles[49], 3),
+        "p99_ms": round(percentiles[98], 3),
+        "queries": max(query_counts),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """`tolerance` 비율을 넘게 나빠진 지표를 돌려준다. 쿼리 수는 하나라도 늘면 회귀다"""
+    regressions = []
+    for size, scenarios in results.items():
+        for name, metrics in scenarios.items():
+            for metric, value in metrics.items():
+                expected = baseline.get(size, {}).get(name, {}).get(metric)
+                if expected is None:
+                    continue
+                limit = expected if metric == "queries" else expected * (1 + tolerance)
+                if value > limit:
+                    regressions.append(f"{size} books / {name} / {metric}: {value} > {expected} (baseline)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, nargs="+", default=[1_000])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--memory-iterations", type=int, default=5)
+    parser.add_argument("--scenario", nargs="+", help="실행할 시나리오 (기본: 전체)")
+    parser.add_argument("--output", type=Path, help="결과 JSON 경로")
+    parser.add_argument("--baseline", type=Path, help="비교할 기준 결과 JSON 경로")
+    parser.add_argument("--save-baseline", action="store_true", help="결과를 --baseline 경로에 기준으로 저장")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="지연 시간·메모리의 허용 증가 비율")
+    args = parser.parse_args()
+
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    print(f"{'books':>10}  {'scenario':<20}{'p50 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KiB':>10}")
+    for size in args.books:
+        dataset = seed(size)
+        scenarios = prepare_scenarios(dataset, args.iterations + args.memory_iterations)
+        results[str(size)] = {}
+        for name, scenario in scenarios.items():
+            if args.scenario and name not in args.scenario:
+                continue
+            metrics = asyncio.run(measure(scenario, args.iterations, args.memory_iterations, dataset.user))
+            results[str(size)][name] = metrics
+            print(
+                f"{size:>10}  {name:<20}{metrics['p50_ms']:>10.2f}{metrics['p99_ms']:>10.2f}"
+                f"{metrics['queries']:>9}{metrics['peak_kib']:>10.1f}"
+            )
+        # mutation 시나리오용으로 만든 책은 지운다
+        Book.objects.filter(library=dataset.libraries[0], title__startswith=f"{dataset.prefix} Mutation").delete()
+        Book.objects.filter(library=dataset.libraries[0], title=f"{dataset.prefix} Updated").delete()
+        refresh_book_counts()
+
+    report = {
+        "created_at": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "iterations": args.iterations,
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.baseline and args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+    elif args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text())["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""최상위 books 조회의 peak RSS 비교 벤치마크
+
+    python benchmarks/books_memory.py --books 1000000
+
+`libraries_book` 이 `--books` 개보다 적으면 bulk_create 로 채운 뒤, 시나리오마다 새 프로세스에서 조회해
+ru_maxrss(최대 RSS)와 소요 시간을 비교한다.
+
+- unbounded: 변경 전 `books` 리스트처럼 필터 없는 테이블 전체를 모델 인스턴스로 읽는다
+- books: 상한(`BOOKS_MAX_RESULTS`)이 걸린 `books` 리스트
+- books_connection: keyset `booksConnection` 을 `--pages` 페이지까지 넘긴다
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "play_with_gql.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from play_with_gql.api.libraries.loaders import ModelLoaders  # noqa: E402
+from play_with_gql.api.libraries.queries import BOOKS_MAX_RESULTS  # noqa: E402
+from play_with_gql.libraries.models import Author, Book, Library  # noqa: E402
+from play_with_gql.libraries.signals import refresh_book_counts  # noqa: E402
+from play_with_gql.schema import schema  # noqa: E402
+
+SCENARIOS = ("unbounded", "books", "books_connection")
+
+BOOKS_QUERY = "{ books { title } }"
+BOOKS_CONNECTION_QUERY = """
+query BooksConnection($first: Int, $after: String) {
+  booksConnection(first: $first, after: $after) {
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+    edges {
+      node {
+        title
+      }
+    }
+  }
+}
+"""
+
+
+def seed(books: int, batch_size: int = 10_000) -> None:
+    missing = books - Book.objects.count()
+    if missing <= 0:
+        return
+
+    library = Library.objects.create(name="Benchmark Library")
+    author = Author.objects.create(name="Benchmark Author", title="Benchmark")
+    for start in range(0, missing, batch_size):
+        Book.objects.bulk_create(
+            Book(title=f"Benchmark {start + i}", library=library, author=author, published_date=date(2024, 1, 1))
+            for i in range(min(batch_size, missing - start))
+        )
+    refresh_book_counts()
+
+
+def run_scenario(name: str, pages: int) -> int:
+    """시나리오를 실행하고 읽은 행 수를 돌려준다"""
+    if name == "unbounded":
+        return len([{"title": book.title} for book in Book.objects.only("id", "title")])
+
+    if name == "books":
+        result = schema.execute_sync(BOOKS_QUERY, context_value=SimpleNamespace(loaders=ModelLoaders()))
+        assert result.errors is None, result.errors
+        return len(result.data["books"])
+
+    rows, after = 0, None
+    for _ in range(pages):
+        result = schema.execute_sync(
+            BOOKS_CONNECTION_QUERY,
+            variable_values={"first": BOOKS_MAX_RESULTS, "after": after},
+            context_value=SimpleNamespace(loaders=ModelLoaders()),
+        )
+        assert result.errors is None, result.errors
+        connection = result.data["booksConnection"]
+        rows += len(connection["edges"])
+        if not connection["pageInfo"]["hasNextPage"]:
+            break
+        after = connection["pageInfo"]["endCursor"]
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        started = time.perf_counter()
+        rows = run_scenario(args.scenario, args.pages)
+        elapsed = time.perf_counter() - started
+        # Linux 의 ru_maxrss 단위는 KiB
+        print(rows, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+        return
+
+    seed(args.books)
+    print(f"{'scenario':<18}{'rows':>10}{'seconds':>10}{'peak RSS (MiB)':>16}")
+    for scenario in SCENARIOS:
+        output = subprocess.run(
+            [sys.executable, __file__, "--scenario", scenario, "--pages", str(args.pages)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        rows, elapsed, max_rss = int(output[0]), float(output[1]), int(output[2])
+        print(f"{scenario:<18}{rows:>10}{elapsed:>10.2f}{max_rss / 1024:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""단건 mutation 반복과 bulk mutation(updateBooks / deleteBooks) 처리량 비교 벤치마크
+
+    python benchmarks/bulk_mutations.py --items 10000
+
+`--items` 권의 책을 만들어 두고 시나리오마다 같은 작업을 수행해 소요 시간과 초당 처리 항목 수를 비교한다.
+시나리오가 끝나면 만든 책과 도서관, 저자를 지운다.
+
+- updateBook loop: `updateBook` mutation 을 항목 수만큼 실행
+- updateBooks: 같은 패치를 `updateBooks` 한 번으로 실행
+- deleteBook loop / deleteBooks: 삭제도 같은 방식으로 비교
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "play_with_gql.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from play_with_gql.libraries.models import Author, Book, Library  # noqa: E402
+from play_with_gql.libraries.signals import refresh_book_counts  # noqa: E402
+from play_with_gql.schema import schema  # noqa: E402
+
+UPDATE_BOOK = """
+mutation UpdateBook($id: GlobalID!, $title: String) {
+  updateBook(id: $id, title: $title) { id }
+}
+"""
+UPDATE_BOOKS = """
+mutation UpdateBooks($patches: [BookPatch!]!) {
+  updateBooks(patches: $patches) { ok }
+}
+"""
+DELETE_BOOK = """
+mutation DeleteBook($id: GlobalID!) {
+  deleteBook(id: $id)
+}
+"""
+DELETE_BOOKS = """
+mutation DeleteBooks($ids: [GlobalID!]!) {
+  deleteBooks(ids: $ids) { ok }
+}
+"""
+
+
+def global_id(pk: int) -> str:
+    return base64.b64encode(f"BookNode:{pk}".encode()).decode()
+
+
+def seed(library: Library, author: Author, items: int) -> list[str]:
+    books = Book.objects.bulk_create(
+        Book(title=f"Benchmark {i}", library=library, author=author, published_date=date(2024, 1, 1))
+        for i in range(items)
+    )
+    refresh_book_counts()
+    return [global_id(book.pk) for book in books]
+
+
+async def execute(query: str, variables: dict) -> None:
+    result = await schema.execute(query, variable_values=variables)
+    assert result.errors is None, result.errors
+
+
+async def run_update_loop(ids: list[str]) -> None:
+    for i, id in enumerate(ids):
+        await execute(UPDATE_BOOK, {"id": id, "title": f"Updated {i}"})
+
+
+async def run_update_bulk(ids: list[str]) -> None:
+    await execute(UPDATE_BOOKS, {"patches": [{"id": id, "title": f"Updated {i}"} for i, id in enumerate(ids)]})
+
+
+async def run_delete_loop(ids: list[str]) -> None:
+    for id in ids:
+        await execute(DELETE_BOOK, {"id": id})
+
+
+async def run_delete_bulk(ids: list[str]) -> None:
+    await execute(DELETE_BOOKS, {"ids": ids})
+
+
+SCENARIOS = {
+    "updateBook loop": run_update_loop,
+    "updateBooks": run_update_bulk,
+    "deleteBook loop": run_delete_loop,
+    "deleteBooks": run_delete_bulk,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10_000)
+    args = parser.parse_args()
+
+    library = Library.objects.create(name="Benchmark Library")
+    author = Author.objects.create(name="Benchmark Author", title="Benchmark")
+    try:
+        print(f"{'scenario':<18}{'items':>10}{'seconds':>10}{'items/s':>12}")
+        for name, run in SCENARIOS.items():
+            ids = seed(library, author, args.items)
+            started = time.perf_counter()
+            asyncio.run(run(ids))
+            elapsed = time.perf_counter() - started
+            print(f"{name:<18}{args.items:>10}{elapsed:>10.2f}{args.items / elapsed:>12.0f}")
+    finally:
+        library.delete()
+        author.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""동시 mutation 처리량 벤치마크: 동기 resolver(변경 전) 대 async resolver
+
+    python benchmarks/concurrent_mutations.py --concurrency 200 --rounds 5
+
+`--concurrency` 개의 updateBook / deleteBook 을 asyncio.gather 로 동시에 실행해 초당 처리 수를 비교한다.
+
+- sync: 변경 전 구현. `get()` 후 전체 행 `save()` / `delete()` 를 sync_to_async 로 실행
+- async: `aupdate`(바뀐 컬럼만) 후 응답 조회, `adelete`
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "play_with_gql.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+import strawberry  # noqa: E402
+import strawberry_django  # noqa: E402
+from strawberry import relay  # noqa: E402
+from strawberry_django.optimizer import DjangoOptimizerExtension  # noqa: E402
+
+from play_with_gql.api.libraries.loaders import ModelLoaders  # noqa: E402
+from play_with_gql.api.libraries.nodes import BookNode  # noqa: E402
+from play_with_gql.libraries.models import Author, Book, Library  # noqa: E402
+from play_with_gql.libraries.signals import refresh_book_counts  # noqa: E402
+from play_with_gql.schema import schema  # noqa: E402
+
+UPDATE_BOOK = """
+mutation UpdateBook($id: GlobalID!, $title: String) {
+  updateBook(id: $id, title: $title) { id title publishedDate }
+}
+"""
+DELETE_BOOK = """
+mutation DeleteBook($id: GlobalID!) {
+  deleteBook(id: $id)
+}
+"""
+
+
+@strawberry.type
+class SyncQuery:
+    # 최상위 Query 의 필드 확장은 스키마를 두 번 만들면 다시 적용되므로 비교용 스키마에는 빈 Query 를 쓴다
+    @strawberry.field
+    def ok(self) -> bool:
+        return True
+
+
+@strawberry.type
+class SyncMutation:
+    @strawberry_django.mutation
+    def update_book(self, id: relay.GlobalID, title: str | None = None) -> BookNode:
+        book = Book.objects.get(pk=id.node_id)
+        if title is not None:
+            book.title = title
+        book.save()
+        return book
+
+    @strawberry_django.mutation
+    def delete_book(self, id: relay.GlobalID) -> bool:
+        Book.objects.get(pk=id.node_id).delete()
+        return True
+
+
+SCHEMAS = {
+    "sync": strawberry.Schema(query=SyncQuery, mutation=SyncMutation, extensions=[DjangoOptimizerExtension()]),
+    "async": schema,
+}
+
+
+def global_id(pk: int) -> str:
+    return base64.b64encode(f"BookNode:{pk}".encode()).decode()
+
+
+def seed(library: Library, author: Author, items: int) -> list[str]:
+    books = Book.objects.bulk_create(
+        Book(title=f"Benchmark {i}", library=library, author=author, published_date=date(2024, 1, 1))
+        for i in range(items)
+    )
+    refresh_book_counts()
+    return [global_id(book.pk) for book in books]
+
+
+async def run_concurrently(schema: strawberry.Schema, query: str, ids: list[str]) -> float:
+    async def execute(i: int, id: str) -> None:
+        result = await schema.execute(
+            query,
+            variable_values={"id": id, "title": f"Updated {i}"},
+            context_value=SimpleNamespace(loaders=ModelLoaders()),
+        )
+        assert result.errors is None, result.errors
+
+    started = time.perf_counter()
+    await asyncio.gather(*(execute(i, id) for i, id in enumerate(ids)))
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    library = Library.objects.create(name="Benchmark Library")
+    author = Author.objects.create(name="Benchmark Author", title="Benchmark")
+    try:
+        print(f"{'mutation':<12}{'resolver':<10}{'ops':>8}{'seconds':>10}{'ops/s':>10}")
+        for mutation, query in (("updateBook", UPDATE_BOOK), ("deleteBook", DELETE_BOOK)):
+            for name, schema in SCHEMAS.items():
+                elapsed = 0.0
+                for _ in range(args.rounds):
+                    ids = seed(library, author, args.concurrency)
+                    elapsed += asyncio.run(run_concurrently(schema, query, ids))
+                ops = args.concurrency * args.rounds
+                print(f"{mutation:<12}{name:<10}{ops:>8}{elapsed:>10.2f}{ops / elapsed:>10.0f}")
+    finally:
+        library.delete()
+        author.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""커넥션 풀 부하 테스트: 요청마다 새 커넥션(변경 전) 대 psycopg3 커넥션 풀
+
+    PLAY_WITH_GQL_SERVER_PROFILE=asgi python benchmarks/connection_pool.py --requests 2000
+    PLAY_WITH_GQL_SERVER_PROFILE=wsgi DB_CONCURRENCY=8 python benchmarks/connection_pool.py --requests 2000
+
+settings 의 실행 프로필(ASGI/WSGI)과 DB_CONCURRENCY 로 풀을 만들고, 같은 수의 동시 요청으로 `node(id)` 조회를
+`--requests` 번 보내 요청 지연 시간(p50/p99/max, ms)과 초당 처리 수를 비교한다. 요청은 실제 엔트리포인트
+(asgi.py 의 ASGIHandler / wsgi.py 의 WSGIHandler)로 보내므로 요청이 끝날 때 커넥션을 닫는(풀에 돌려주는) 흐름까지 잰다.
+
+- direct: 풀 없이 CONN_MAX_AGE=0. 요청마다 연결을 맺고 끊는다
+- pool: `DATABASES["default"]["OPTIONS"]["pool"]`. 풀에서 빌리고 돌려준다 (CONN_HEALTH_CHECKS 포함)
+
+`connect` 열은 요청 안에서 커넥션을 얻는 데 걸린 시간(get_new_connection)의 p99 이다.
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "play_with_gql.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import close_old_connections, connection, connections  # noqa: E402
+from django.db.backends.postgresql.base import DatabaseWrapper  # noqa: E402
+
+from play_with_gql.libraries.models import Author  # noqa: E402
+
+_connect_timings: list[float] = []
+_get_new_connection = DatabaseWrapper.get_new_connection
+
+
+def _timed_get_new_connection(self, conn_params):
+    started = time.perf_counter()
+    try:
+        return _get_new_connection(self, conn_params)
+    finally:
+        _connect_timings.append((time.perf_counter() - started) * 1000)
+
+
+DatabaseWrapper.get_new_connection = _timed_get_new_connection
+
+
+def request_body() -> bytes:
+    author, _ = Author.objects.get_or_create(name="Connection Pool Bench", defaults={"title": "Professor"})
+    close_old_connections()
+    author_id = base64.b64encode(f"AuthorNode:{author.pk}".encode()).decode()
+    return json.dumps({"query": f'{{ node(id: "{author_id}") {{ ... on AuthorNode {{ name }} }} }}'}).encode()
+
+
+def asgi_load(body: bytes, requests: int, concurrency: int) -> list[float]:
+    from channels.testing import HttpCommunicator
+
+    from play_with_gql.asgi import application
+
+    async def post(limit: asyncio.Semaphore) -> float:
+        async with limit:
+            started = time.perf_counter()
+            communicator = HttpCommunicator(
+                application, "POST", "/graphql/", body=body, headers=[(b"content-type", b"application/json")]
+            )
+            await communicator.get_response(timeout=30)
+            await communicator.wait(timeout=30)
+            return (time.perf_counter() - started) * 1000
+
+    async def run() -> list[float]:
+        limit = asyncio.Semaphore(concurrency)
+        return list(await asyncio.gather(*(post(limit) for _ in range(requests))))
+
+    return asyncio.run(run())
+
+
+def wsgi_load(body: bytes, requests: int, concurrency: int) -> list[float]:
+    from play_with_gql.wsgi import application
+
+    def post(_: int) -> float:
+        environ = {
+            "REQUEST_METHOD": "POST",
+            "PATH_INFO": "/graphql/",
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.url_scheme": "http",
+        }
+        started = time.perf_counter()
+        response = application(environ, lambda status, headers: None)
+        b"".join(response)
+        # WSGI 서버처럼 응답을 닫아 request_finished 로 커넥션을 정리한다
+        response.close()
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="wsgi-worker") as executor:
+        return list(executor.map(post, range(requests)))
+
+
+def p99(values: list[float]) -> float:
+    return statistics.quantiles(values, n=100)[98] if len(values) > 1 else (values or [0.0])[0]
+
+
+def measure(load: Callable[[bytes, int, int], list[float]], body: bytes, requests: int, concurrency: int) -> dict:
+    load(body, concurrency, concurrency)  # 워밍업
+    _connect_timings.clear()
+    started = time.perf_counter()
+    timings = load(body, requests, concurrency)
+    elapsed = time.perf_counter() - started
+    return {
+        "p50": statistics.median(timings),
+        "p99": p99(timings),
+        "max": max(timings),
+        "rps": requests / elapsed,
+        "connect_p99": p99(_connect_timings),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2_000)
+    args = parser.parse_args()
+
+    profile, concurrency = settings.SERVER_PROFILE, settings.DB_CONCURRENCY
+    load = asgi_load if profile == "asgi" else wsgi_load
+    pool_options = connection.settings_dict["OPTIONS"].get("pool")
+    if not pool_options:
+        sys.exit("풀이 꺼져 있다 (DB_POOL=0)")
+    body = request_body()
+
+    print(f"profile={profile} concurrency={concurrency} pool={pool_options}")
+    print(f"{'mode':<10}{'p50':>10}{'p99':>10}{'max':>10}{'req/s':>10}{'connect':>10}")
+    for mode in ("direct", "pool"):
+        # 스레드마다 따로 있는 DatabaseWrapper 가 같은 settings_dict 를 보므로 alias(복제본 포함)마다 풀을 켜고 끈다
+        for alias in connections:
+            options = connections[alias].settings_dict["OPTIONS"]
+            if mode == "direct":
+                options.pop("pool", None)
+            else:
+                options["pool"] = pool_options
+                connections[alias].pool.open(wait=True)
+        result = measure(load, body, args.requests, concurrency)
+        print(
+            f"{mode:<10}{result['p50']:>10.2f}{result['p99']:>10.2f}{result['max']:>10.2f}"
+            f"{result['rps']:>10.0f}{result['connect_p99']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""응답 JSON 인코더 마이크로벤치마크
+
+    python benchmarks/json_encoding.py --edges 1000 --repeat 20
+
+실제 응답 모양을 본뜬 결과 dict 를 인코더별로 `--repeat` 번 인코딩해 중앙값(ms)과 출력 크기를 비교한다.
+DB 는 쓰지 않는다.
+
+- library_books: `library { name books(first) { totalCount edges { cursor node { id title publishedDate author } } } }`
+- books_list: 최상위 `books { id title publishedDate author { name } }`
+- extensions_dates: 스칼라로 직렬화되지 않은 date/datetime 이 섞인 결과 (extensions 등)
+
+인코더:
+
+- stdlib: 표준 json + DjangoJSONEncoder (strawberry Django 뷰의 기본)
+- orjson: `OrjsonEncoder`
+- orjson_stream: `aiter_encode` 로 리스트를 `--chunk-items` 개씩 나눠 인코딩 (GRAPHQL_RESPONSE_STREAM_ITEMS)
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "play_with_gql.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from play_with_gql.encoders import OrjsonEncoder, ResponseEncoder, StdlibEncoder, aiter_encode  # noqa: E402
+
+
+def global_id(type_name: str, pk: int) -> str:
+    return base64.b64encode(f"{type_name}:{pk}".encode()).decode()
+
+
+def book(pk: int) -> dict[str, Any]:
+    return {
+        "id": global_id("BookNode", pk),
+        "title": f"The Collected Works of Author {pk % 97} — Volume {pk}",
+        "publishedDate": (date(1950, 1, 1) + timedelta(days=pk * 13 % 27_000)).isoformat(),
+        "author": {"id": global_id("AuthorNode", pk % 97), "name": f"Author {pk % 97}"},
+    }
+
+
+def library_books(edges: int) -> dict[str, Any]:
+    return {
+        "data": {
+            "node": {
+                "id": global_id("LibraryNode", 1),
+                "name": "Central Library",
+                "books": {
+                    "totalCount": edges * 10,
+                    "pageInfo": {"hasNextPage": True, "endCursor": global_id("keyset", edges)},
+                    "edges": [{"cursor": global_id("keyset", pk), "node": book(pk)} for pk in range(edges)],
+                },
+            }
+        },
+        "extensions": {"cost": {"rows": edges * 2, "queries": 3, "depth": 6}},
+    }
+
+
+def books_list(edges: int) -> dict[str, Any]:
+    return {"data": {"books": [book(pk) for pk in range(edges)]}}
+
+
+def extensions_dates(edges: int) -> dict[str, Any]:
+    started = datetime(2024, 1, 1, tzinfo=UTC)
+    return {
+        "data": {
+            "books": [{**book(pk), "publishedDate": date(2000, 1, 1) + timedelta(days=pk)} for pk in range(edges)]
+        },
+        "extensions": {
+            "tracing": [
+                {"name": f"resolver {pk}", "startTime": started + timedelta(microseconds=pk)} for pk in range(edges)
+            ]
+        },
+    }
+
+
+SHAPES: dict[str, Callable[[int], dict[str, Any]]] = {
+    "library_books": library_books,
+    "books_list": books_list,
+    "extensions_dates": extensions_dates,
+}
+
+
+def stream(encoder: ResponseEncoder, chunk_items: int) -> Callable[[Any], bytes]:
+    async def collect(data: Any) -> bytes:
+        return b"".join([chunk async for chunk in aiter_encode(encoder, data, chunk_items)])
+
+    # 루프 생성 비용이 섞이지 않도록 루프 하나를 계속 쓴다
+    loop = asyncio.new_event_loop()
+    return lambda data: loop.run_until_complete(collect(data))
+
+
+def measure(encode: Callable[[Any], bytes], data: Any, repeat: int) -> tuple[float, int]:
+    size = len(encode(data))
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode(data)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--edges", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--chunk-items", type=int, default=100)
+    args = parser.parse_args()
+
+    encoders: dict[str, Callable[[Any], bytes]] = {
+        "stdlib": StdlibEncoder().encode,
+        "orjson": OrjsonEncoder().encode,
+        "orjson_stream": stream(OrjsonEncoder(), args.chunk_items),
+    }
+    print(f"{'shape':<18}{'encoder':<16}{'ms (p50)':>10}{'KiB':>10}{'speedup':>10}")
+    for shape, build in SHAPES.items():
+        data = build(args.edges)
+        baseline = None
+        for name, encode in encoders.items():
+            elapsed, size = measure(encode, data, args.repeat)
+            baseline = baseline or elapsed
+            print(f"{shape:<18}{name:<16}{elapsed:>10.2f}{size / 1024:>10.1f}{baseline / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,571 @@
+import dataclasses
+import enum
+import functools
+import inspect
+import json
+from typing import Any, Self, cast
+
+import strawberry
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import F, Func, Value
+from graphql import FieldNode, FragmentSpreadNode, SelectionSetNode
+from strawberry import UNSET, relay
+from strawberry.annotation import StrawberryAnnotation
+from strawberry.extensions.field_extension import SyncExtensionResolver
+from strawberry.relay.types import NodeIterableType
+from strawberry.relay.utils import from_base64, to_base64
+from strawberry.types import Info, get_object_definition
+from strawberry.types.base import StrawberryContainer
+from strawberry.utils.await_maybe import AwaitableOrValue
+from strawberry_django.fields.field import StrawberryDjangoConnectionExtension, StrawberryDjangoField
+from strawberry_django.optimizer import OptimizerStore, optimizer
+from strawberry_django.relay import ListConnectionWithTotalCount
+from strawberry_django.resolvers import django_resolver
+
+from play_with_gql.api.libraries.counts import DEFAULT_COUNT_CAP, TotalCountKind, count_per_parent
+from play_with_gql.api.libraries.loaders import get_loaders
+
+KEYSET_CURSOR_PREFIX = "keyset"
+
+
+class Row(Func):
+    """`ROW(a, b)` 행 생성자. `(a, b) > (x, y)` 비교를 복합 인덱스 seek 으로 처리하게 한다"""
+
+    function = "ROW"
+    output_field = models.Field()
+
+
+def is_selected(info: Info, *names: str) -> bool:
+    """현재 필드의 바로 아래 선택 집합(fragment 포함)에 `names` 중 하나가 있는지
+
+    info.selected_fields 는 타입 조건 없는 인라인 조각(`... @defer { totalCount }`)을 변환하지 못하므로
+    graphql-core 의 AST 를 직접 본다.
+    """
+    fragments = info._raw_info.fragments
+
+    def visit(selection_set: SelectionSetNode | None) -> bool:
+        for selection in selection_set.selections if selection_set else ():
+            if isinstance(selection, FieldNode):
+                if selection.name.value in names:
+                    return True
+            elif isinstance(selection, FragmentSpreadNode):
+                if visit(fragments[selection.name.value].selection_set):
+                    return True
+            elif visit(selection.selection_set):
+                return True
+        return False
+
+    return any(visit(node.selection_set) for node in info._raw_info.field_nodes)
+
+
+def get_keyset_ordering(queryset: models.QuerySet) -> tuple[list[str], bool]:
+    """queryset 의 정렬을 (컬럼/annotation 목록, 내림차순 여부)로 돌려준다. pk 를 마지막 tie-breaker 로 보장한다"""
+    meta = queryset.model._meta
+    order_by = list(queryset.query.order_by)
+    if not order_by and queryset.query.default_ordering:
+        order_by = list(meta.ordering)
+
+    fields: list[str] = []
+    directions: set[bool] = set()
+    for order in order_by:
+        if not isinstance(order, str) or "__" in order:
+            raise ValueError("Keyset pagination only supports ordering by model fields or annotations.")
+        directions.add(order.startswith("-"))
+        name = order.lstrip("-")
+        if name in queryset.query.annotation_select:
+            # search_rank 처럼 SELECT 되는 annotation 은 노드에서 커서 값을 읽을 수 있다
+            fields.append(name)
+        else:
+            fields.append(meta.pk.attname if name == "pk" else meta.get_field(name).attname)
+
+    if len(directions) > 1:
+        raise ValueError("Keyset pagination requires a single ordering direction.")
+
+    if meta.pk.attname not in fields:
+        fields.append(meta.pk.attname)
+
+    return fields, directions == {True}
+
+
+def decode_keyset_cursor(cursor: str, argument: str, size: int) -> list[Any]:
+    try:
+        type_, value = from_base64(cursor)
+        values = json.loads(value)
+    except ValueError:
+        values = None
+        type_ = None
+
+    if type_ != KEYSET_CURSOR_PREFIX or not isinstance(values, list) or len(values) != size:
+        raise TypeError(f"Argument '{argument}' contains a non-existing value.")
+
+    return values
+
+
+@dataclasses.dataclass
+class KeysetPage:
+    """keyset(seek) 방식의 페이지 요청
+
+    커서는 정렬 컬럼 값과 pk 의 튜플을 인코딩하고, 다음 페이지는 `WHERE (key, id) > (...)` 로 찾아
+    페이지 깊이와 무관하게 인덱스 seek 한 번으로 끝난다.
+    """
+
+    ordering: list[str]
+    descending: bool
+    limit: int
+    after: list[Any] | None = None
+    before: list[Any] | None = None
+    # last 만 주어지면 역순으로 조회한 뒤 다시 뒤집는다
+    from_end: bool = False
+    last: int | None = None
+
+    @classmethod
+    def from_arguments(
+        cls,
+        info: Info,
+        queryset: models.QuerySet,
+        *,
+        before: str | None = None,
+        after: str | None = None,
+        first: int | None = None,
+        last: int | None = None,
+        max_results: int | None = None,
+        default_limit: int | None = None,
+    ) -> Self:
+        max_results = max_results or info.schema.config.relay_max_results
+        for argument, value in (("first", first), ("last", last)):
+            if value is None:
+                continue
+            if value < 0:
+                raise ValueError(f"Argument '{argument}' must be a non-negative integer.")
+            if value > max_results:
+                raise ValueError(f"Argument '{argument}' cannot be higher than {max_results}.")
+
+        ordering, descending = get_keyset_ordering(queryset)
+        from_end = first is None and last is not None
+        limit = last if from_end else first
+        if limit is None:
+            limit = min(default_limit or max_results, max_results)
+        return cls(
+            ordering=ordering,
+            descending=descending,
+            limit=limit,
+            after=decode_keyset_cursor(after, "after", len(ordering)) if after else None,
+            before=decode_keyset_cursor(before, "before", len(ordering)) if before else None,
+            from_end=from_end,
+            last=None if from_end else last,
+        )
+
+    def apply(self, queryset: models.QuerySet) -> models.QuerySet:
+        """정렬과 커서 조건을 적용한다. LIMIT 은 `slice` 에서 건다"""
+        reverse = self.descending != self.from_end
+        queryset = queryset.order_by(*(f"-{field}" if reverse else field for field in self.ordering))
+        if len(self.ordering) > 1 and (self.after or self.before):
+            queryset = queryset.alias(_keyset=Row(*map(F, self.ordering)))
+        if self.after is not None:
+            queryset = self._seek(queryset, self.after, "lt" if self.descending else "gt")
+        if self.before is not None:
+            queryset = self._seek(queryset, self.before, "gt" if self.descending else "lt")
+        return queryset
+
+    def slice(self, queryset: models.QuerySet) -> models.QuerySet:
+        # 다음 페이지 존재 여부 확인을 위해 하나 더 가져온다
+        return queryset[: self.limit + 1]
+
+    def build(self, rows: list[models.Model]) -> tuple[list[models.Model], bool, bool]:
+        """조회 결과를 (페이지 노드, hasPreviousPage, hasNextPage)로 정리한다"""
+        has_more = len(rows) > self.limit
+        rows = rows[: self.limit]
+        if self.from_end:
+            rows.reverse()
+            return rows, has_more, self.before is not None
+
+        has_previous = self.after is not None
+        if self.last is not None and len(rows) > self.last:
+            rows = rows[len(rows) - self.last :]
+            has_previous = True
+        return rows, has_previous, has_more
+
+    def sort_key(self, node: models.Model) -> tuple[Any, ...]:
+        return tuple(getattr(node, field) for field in self.ordering)
+
+    def cursor(self, node: models.Model) -> str:
+        return to_base64(KEYSET_CURSOR_PREFIX, json.dumps(self.sort_key(node), cls=DjangoJSONEncoder))
+
+    def _seek(self, queryset: models.QuerySet, values: list[Any], lookup: str) -> models.QuerySet:
+        if len(self.ordering) == 1:
+            return queryset.filter(**{f"{self.ordering[0]}__{lookup}": values[0]})
+        return queryset.filter(**{f"_keyset__{lookup}": Row(*map(Value, values))})
+
+
+@strawberry.type(name="Connection", description="A connection to a list of items.")
+class KeysetConnectionWithTotalCount(ListConnectionWithTotalCount[relay.NodeType]):
+    """커서가 `(정렬 키, id)` 튜플인 keyset connection. OFFSET 없이 페이지를 찾는다"""
+
+    total_count_kind: TotalCountKind | None = strawberry.field(
+        default=None, description="How totalCount was computed. Null when totalCount was not requested."
+    )
+
+    @classmethod
+    def resolve_connection(
+        cls,
+        nodes: NodeIterableType[relay.NodeType],
+        *,
+        info: Info,
+        before: str | None = None,
+        after: str | None = None,
+        first: int | None = None,
+        last: int | None = None,
+        max_results: int | None = None,
+        default_limit: int | None = None,
+        **kwargs: Any,
+    ) -> AwaitableOrValue[Self]:
+        queryset = cast("models.QuerySet", nodes)
+        page = KeysetPage.from_arguments(
+            info,
+            queryset,
+            before=before,
+            after=after,
+            first=first,
+            last=last,
+            max_results=max_results,
+            default_limit=default_limit,
+        )
+        # 페이지는 LIMIT 으로 이미 작으므로 서버 측 커서(DECLARE/FETCH/CLOSE 왕복) 없이 한 번에 읽는다
+        rows = django_resolver(lambda: list(page.slice(page.apply(queryset))), qs_hook=None)()
+        # totalCount 는 선택됐을 때만 nodes 로 COUNT 해서 세므로, 그때만 방식을 알린다
+        total_count_kind = TotalCountKind.EXACT if is_selected(info, "totalCount") else None
+
+        if inspect.isawaitable(rows):
+
+            async def resolve():
+                return cls.from_page(page, await rows, info=info, nodes=queryset, total_count_kind=total_count_kind)
+
+            return resolve()
+
+        return cls.from_page(page, rows, info=info, nodes=queryset, total_count_kind=total_count_kind)
+
+    @classmethod
+    def from_page(
+        cls,
+        page: KeysetPage,
+        rows: list[models.Model],
+        *,
+        info: Info,
+        nodes: NodeIterableType[relay.NodeType] | None,
+        total_count_kind: TotalCountKind | None = None,
+    ) -> Self:
+        rows, has_previous_page, has_next_page = page.build(rows)
+
+        type_def = get_object_definition(cls, strict=True)
+        field_def = type_def.get_field("edges")
+        assert field_def
+        edge_class = field_def.resolve_type(type_definition=type_def)
+        while isinstance(edge_class, StrawberryContainer):
+            edge_class = edge_class.of_type
+
+        edges = [edge_class(cursor=page.cursor(node), node=cls.resolve_node(node, info=info)) for node in rows]
+        connection = cls(
+            edges=edges,
+            page_info=relay.PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_previous_page,
+                has_next_page=has_next_page,
+            ),
+            total_count_kind=total_count_kind,
+        )
+        connection.nodes = nodes
+        return connection
+
+
+@dataclasses.dataclass
+class _CountOnly:
+    """배치로 가져온 페이지의 `nodes` 자리에 들어가는 값
+
+    `ListConnectionWithTotalCount.total_count` 는 QuerySet 이 아니면 `len(nodes)` 를 쓰므로
+    미리 계산한(카운터·추정치일 수도 있는) totalCount 를 그대로 돌려줘 부모별 COUNT 쿼리를 막는다.
+    """
+
+    total_count: int
+
+    def __len__(self) -> int:
+        return self.total_count
+
+
+@dataclasses.dataclass
+class _PageRequest:
+    """`BatchedConnectionExtension` 의 DataLoader 에 부모마다 넘기는 요청
+
+    호출마다 다른 상태(info, 인자)는 공유되는 로더 함수에 가두지 않고 여기에 담아 넘긴다.
+    """
+
+    source: models.Model
+    info: Info
+    slice_arguments: dict[str, Any]
+    kwargs: dict[str, Any]
+    counted: bool
+
+    def cache_key(self) -> Any:
+        return self.source.pk
+
+
+def _arguments_key(arguments: dict[str, Any]) -> str:
+    """필드 인자를 로더 키로 비교할 수 있는 문자열로 만든다. input 타입(dataclass)·enum 은 값으로 펼친다"""
+
+    def default(value: Any) -> Any:
+        if value is UNSET:
+            return {"$unset": True}
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            return dataclasses.asdict(value)
+        if isinstance(value, enum.Enum):
+            return value.value
+        return str(value)
+
+    return json.dumps(arguments, sort_keys=True, default=default)
+
+
+class KeysetConnectionExtension(StrawberryDjangoConnectionExtension):
+    """페이지 크기 상한(`max_results`)과 first/last 생략 시의 기본값(`default_limit`)을 필드마다 두는 확장
+
+    지정하지 않으면 스키마의 `relay_max_results` 를 따른다.
+    """
+
+    def __init__(self, max_results: int | None = None, default_limit: int | None = None):
+        super().__init__()
+        self.max_results = max_results
+        self.default_limit = default_limit
+
+    def resolve(
+        self,
+        next_: SyncExtensionResolver,
+        source: Any,
+        info: Info,
+        *,
+        before: str | None = None,
+        after: str | None = None,
+        first: int | None = None,
+        last: int | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        assert self.connection_type is not None
+        nodes = next_(source, info, **kwargs)
+        resolve_connection = functools.partial(
+            self.connection_type.resolve_connection,
+            info=info,
+            before=before,
+            after=after,
+            first=first,
+            last=last,
+            max_results=self.max_results,
+            default_limit=self.default_limit,
+        )
+
+        if inspect.isawaitable(nodes):
+
+            async def resolve_async():
+                resolved = resolve_connection(await nodes)
+                if inspect.isawaitable(resolved):
+                    resolved = await resolved
+                return resolved
+
+            return resolve_async()
+
+        return resolve_connection(nodes)
+
+
+class BatchedConnectionExtension(KeysetConnectionExtension):
+    """역참조 keyset connection 을 부모 단위로 모아 한 번에 페이지네이션하는 확장
+
+    부모별 keyset 쿼리(`WHERE library_id = ? AND (key, id) > (...) LIMIT n`)를 UNION ALL 로 묶어
+    각 부모가 복합 인덱스 seek 을 그대로 쓰면서도 왕복은 한 번이 되게 하고,
+    totalCount 는 선택된 경우에만 `total_count` 방식(`TotalCountKind`)으로 배치 단위로 센다.
+    DataLoader 가 없는 컨텍스트(execute_sync 등)는 부모 하나짜리 배치로 바로 조회한다.
+    """
+
+    def __init__(
+        self,
+        total_count: TotalCountKind = TotalCountKind.EXACT,
+        counter_field: str | None = None,
+        count_cap: int = DEFAULT_COUNT_CAP,
+        max_results: int | None = None,
+        default_limit: int | None = None,
+    ):
+        super().__init__(max_results=max_results, default_limit=default_limit)
+        if total_count is TotalCountKind.COUNTER and counter_field is None:
+            raise ValueError("TotalCountKind.COUNTER requires a counter_field")
+        self.total_count = total_count
+        self.counter_field = counter_field
+        self.count_cap = count_cap
+
+    def resolve(
+        self,
+        next_: SyncExtensionResolver,
+        source: Any,
+        info: Info,
+        *,
+        before: str | None = None,
+        after: str | None = None,
+        first: int | None = None,
+        last: int | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        if not isinstance(source, models.Model):
+            return super().resolve(next_, source, info, before=before, after=after, first=first, last=last, **kwargs)
+
+        slice_arguments = {"before": before, "after": after, "first": first, "last": last}
+        # totalCount 가 선택되지 않았으면 어떤 방식의 카운트도 실행하지 않는다
+        counted = is_selected(info, "totalCount", "totalCountKind")
+        request = _PageRequest(source, info, slice_arguments, kwargs, counted)
+
+        loaders = get_loaders(info.context)
+        if loaders is None:
+            load_pages = self._page_loader(request)
+            result = django_resolver(load_pages, qs_hook=None)([source.pk])
+            if inspect.isawaitable(result):
+
+                async def resolve_async():
+                    return self._build_connections(await result, [source.pk], info, counted=counted)[0]
+
+                return resolve_async()
+            return self._build_connections(result, [source.pk], info, counted=counted)[0]
+
+        # 응답 경로(리스트 인덱스 제외)와 인자, totalCount 선택 여부가 모두 같은 connection 만 하나의 배치로 묶는다
+        # kwargs 에는 인자 외에 부모 객체(root)도 들어 있으므로 필드에 선언된 인자만 키에 넣는다
+        arguments = {argument.python_name for argument in info._field.arguments}
+        key = (
+            self,
+            *(k for k in info.path.as_list() if not isinstance(k, int)),
+            _arguments_key({**slice_arguments, **{name: kwargs[name] for name in arguments if name in kwargs}}),
+            counted,
+        )
+        return loaders.get(key, self._load_connections, cache_key_fn=_PageRequest.cache_key).load(request)
+
+    async def _load_connections(self, requests: list[_PageRequest]) -> list[relay.Connection]:
+        # 같은 로더 키로 묶인 요청은 필드·인자·counted 가 같으므로 첫 요청으로 배치 쿼리를 만든다
+        request = requests[0]
+        parent_ids = [request.source.pk for request in requests]
+        loaded = await sync_to_async(self._page_loader(request))(parent_ids)
+        return self._build_connections(loaded, parent_ids, request.info, counted=request.counted)
+
+    def _page_loader(self, request: _PageRequest):
+        info = request.info
+        field = cast("StrawberryDjangoField", info._field)
+        related_field = request.source._meta.get_field(field.django_name or field.python_name).field
+        related_field_id = related_field.attname
+
+        def load_pages(parent_ids: list[Any]) -> tuple[KeysetPage, dict[Any, list[models.Model]], dict[Any, Any]]:
+            queryset = related_field.model._default_manager.all()
+            ext = optimizer.get()
+            if ext is not None:
+                # 부모별로 묶으려면 FK 컬럼이 필요하므로 only() 힌트에 포함시킨다 (빠지면 행마다 지연 로딩된다)
+                queryset = ext.optimize(queryset, info, store=OptimizerStore.with_hints(only=[related_field_id]))
+            queryset = field.get_queryset(queryset, info, **request.kwargs)
+            page = KeysetPage.from_arguments(
+                info,
+                queryset,
+                max_results=self.max_results,
+                default_limit=self.default_limit,
+                **request.slice_arguments,
+            )
+            paged = page.apply(queryset)
+            page_querysets = [page.slice(paged.filter(**{related_field_id: parent_id})) for parent_id in parent_ids]
+            rows = page_querysets[0]
+            if len(page_querysets) > 1:
+                rows = rows.union(*page_querysets[1:], all=True)
+
+            pages: dict[Any, list[models.Model]] = {parent_id: [] for parent_id in parent_ids}
+            for node in rows:
+                pages[getattr(node, related_field_id)].append(node)
+            # UNION ALL 은 브랜치 간 순서를 보장하지 않으므로 부모별로 다시 정렬한다
+            for page_rows in pages.values():
+                page_rows.sort(key=page.sort_key, reverse=page.descending != page.from_end)
+
+            if not request.counted:
+                return page, pages, {}
+            total_counts = count_per_parent(
+                self.total_count,
+                queryset,
+                related_field,
+                parent_ids,
+                counter_field=self.counter_field,
+                cap=self.count_cap,
+            )
+            return page, pages, total_counts
+
+        return load_pages
+
+    def _build_connections(
+        self,
+        loaded: tuple[KeysetPage, dict[Any, list[models.Model]], dict[Any, Any]],
+        parent_ids: list[Any],
+        info: Info,
+        *,
+        counted: bool,
+    ) -> list[relay.Connection]:
+        assert self.connection_type is not None
+        page, pages, total_counts = loaded
+        connections = []
+        for parent_id in parent_ids:
+            if counted:
+                total_count, total_count_kind = total_counts.get(parent_id, (0, self.total_count))
+                nodes, kind = _CountOnly(total_count), total_count_kind
+            else:
+                nodes, kind = None, None
+            connections.append(
+                self.connection_type.from_page(page, pages[parent_id], info=info, nodes=nodes, total_count_kind=kind)
+            )
+        return connections
+
+
+def keyset_connection(
+    graphql_type: type[relay.Connection] | None = None,
+    *,
+    description: str | None = None,
+    filters: type | None = UNSET,
+    max_results: int | None = None,
+    default_limit: int | None = None,
+) -> Any:
+    """최상위 keyset connection 필드. 페이지 크기는 `max_results` 로 제한되고 생략 시 `default_limit` 개를 준다"""
+    return StrawberryDjangoField(
+        python_name=None,
+        graphql_name=None,
+        type_annotation=StrawberryAnnotation.from_annotation(graphql_type),
+        description=description,
+        filters=filters,
+        extensions=[KeysetConnectionExtension(max_results=max_results, default_limit=default_limit)],
+    )
+
+
+def batched_connection(
+    graphql_type: type[relay.Connection] | None = None,
+    *,
+    description: str | None = None,
+    total_count: TotalCountKind = TotalCountKind.EXACT,
+    counter_field: str | None = None,
+    count_cap: int = DEFAULT_COUNT_CAP,
+    max_results: int | None = None,
+    default_limit: int | None = None,
+) -> Any:
+    """`strawberry_django.connection()` 과 같지만 `BatchedConnectionExtension` 으로 페이지네이션한다
+
+    optimizer 의 OFFSET 기반 prefetch 는 keyset 커서와 섞일 수 없으므로 이 필드는 prefetch 대상에서 제외한다.
+    `total_count` 로 totalCount 계산 방식(정확한 COUNT, 부모 카운터 컬럼, EXPLAIN 추정치, 상한 COUNT)을 고른다.
+    """
+    return StrawberryDjangoField(
+        python_name=None,
+        graphql_name=None,
+        type_annotation=StrawberryAnnotation.from_annotation(graphql_type),
+        description=description,
+        extensions=[
+            BatchedConnectionExtension(
+                total_count=total_count,
+                counter_field=counter_field,
+                count_cap=count_cap,
+                max_results=max_results,
+                default_limit=default_limit,
+            )
+        ],
+        disable_optimization=True,
+    )
@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+import queue
+import threading
+from collections.abc import AsyncIterator
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import F
+from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+
+from play_with_gql.libraries.models.book import Book
+from play_with_gql.users.auth import aget_request_user
+
+# COPY 출력은 행 단위로 오므로 이만큼 모아서 보낸다
+EXPORT_CHUNK_BYTES = 64 * 1024
+# 아직 보내지 못한 청크 수. 클라이언트가 느리면 COPY 가 여기서 멈춰 메모리가 EXPORT_CHUNK_BYTES * 이 값으로 묶인다
+EXPORT_QUEUE_CHUNKS = 16
+
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+_DONE = object()
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def export_queryset(since: datetime | None = None):
+    """export 할 행. `since` 이후(포함)에 바뀐 책만 워터마크 순서로 읽는다"""
+    queryset = Book.objects.order_by("updated_at", "pk").values(
+        "id",
+        "title",
+        "published_date",
+        "updated_at",
+        author_name=F("author__name"),
+        library_name=F("library__name"),
+    )
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    return queryset
+
+
+def _copy_sql(queryset, export_format: str) -> tuple[str, tuple]:
+    sql, params = queryset.query.sql_with_params()
+    if export_format == "csv":
+        return f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", params
+    # text 형식은 JSON 의 역슬래시를 다시 이스케이프하므로, JSON 에 나올 수 없는 제어 문자를
+    # 따옴표·구분자로 둔 csv 형식으로 한 줄에 한 객체를 그대로 내보낸다
+    return (
+        f"COPY (SELECT row_to_json(export)::text FROM ({sql}) AS export) "
+        f"TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')",
+        params,
+    )
+
+
+class _ChunkWriter:
+    """COPY 출력을 EXPORT_CHUNK_BYTES 단위로 묶어 큐에 넣는다. 큐가 차 있으면 기다린다"""
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+
+    def write(self, data: bytes | memoryview) -> None:
+        self.buffer += data
+        if len(self.buffer) >= EXPORT_CHUNK_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def put(self, item) -> None:
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise ExportCancelled
+
+
+def _run_copy(sql: str, params: tuple, chunks: queue.Queue, cancelled: threading.Event) -> None:
+    # 전용 스레드의 커넥션으로 실행하고 끝나면 닫는다
+    writer = _ChunkWriter(chunks, cancelled)
+    result = _DONE
+    try:
+        with connection.cursor() as cursor:
+            # COPY 는 서버 측 바인딩이 안 되므로 psycopg 가 인자를 클라이언트에서 채운다
+            with cursor.copy(sql, params) as copy:
+                for data in copy:
+                    writer.write(data)
+        writer.flush()
+    except ExportCancelled:
+        pass
+    except Exception as error:
+        result = error
+    finally:
+        connection.close()
+
+    if cancelled.is_set():
+        # 응답이 끊긴 사이 청크를 기다리던 스레드가 있으면 풀어 준다
+        with contextlib.suppress(queue.Full):
+            chunks.put_nowait(_DONE)
+    else:
+        with contextlib.suppress(ExportCancelled):
+            writer.put(result)
+
+
+async def stream_copy(sql: str, params: tuple) -> AsyncIterator[bytes]:
+    """`COPY ... TO STDOUT` 의 출력을 청크 단위로 흘려보낸다. 응답이 끊기면 COPY 도 멈춘다"""
+    chunks: queue.Queue = queue.Queue(maxsize=EXPORT_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    threading.Thread(target=_run_copy, args=(sql, params, chunks, cancelled), daemon=True).start()
+    try:
+        while (chunk := await asyncio.to_thread(chunks.get)) is not _DONE:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        cancelled.set()
+
+
+@require_GET
+async def export_books(request: HttpRequest) -> HttpResponse:
+    """책 전체를 저자·도서관 이름과 함께 NDJSON(기본) 또는 CSV 로 스트리밍한다. 스태프만 쓸 수 있다
+
+    `?since=<ISO 8601>` 을 주면 그 시각 이후(포함)에 바뀐 책만 보낸다. 행은 (updated_at, id) 순서이므로 받은 마지막
+    updated_at 을 다음 요청의 since 로 쓰면 된다. 같은 시각의 행은 다시 올 수 있으니 id 로 덮어쓴다.
+    삭제된 책은 나오지 않는다.
+    """
+    user = await aget_request_user(request)
+    if not user.is_staff:
+        return HttpResponseForbidden()
+
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in EXPORT_CONTENT_TYPES:
+        return HttpResponseBadRequest(f"format must be one of {', '.join(EXPORT_CONTENT_TYPES)}.")
+    since = None
+    if "since" in request.GET:
+        try:
+            since = parse_datetime(request.GET["since"])
+        except ValueError:
+            since = None
+        if since is None:
+            return HttpResponseBadRequest("since must be an ISO 8601 datetime.")
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+    sql, params = _copy_sql(export_queryset(since), export_format)
+    response = StreamingHttpResponse(stream_copy(sql, params), content_type=EXPORT_CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = f'attachment; filename="books.{export_format}"'
+    return response
@@ -0,0 +1,106 @@
+import copy
+from collections.abc import Awaitable, Callable, Hashable
+from contextvars import ContextVar
+from typing import Any
+
+from django.db import models
+from strawberry.dataloader import DataLoader
+from strawberry.extensions.field_extension import FieldExtension, SyncExtensionResolver
+from strawberry.types import Info
+from strawberry.types.field import StrawberryField
+
+# 이 태스크에서 컨텍스트의 로더 대신 쓰는 로더 (`use_own_loaders`)
+_task_loaders: ContextVar["ModelLoaders | None"] = ContextVar("task_loaders", default=None)
+
+
+class ModelLoaders:
+    """요청 단위로 생성되는 모델별 DataLoader 모음
+
+    같은 실행 틱에서 요청된 pk 들을 모아 모델당 한 번의 `id__in` 쿼리로 가져온다.
+    """
+
+    def __init__(self, model_loaders: dict[type[models.Model], DataLoader] | None = None):
+        self._loaders: dict[Hashable, DataLoader] = {}
+        # 모델별 로더는 pk 로만 찾으므로 같은 요청의 다른 operation 과 함께 써도 된다
+        self._model_loaders = {} if model_loaders is None else model_loaders
+
+    def fork(self) -> "ModelLoaders":
+        """모델별 로더(와 그 캐시)는 함께 쓰고, 응답 경로로 찾는 로더(connection 등)는 따로 갖는 로더 모음"""
+        return ModelLoaders(self._model_loaders)
+
+    def get(
+        self,
+        key: Hashable,
+        load_fn: Callable[[list[Any]], Awaitable[list[Any]]],
+        cache_key_fn: Callable[[Any], Hashable] | None = None,
+    ) -> DataLoader:
+        if key not in self._loaders:
+            self._loaders[key] = DataLoader(load_fn=load_fn, cache_key_fn=cache_key_fn)
+        return self._loaders[key]
+
+    def for_model(self, model: type[models.Model]) -> DataLoader:
+        if model not in self._model_loaders:
+            self._model_loaders[model] = DataLoader(load_fn=self._batch_load_fn(model))
+        return self._model_loaders[model]
+
+    def load(self, model: type[models.Model], pk: Any):
+        return self.for_model(model).load(pk)
+
+    @staticmethod
+    def _batch_load_fn(model: type[models.Model]):
+        async def load_fn(keys: list[Any]) -> list[models.Model | BaseException]:
+            objects = {obj.pk: obj async for obj in model.objects.filter(id__in=keys)}
+            return [
+                objects.get(key) or model.DoesNotExist(f"{model._meta.object_name} matching query does not exist.")
+                for key in keys
+            ]
+
+        return load_fn
+
+
+def with_own_loaders(context: Any) -> Any:
+    """같은 사용자·권한 캐시를 쓰되 응답 경로로 찾는 DataLoader 는 따로 갖는 컨텍스트 사본
+
+    한 요청 안에서 따로 실행하는 operation(배치의 각 operation, @defer/@stream 의 각 부분)마다 쓴다.
+    connection 로더 키는 응답 경로로 나뉘므로 operation 끼리 나눠 쓰면 서로의 결과를 받는다.
+    모델별 로더는 함께 써서 부분마다 다시 해석하는 조상·관계 객체를 한 번만 읽는다.
+    """
+    loaders: ModelLoaders | None = getattr(context, "loaders", None)
+    context = copy.copy(context)
+    context.loaders = loaders.fork() if loaders is not None else ModelLoaders()
+    return context
+
+
+def get_loaders(context: Any) -> ModelLoaders | None:
+    """지금 실행이 쓸 로더. `use_own_loaders` 로 이 태스크에 정한 로더가 컨텍스트의 로더보다 먼저다"""
+    loaders = _task_loaders.get()
+    return loaders if loaders is not None else getattr(context, "loaders", None)
+
+
+def use_own_loaders(context: Any) -> None:
+    """공유 컨텍스트는 바꾸지 않고, 지금 태스크에서만 `with_own_loaders` 로 만든 로더를 쓰게 한다
+
+    컨텍스트 객체를 갈아 끼울 수 없는 실행(한 웹소켓 연결의 구독들이 컨텍스트 하나를 함께 쓴다)에서 쓴다.
+    """
+    _task_loaders.set(with_own_loaders(context).loaders)
+
+
+class DataLoaderExtension(FieldExtension):
+    """ForeignKey 필드를 요청 컨텍스트의 `ModelLoaders` 로 해석하는 필드 확장
+
+    이미 캐시된 관계(select_related 등)나 로더가 없는 컨텍스트(execute_sync 등)는 기본 resolver 로 넘긴다.
+    """
+
+    field_name: str
+
+    def apply(self, field: StrawberryField) -> None:
+        self.field_name = getattr(field, "django_name", None) or field.python_name
+
+    def resolve(self, next_: SyncExtensionResolver, source: Any, info: Info, **kwargs: Any) -> Any:
+        loaders = get_loaders(info.context)
+        field = source._meta.get_field(self.field_name)
+
+        if loaders is None or field.is_cached(source) or field.attname not in source.__dict__:
+            return next_(source, info, **kwargs)
+
+        return loaders.load(field.related_model, source.__dict__[field.attname])
@@ -1,35 +1,211 @@
+from collections import defaultdict
+from typing import Any
+
 import strawberry
 import strawberry_django
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
 from strawberry import relay
+from strawberry.types import Info
+from strawberry_django.relay import resolve_model_node
 
+from play_with_gql import response_cache, subscriptions
 from play_with_gql.api.libraries.nodes import BookNode
 from play_with_gql.libraries.models.book import Book
+from play_with_gql.libraries.signals import DELETED, UPDATED, book_changed, subtract_book_counts
+
+# updateBooks / deleteBooks 한 번에 받는 최대 항목 수
+BULK_MUTATION_MAX_ITEMS = 10_000
+# VALUES 한 번에 담는 행 수. 행마다 (id + 바뀐 필드 수)개의 파라미터를 쓰므로 PostgreSQL 한도(65535) 아래로 유지한다
+BULK_UPDATE_BATCH_SIZE = 5_000
+BOOK_NOT_FOUND = "Book matching query does not exist."
+
+
+@strawberry.input
+class BookPatch:
+    id: relay.GlobalID
+    title: str | None = None
+    published_date: str | None = None
+
+
+@strawberry.type
+class BookMutationResult:
+    id: relay.GlobalID
+    ok: bool
+    error: str | None = None
+
+
+def _check_batch_size(items: list) -> None:
+    if len(items) > BULK_MUTATION_MAX_ITEMS:
+        raise ValueError(f"At most {BULK_MUTATION_MAX_ITEMS} items can be changed at once")
+
+
+def _book_pk(global_id: relay.GlobalID) -> Any:
+    if global_id.type_name != BookNode.__name__:
+        raise ValidationError(f"Expected a {BookNode.__name__} ID")
+    return Book._meta.pk.to_python(global_id.node_id)
+
+
+def _update_from_values(using: str, field_names: tuple[str, ...], rows: list[tuple]) -> dict[Any, Any]:
+    """(pk, *값) 행들을 `UPDATE ... FROM (VALUES ...)` 로 반영하고, 실제로 갱신된 {pk: library_id} 를 돌려준다"""
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    pk_field = Book._meta.pk
+    fields = [pk_field, *(Book._meta.get_field(name) for name in field_names)]
+    columns = ", ".join(quote_name(field.column) for field in fields)
+    # VALUES 의 타입 추론이 text 로 떨어지지 않도록 모든 값을 컬럼 타입으로 캐스팅한다
+    row_sql = "(" + ", ".join(f"CAST(%s AS {field.db_type(connection)})" for field in fields) + ")"
+    assignments = ", ".join(
+        [
+            *(f"{quote_name(field.column)} = v.{quote_name(field.column)}" for field in fields[1:]),
+            # auto_now 는 ORM 저장에서만 채워지므로 증분 export 의 워터마크를 직접 갱신한다
+            f"{quote_name(Book._meta.get_field('updated_at').column)} = STATEMENT_TIMESTAMP()",
+        ]
+    )
+    pk_column = quote_name(pk_field.column)
+    library_column = quote_name(Book._meta.get_field("library").column)
+
+    updated = {}
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BULK_UPDATE_BATCH_SIZE):
+            batch = rows[start : start + BULK_UPDATE_BATCH_SIZE]
+            cursor.execute(
+                f"UPDATE {quote_name(Book._meta.db_table)} AS book SET {assignments} "
+                f"FROM (VALUES {', '.join([row_sql] * len(batch))}) AS v ({columns}) "
+                f"WHERE book.{pk_column} = v.{pk_column} RETURNING book.{pk_column}, book.{library_column}",
+                [value for row in batch for value in row],
+            )
+            updated.update(cursor.fetchall())
+    return updated
 
 
 @strawberry.type
 class UpdateBookMutation:
     @strawberry_django.mutation
-    def update_book(
+    async def update_book(
         self,
+        info: Info,
         id: relay.GlobalID,
         title: str | None = None,
         published_date: str | None = None,
     ) -> BookNode:
-        book = Book.objects.get(pk=id.node_id)
+        changes = {
+            name: value for name, value in (("title", title), ("published_date", published_date)) if value is not None
+        }
+        if changes:
+            pk = Book._meta.pk.to_python(id.node_id)
+            values = [Book._meta.get_field(name).to_python(value) for name, value in changes.items()]
+            # 먼저 읽지 않고 바뀐 컬럼만 UPDATE 하고, 구독 알림에 쓸 library_id 는 RETURNING 으로 함께 받는다
+            # (title/published_date 는 book_count 와 무관)
+            updated = await sync_to_async(_update_from_values)(
+                router.db_for_write(Book), tuple(changes), [(pk, *values)]
+            )
+            if not updated:
+                raise Book.DoesNotExist(BOOK_NOT_FOUND)
+            await response_cache.ainvalidate(Book, [id.node_id])
+            await subscriptions.apublish([book_changed(UPDATED, pk, updated[pk])])
+        # 응답은 optimizer 가 선택된 필드만 읽도록 resolve_model_node 로 다시 조회한다
+        return await resolve_model_node(BookNode, id.node_id, info=info, required=True)
+
+    @strawberry_django.mutation(description="Apply patches to many books with a few set-based UPDATE statements.")
+    def update_books(self, patches: list[BookPatch]) -> list[BookMutationResult]:
+        _check_batch_size(patches)
+        results = [BookMutationResult(id=patch.id, ok=False) for patch in patches]
+        pks: list[Any] = [None] * len(patches)
+        changes: dict[Any, dict[str, Any]] = {}
+        for i, patch in enumerate(patches):
+            try:
+                pks[i] = _book_pk(patch.id)
+                values = {
+                    name: Book._meta.get_field(name).clean(value, None)
+                    for name in ("title", "published_date")
+                    if (value := getattr(patch, name)) is not None
+                }
+            except ValidationError as e:
+                results[i].error = " ".join(e.messages)
+                continue
+            # 같은 책의 패치는 순서대로 합친다
+            changes.setdefault(pks[i], {}).update(values)
+
+        # 바뀐 필드 조합별로 UPDATE 하므로 패치에 없는 필드는 건드리지 않는다
+        rows_by_fields: defaultdict[tuple[str, ...], list[tuple]] = defaultdict(list)
+        for pk, values in changes.items():
+            rows_by_fields[tuple(values)].append((pk, *values.values()))
 
-        if title is not None:
-            book.title = title
-        if published_date is not None:
-            book.published_date = published_date
+        # Book.objects.db 는 읽기 alias(복제본일 수 있다)이므로 쓰기 alias 를 라우터에게 묻는다
+        using = router.db_for_write(Book)
+        with transaction.atomic(using=using):
+            # 바꿀 값이 없는 패치는 존재 여부만 확인한다 (같은 트랜잭션 안에서 쓰기 DB 로 읽는다)
+            unchanged = [pk for pk, *_ in rows_by_fields.pop((), [])]
+            found = (
+                set(Book.objects.using(using).filter(pk__in=unchanged).values_list("pk", flat=True))
+                if unchanged
+                else set()
+            )
+            updated: dict[Any, Any] = {}
+            for field_names, rows in rows_by_fields.items():
+                updated |= _update_from_values(using, field_names, rows)
+            found |= updated.keys()
+            # 시그널을 거치지 않는 UPDATE 이므로 캐시된 응답 무효화와 구독자 알림도 직접 한다
+            response_cache.invalidate(Book, found)
+            subscriptions.publish(book_changed(UPDATED, pk, library_id) for pk, library_id in updated.items())
 
-        book.save()
-        return book
+        return _finish_results(results, pks, found)
 
 
 @strawberry.type
 class DeleteBookMutation:
     @strawberry_django.mutation
-    def delete_book(self, id: relay.GlobalID) -> bool:
-        book = Book.objects.get(pk=id.node_id)
-        book.delete()
+    async def delete_book(self, id: relay.GlobalID) -> bool:
+        # 조회·삭제·book_count 갱신 시그널이 sync_to_async 한 번 안에서 끝난다
+        deleted, _ = await Book.objects.filter(pk=id.node_id).adelete()
+        if not deleted:
+            raise Book.DoesNotExist(BOOK_NOT_FOUND)
         return True
+
+    @strawberry_django.mutation(description="Delete many books with a single DELETE statement.")
+    def delete_books(self, ids: list[relay.GlobalID]) -> list[BookMutationResult]:
+        _check_batch_size(ids)
+        results = [BookMutationResult(id=global_id, ok=False) for global_id in ids]
+        pks: list[Any] = [None] * len(ids)
+        for i, global_id in enumerate(ids):
+            try:
+                pks[i] = _book_pk(global_id)
+            except ValidationError as e:
+                results[i].error = " ".join(e.messages)
+
+        using = router.db_for_write(Book)
+        connection = connections[using]
+        quote_name = connection.ops.quote_name
+        pk_column = quote_name(Book._meta.pk.column)
+        parent_columns = [quote_name(Book._meta.get_field(attname).column) for attname in Book.COUNTED_PARENT_IDS]
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            # Book 을 참조하는 모델이 없어 cascade 수집이 필요 없다.
+            # QuerySet.delete() 는 post_delete 수신자 때문에 행마다 시그널을 보내므로,
+            # 지운 행의 부모 id 를 RETURNING 으로 받아 book_count 를 한 번에 맞춘다
+            cursor.execute(
+                f"DELETE FROM {quote_name(Book._meta.db_table)} WHERE {pk_column} = ANY(%s) "
+                f"RETURNING {pk_column}, {', '.join(parent_columns)}",
+                [list({pk for pk in pks if pk is not None})],
+            )
+            deleted = cursor.fetchall()
+            deleted_parent_ids = {pk: dict(zip(Book.COUNTED_PARENT_IDS, parent_ids)) for pk, *parent_ids in deleted}
+            subtract_book_counts(deleted_parent_ids.values())
+            response_cache.invalidate(Book, deleted_parent_ids)
+            subscriptions.publish(
+                book_changed(DELETED, pk, parent_ids["library_id"]) for pk, parent_ids in deleted_parent_ids.items()
+            )
+
+        return _finish_results(results, pks, {pk for pk, *_ in deleted})
+
+
+def _finish_results(results: list[BookMutationResult], pks: list[Any], found: set[Any]) -> list[BookMutationResult]:
+    for result, pk in zip(results, pks):
+        if result.error is not None:
+            continue
+        if pk in found:
+            result.ok = True
+        else:
+            result.error = BOOK_NOT_FOUND
+    return results
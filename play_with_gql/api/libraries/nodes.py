@@ -1,9 +1,9 @@
-from typing import Iterable
-
 import strawberry_django
 from strawberry import auto, relay
-from strawberry_django.relay import ListConnectionWithTotalCount
 
+from play_with_gql.api.libraries.connections import KeysetConnectionWithTotalCount, batched_connection
+from play_with_gql.api.libraries.counts import TotalCountKind
+from play_with_gql.api.libraries.loaders import DataLoaderExtension
 from play_with_gql.libraries.models.author import Author
 from play_with_gql.libraries.models.book import Book
 from play_with_gql.libraries.models.library import Library
@@ -12,25 +12,24 @@ from play_with_gql.libraries.models.library import Library
 @strawberry_django.type(Library)
 class LibraryNode(relay.Node):
     name: str
-
-    @strawberry_django.connection(ListConnectionWithTotalCount["BookNode"])
-    def books(self, root: Library, info) -> Iterable[Book]:
-        return Book.objects.filter(library=root)
+    # 부모별 keyset 페이지는 BatchedConnectionExtension 이 요청 단위로 묶어 한 번에 가져온다
+    books: KeysetConnectionWithTotalCount["BookNode"] = batched_connection(
+        total_count=TotalCountKind.COUNTER, counter_field="book_count"
+    )
 
 
 @strawberry_django.type(Author)
 class AuthorNode(relay.Node):
     name: str
     title: str
-
-    @strawberry_django.connection(ListConnectionWithTotalCount["BookNode"])
-    def books(self, root: Author, info) -> Iterable[Book]:
-        return Book.objects.filter(author=root)
+    books: KeysetConnectionWithTotalCount["BookNode"] = batched_connection(
+        total_count=TotalCountKind.COUNTER, counter_field="book_count"
+    )
 
 
 @strawberry_django.type(Book)
 class BookNode(relay.Node):
     title: str
-    author: AuthorNode
-    library: "LibraryNode"
+    author: AuthorNode = strawberry_django.field(extensions=[DataLoaderExtension()])
+    library: "LibraryNode" = strawberry_django.field(extensions=[DataLoaderExtension()])
     published_date: auto
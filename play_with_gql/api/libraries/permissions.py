@@ -1,11 +1,12 @@
-import base64
+import asyncio
 from typing import Any
 
-from asgiref.sync import sync_to_async
+from strawberry import relay
 from strawberry.exceptions import StrawberryGraphQLError
 from strawberry.permission import BasePermission
 from strawberry.types import Info
 
+from play_with_gql import replicas, response_cache, tracing
 from play_with_gql.libraries.models.librarian import Librarian
 
 
@@ -22,20 +23,68 @@ class GraphQLError(StrawberryGraphQLError):
         )
 
 
+class PermissionCache:
+    """요청 단위로 생성되는 권한 캐시
+
+    처음 필요할 때 사용자가 사서로 있는 도서관 id 를 한 번의 쿼리로 모두 읽고, 이후 검사는 메모리에서 끝낸다.
+    """
+
+    def __init__(self, user: Any):
+        self.user = user
+        self._librarian_library_ids: set[str] | None = None
+        # 같은 요청의 필드들이 동시에 검사해도 쿼리는 한 번만 나가게 한다
+        self._lock = asyncio.Lock()
+
+    async def is_librarian(self, library_id: str) -> bool:
+        return library_id in await self._alibrarian_library_ids()
+
+    async def _alibrarian_library_ids(self) -> set[str]:
+        # 캐시된 응답이 사서 지정·해제 뒤에도 남지 않도록 Librarian 에 의존한다고 기록한다
+        response_cache.record(Librarian)
+        async with self._lock:
+            if self._librarian_library_ids is None:
+                if self.user.is_authenticated:
+                    library_ids = Librarian.objects.filter(user=self.user).values_list("library_id", flat=True)
+                    # 사서 지정·해제가 복제 지연 없이 바로 반영되도록 primary 에서 읽는다
+                    with replicas.primary():
+                        # GlobalID 의 node_id 는 문자열이므로 문자열로 맞춰 둔다
+                        self._librarian_library_ids = {str(library_id) async for library_id in library_ids}
+                else:
+                    self._librarian_library_ids = set()
+        return self._librarian_library_ids
+
+
+def get_permission_cache(info: Info) -> PermissionCache:
+    context = info.context
+    cache = getattr(context, "permissions", None)
+    if cache is None:
+        # get_context 를 거치지 않은 컨텍스트(execute 직접 호출 등)는 처음 쓸 때 붙인다
+        cache = context.permissions = PermissionCache(context.user)
+    return cache
+
+
 class IsAuthenticated(BasePermission):
-    @sync_to_async
-    def has_permission(self, source: Any, info: Info, **kwargs) -> bool:
-        if not info.context.request.user.is_authenticated:
-            raise GraphQLError("Unauthenticated")
-        return True
+    async def has_permission(self, source: Any, info: Info, **kwargs) -> bool:
+        # get_context 에서 해석해 둔 사용자를 쓰므로 스레드 전환이나 쿼리가 없다
+        with tracing.span("IsAuthenticated.has_permission"):
+            if not info.context.user.is_authenticated:
+                raise GraphQLError("Unauthenticated")
+            return True
 
 
 class IsLibrarian(BasePermission):
-    @sync_to_async
-    def has_permission(self, source: Any, info: Info, **kwargs) -> bool:
-        node_id = kwargs["node_id"]
-        decoded = base64.b64decode(node_id).decode()
-        database_id = decoded.split(":")[-1]
-        if not Librarian.objects.filter(library_id=database_id, user=info.context.user).exists():
+    async def has_permission(self, source: Any, info: Info, **kwargs) -> bool:
+        with tracing.span("IsLibrarian.has_permission"):
+            return await self._has_permission(info, **kwargs)
+
+    async def _has_permission(self, info: Info, **kwargs) -> bool:
+        try:
+            # library(nodeId) 와 bookChanged(libraryId) 에서 쓴다
+            global_id = relay.GlobalID.from_id(kwargs["node_id"] if "node_id" in kwargs else kwargs["library_id"])
+        except ValueError:
+            raise GraphQLError("Forbidden")
+        if global_id.type_name != "LibraryNode" or not await get_permission_cache(info).is_librarian(
+            global_id.node_id
+        ):
             raise GraphQLError("Forbidden")
         return True
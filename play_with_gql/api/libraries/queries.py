@@ -1,22 +1,27 @@
-import base64
 from typing import Any
 
 import strawberry
 import strawberry_django
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import Q, QuerySet
 from strawberry import auto, relay
 from strawberry.types import Info
+from strawberry_django.fields.field import StrawberryDjangoField
+from strawberry_django.relay import resolve_model_node
 
+from play_with_gql.api.libraries.connections import KeysetConnectionWithTotalCount, keyset_connection
 from play_with_gql.api.libraries.nodes import BookNode, LibraryNode
 from play_with_gql.api.libraries.permissions import IsAuthenticated, IsLibrarian
-from play_with_gql.libraries.models.book import Book
-from play_with_gql.libraries.models.library import Library
+from play_with_gql.incremental import stream_initial_count
+from play_with_gql.libraries.models.book import TITLE_SEARCH_CONFIG, Book
+from play_with_gql.response_cache import USER_SCOPED
 
 
 @strawberry.type
 class GetNodeQuery:
     node: relay.Node = relay.node()
 
-    @strawberry.field
+    @strawberry.field(metadata={USER_SCOPED: True})
     async def me(self, info: Info) -> str | None:
         context = info.context
         if context.user.is_authenticated:
@@ -29,21 +34,55 @@ class GetNodeQuery:
 class GetLibraryQuery:
     @strawberry.field(permission_classes=[IsAuthenticated, IsLibrarian])
     async def library(self, info: Info, node_id: str) -> LibraryNode:
-        # base64로 인코딩된 ID에서 실제 ID 부분만 추출
         try:
-            decoded = base64.b64decode(node_id).decode()
-            real_id = decoded.split(":")[-1]
-            library = await Library.objects.aget(id=real_id)
-            return library
-        except (ValueError, IndexError):
+            global_id = relay.GlobalID.from_id(node_id)
+        except ValueError:
             raise ValueError("Invalid library ID format")
+        # optimizer 가 선택된 필드(only)와 중첩 books prefetch 를 적용할 수 있도록 resolve_model_node 사용
+        return await resolve_model_node(LibraryNode, global_id.node_id, info=info, required=True)
 
 
 @strawberry_django.filter(Book, lookups=True)
 class BookFilter:
+    # exact/startsWith, iExact/iStartsWith 는 b-tree(pattern_ops) 인덱스를,
+    # contains/iContains/regex 는 pg_trgm GIN 인덱스를 탄다
     title: auto
 
+    @strawberry_django.filter_field(description="Full-text search on title. Results are ordered by relevance.")
+    def search(self, queryset: QuerySet, value: str, prefix: str) -> tuple[QuerySet, Q]:
+        # book_title_search_idx 와 같은 식이어야 GIN 인덱스를 쓴다
+        vector = SearchVector(f"{prefix}title", config=TITLE_SEARCH_CONFIG)
+        query = SearchQuery(value, config=TITLE_SEARCH_CONFIG, search_type="websearch")
+        queryset = queryset.alias(search_vector=vector).annotate(search_rank=SearchRank(vector, query))
+        return queryset.order_by("-search_rank"), Q(search_vector=query)
+
+
+# 최상위 books 조회 한 번에 실을 수 있는 최대 행 수와 first/last 생략 시의 기본 페이지 크기
+BOOKS_MAX_RESULTS = 100
+BOOKS_DEFAULT_LIMIT = 20
+
+
+class CappedListField(StrawberryDjangoField):
+    """조회 행 수를 `BOOKS_MAX_RESULTS` 로 제한하는 리스트 필드. 전체 테이블이 한 응답에 실리지 않게 한다"""
+
+    max_results = BOOKS_MAX_RESULTS
+
+    def get_queryset(self, queryset, info, **kwargs):
+        queryset = super().get_queryset(queryset, info, **kwargs)
+        if not queryset.ordered:
+            queryset = queryset.order_by("pk")
+        # @stream 의 처음 응답은 initialCount 개만 읽는다 (나머지는 stream 부분이 읽는다)
+        initial_count = stream_initial_count(info)
+        return queryset[: min(self.max_results, initial_count) if initial_count is not None else self.max_results]
+
 
 @strawberry.type
 class GetBooksQuery:
-    books: list[BookNode] = strawberry_django.field(filters=BookFilter)
+    books: list[BookNode] = strawberry_django.field(
+        field_cls=CappedListField,
+        filters=BookFilter,
+        deprecation_reason=f"Returns at most {BOOKS_MAX_RESULTS} books. Use booksConnection to page through them.",
+    )
+    books_connection: KeysetConnectionWithTotalCount[BookNode] = keyset_connection(
+        filters=BookFilter, max_results=BOOKS_MAX_RESULTS, default_limit=BOOKS_DEFAULT_LIMIT
+    )
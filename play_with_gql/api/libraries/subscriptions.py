@@ -0,0 +1,89 @@
+import enum
+from collections.abc import AsyncGenerator, AsyncIterator
+from typing import Any
+
+import strawberry
+from strawberry import relay
+from strawberry.types import Info
+
+from play_with_gql import subscriptions
+from play_with_gql.api.libraries.loaders import use_own_loaders
+from play_with_gql.api.libraries.nodes import BookNode, LibraryNode
+from play_with_gql.api.libraries.permissions import IsAuthenticated, IsLibrarian
+from play_with_gql.libraries.models.book import Book
+from play_with_gql.libraries.models.library import Library
+from play_with_gql.libraries.signals import book_topic, library_topic
+
+
+@strawberry.enum(description="What happened to the object.")
+class ChangeKind(enum.Enum):
+    CREATED = "CREATED"
+    UPDATED = "UPDATED"
+    DELETED = "DELETED"
+
+
+@strawberry.type
+class BookChange:
+    kind: ChangeKind
+    id: relay.GlobalID
+    event: strawberry.Private[subscriptions.Event]
+
+    @strawberry.field(description="The book after the change. null when it was deleted.")
+    async def book(self) -> BookNode | None:
+        if self.kind is ChangeKind.DELETED:
+            return None
+        # 같은 이벤트를 받은 구독자들이 한 번 읽은 행을 나눠 쓴다. author/library 는 select_related 로 로더를 건너뛴다
+        return await self.event.shared(
+            "book",
+            lambda: Book.objects.select_related("author", "library").filter(pk=self.event.payload["id"]).afirst(),
+        )
+
+
+@strawberry.type
+class LibraryChange:
+    kind: ChangeKind
+    id: relay.GlobalID
+    event: strawberry.Private[subscriptions.Event]
+
+    @strawberry.field(description="The library after the change. null when it was deleted.")
+    async def library(self) -> LibraryNode | None:
+        if self.kind is ChangeKind.DELETED:
+            return None
+        return await self.event.shared("library", lambda: Library.objects.filter(pk=self.event.payload["id"]).afirst())
+
+
+async def _events(info: Info, topic: str) -> AsyncIterator[subscriptions.Event]:
+    async for event in subscriptions.subscribe(topic):
+        # 연결의 컨텍스트는 같은 연결의 구독들이 함께 쓰므로 바꾸지 않는다. 구독마다 실행 태스크가 따로이므로
+        # 이 태스크에서만 쓰는 새 로더를 이벤트마다 정해 이전 이벤트의 행을 다시 쓰지 않게 한다
+        use_own_loaders(info.context)
+        yield event
+
+
+def _global_id(node: type[Any], pk: Any) -> relay.GlobalID:
+    return relay.GlobalID(node.__name__, str(pk))
+
+
+@strawberry.type
+class LibrarySubscription:
+    @strawberry.subscription(
+        permission_classes=[IsAuthenticated, IsLibrarian],
+        description="Books created, updated or deleted in the library.",
+    )
+    async def book_changed(self, info: Info, library_id: str) -> AsyncGenerator[BookChange, None]:
+        topic = book_topic(relay.GlobalID.from_id(library_id).node_id)
+        async for event in _events(info, topic):
+            yield BookChange(
+                kind=ChangeKind(event.payload["kind"]), id=_global_id(BookNode, event.payload["id"]), event=event
+            )
+
+    @strawberry.subscription(
+        permission_classes=[IsAuthenticated, IsLibrarian],
+        description="Changes to the library itself.",
+    )
+    async def library_updated(self, info: Info, node_id: str) -> AsyncGenerator[LibraryChange, None]:
+        topic = library_topic(relay.GlobalID.from_id(node_id).node_id)
+        async for event in _events(info, topic):
+            yield LibraryChange(
+                kind=ChangeKind(event.payload["kind"]), id=_global_id(LibraryNode, event.payload["id"]), event=event
+            )
@@ -1,18 +1,56 @@
+import asyncio
 import base64
+import contextlib
+import importlib
+import json
+import threading
+from collections.abc import AsyncIterator
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
 from typing import Any
 
 import pytest
+import strawberry
+import strawberry_django
 from asgiref.sync import sync_to_async
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
 from django.db.models import Model
-from django.test.client import AsyncClient
+from django.test.client import AsyncClient, AsyncRequestFactory
+from django.test.utils import CaptureQueriesContext
 from factory.fuzzy import FuzzyText
-
+from strawberry.schema import execute as strawberry_execute
+from strawberry.types import ExecutionResult
+from strawberry_django.fields.filter_types import FilterLookup
+from strawberry_django.optimizer import DjangoOptimizerExtension
+
+from play_with_gql import subscriptions
+from play_with_gql.api.libraries.counts import TotalCountKind, count_per_parent
+from play_with_gql.api.libraries.loaders import ModelLoaders
+from play_with_gql.api.libraries.nodes import AuthorNode
+from play_with_gql.api.libraries.queries import BOOKS_DEFAULT_LIMIT, BOOKS_MAX_RESULTS, BookFilter
+from play_with_gql.consumers import SubscriptionContext
+from play_with_gql.encoders import OrjsonEncoder, StdlibEncoder, aiter_encode
+from play_with_gql.incremental import execute_incrementally, plan_incremental
 from play_with_gql.libraries.models.author import Author
 from play_with_gql.libraries.models.book import Book
 from play_with_gql.libraries.models.librarian import Librarian
 from play_with_gql.libraries.models.library import Library
+from play_with_gql.libraries.signals import UPDATED, book_changed, refresh_book_counts
+from play_with_gql.n_plus_one import NPlusOneExtension, normalize_sql
+from play_with_gql.persisted_queries import PersistedQueries, document_cache, sha256_hash
+from play_with_gql.replicas import ReplicaExtension, ReplicaExtensionSync, ReplicaRouter
+from play_with_gql.response_cache import ResponseCache
 from play_with_gql.schema import schema
+from play_with_gql.subscriptions import Hub, PostgresBackend, hub
+from play_with_gql.users.auth import aget_request_user, session_user_cache
 from play_with_gql.users.models import User
+from play_with_gql.views import AsyncGraphQLView
 
 
 @pytest.fixture
@@ -30,6 +68,26 @@ def book(library: Library, author: Author) -> Book:
     return Book.objects.create(title="Test Book", author=author, library=library, published_date="2024-01-01")
 
 
+@pytest.fixture(autouse=True)
+def fail_on_n_plus_one(settings):
+    """operation 안에서 같은 모양의 SQL 이 반복되면 `NPlusOneError` 로 operation 을 실패시킨다"""
+    settings.GRAPHQL_N_PLUS_ONE_THRESHOLD = 2
+    settings.GRAPHQL_N_PLUS_ONE_RAISE = True
+
+
+@pytest.fixture(autouse=True)
+def read_from_primary(settings):
+    """복제본 alias 를 쓰려면 테스트마다 `databases` 에 넣어야 하므로 기본으로는 primary 에서 읽는다"""
+    settings.DATABASE_REPLICA_ALIAS = None
+
+
+async def acreate_book() -> Book:
+    """async 테스트용 `book` 픽스처. async ORM 이 쓰는 커넥션에 만든다"""
+    library = await Library.objects.acreate(name="Test Library")
+    author = await Author.objects.acreate(name="Test Author", title="Professor")
+    return await Book.objects.acreate(title="Test Book", author=author, library=library, published_date="2024-01-01")
+
+
 def to_global_id(instance: Model) -> str:
     return base64.b64encode(f"{instance.__class__.__name__}Node:{instance.pk}".encode()).decode()
 
@@ -39,6 +97,24 @@ def execute_query(query: str, variables: dict[str, Any] | None = None):
     return schema.execute_sync(query, variable_values=variables)
 
 
+async def execute_query_async(query: str, variables: dict[str, Any] | None = None):
+    """요청 컨텍스트(DataLoader 포함)와 함께 GraphQL 쿼리를 비동기로 실행하는 헬퍼"""
+    context = SimpleNamespace(loaders=ModelLoaders())
+    return await schema.execute(query, variable_values=variables, context_value=context)
+
+
+@contextlib.asynccontextmanager
+async def acapture_queries(using: str = DEFAULT_DB_ALIAS) -> AsyncIterator[CaptureQueriesContext]:
+    """sync_to_async 스레드의 DB 커넥션에서 실행된 쿼리를 수집하는 헬퍼"""
+    # connection 프록시는 스레드별로 해석되므로 실제 커넥션 객체를 해당 스레드에서 가져온다
+    context = CaptureQueriesContext(await sync_to_async(lambda: connections[using])())
+    await sync_to_async(context.__enter__)()
+    try:
+        yield context
+    finally:
+        await sync_to_async(context.__exit__)(None, None, None)
+
+
 @pytest.mark.django_db
 def test_get_library_with_books(library: Library, author: Author, book: Book):
     query = """
@@ -264,6 +340,57 @@ async def test_me_query_with_invalid_session():
     assert data["data"]["me"] is None
 
 
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_session_user_is_resolved_with_at_most_one_query():
+    user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    client = AsyncClient()
+    await client.aforce_login(user)
+    session_key = client.cookies["sessionid"].value
+    session_user_cache.clear()
+
+    def session_request():
+        request = AsyncRequestFactory().post("/graphql/")
+        request.session = SessionStore(session_key)
+        return request
+
+    # 세션은 cached_db 캐시에서 읽으므로 사용자 조회 1회뿐
+    async with acapture_queries() as queries:
+        resolved = await aget_request_user(session_request())
+    assert resolved == user
+    assert len(queries) <= 1
+
+    # 같은 세션 키는 TTL 동안 쿼리 없이 캐시에서 꺼낸다
+    async with acapture_queries() as queries:
+        resolved = await aget_request_user(session_request())
+    assert resolved == user
+    assert len(queries) == 0
+
+    # 로그아웃하면 캐시에서도 빠진다
+    await client.alogout()
+    resolved = await aget_request_user(session_request())
+    assert not resolved.is_authenticated
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_session_user_cache_is_cleared_on_password_change():
+    user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    client = AsyncClient()
+    await client.aforce_login(user)
+    request = AsyncRequestFactory().post("/graphql/")
+    request.session = SessionStore(client.cookies["sessionid"].value)
+    assert await aget_request_user(request) == user
+
+    user.set_password("changed-password")
+    await user.asave()
+
+    # 세션 해시가 더 이상 맞지 않으므로 익명 사용자로 본다
+    request = AsyncRequestFactory().post("/graphql/")
+    request.session = SessionStore(client.cookies["sessionid"].value)
+    assert not (await aget_request_user(request)).is_authenticated
+
+
 @pytest.mark.django_db
 @pytest.mark.asyncio
 async def test_get_library_with_librarian_permission():
@@ -365,7 +492,44 @@ async def test_get_library_without_auth():
 
 
 @pytest.mark.django_db
-def test_update_book_mutation(book: Book):
+@pytest.mark.asyncio
+async def test_librarian_permission_is_loaded_once_per_request():
+    user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    libraries = [await Library.objects.acreate(name=f"Library {i}") for i in range(3)]
+    for library in libraries[:2]:
+        await Librarian.objects.acreate(user=user, library=library)
+
+    query = """
+    query GetLibraries($first: String!, $second: String!) {
+      first: library(nodeId: $first) { name }
+      second: library(nodeId: $second) { name }
+    }
+    """
+    context = SimpleNamespace(user=user, loaders=ModelLoaders())
+
+    async with acapture_queries() as queries:
+        result = await schema.execute(
+            query,
+            variable_values={"first": to_global_id(libraries[0]), "second": to_global_id(libraries[1])},
+            context_value=context,
+        )
+        forbidden = await schema.execute(
+            query,
+            variable_values={"first": to_global_id(libraries[0]), "second": to_global_id(libraries[2])},
+            context_value=context,
+        )
+
+    assert result.errors is None
+    assert result.data == {"first": {"name": "Library 0"}, "second": {"name": "Library 1"}}
+    assert [error.message for error in forbidden.errors] == ["Forbidden"]
+    # 같은 요청 컨텍스트의 권한 검사 네 번이 사서 목록 쿼리 하나를 공유한다
+    assert sum("libraries_librarian" in query["sql"] for query in queries.captured_queries) == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_update_book_mutation():
+    book = await acreate_book()
     query = """
     mutation UpdateBook($id: GlobalID!, $title: String) {
       updateBook(id: $id, title: $title) {
@@ -378,19 +542,24 @@ def test_update_book_mutation(book: Book):
 
     variables = {"id": to_global_id(book), "title": "Updated Book Title"}
 
-    result = execute_query(query, variables)
+    async with acapture_queries() as queries:
+        result = await execute_query_async(query, variables)
 
     assert result.errors is None
     data = result.data["updateBook"]
     assert data["title"] == "Updated Book Title"
+    # UPDATE ... RETURNING (구독 알림의 library_id) 과 응답 조회 한 번씩
+    assert [query["sql"].split()[0] for query in queries.captured_queries] == ["UPDATE", "SELECT"]
 
     # DB에서 실제로 업데이트되었는지 확인
-    updated_book = Book.objects.get(id=book.id)
+    updated_book = await Book.objects.aget(id=book.id)
     assert updated_book.title == "Updated Book Title"
 
 
 @pytest.mark.django_db
-def test_update_book_partial_mutation(book: Book):
+@pytest.mark.asyncio
+async def test_update_book_partial_mutation():
+    book = await acreate_book()
     query = """
     mutation UpdateBook($id: GlobalID!, $title: String) {
       updateBook(id: $id, title: $title) {
@@ -403,7 +572,7 @@ def test_update_book_partial_mutation(book: Book):
 
     variables = {"id": to_global_id(book), "title": "Only Title Updated"}
 
-    result = execute_query(query, variables)
+    result = await execute_query_async(query, variables)
 
     assert result.errors is None
     data = result.data["updateBook"]
@@ -411,13 +580,15 @@ def test_update_book_partial_mutation(book: Book):
     assert data["publishedDate"] == "2024-01-01"  # 원래 날짜가 유지되어야 함
 
     # DB에서 실제로 업데이트되었는지 확인
-    updated_book = Book.objects.get(id=book.id)
+    updated_book = await Book.objects.aget(id=book.id)
     assert updated_book.title == "Only Title Updated"
     assert str(updated_book.published_date) == "2024-01-01"
 
 
 @pytest.mark.django_db
-def test_delete_book_mutation(book: Book):
+@pytest.mark.asyncio
+async def test_delete_book_mutation():
+    book = await acreate_book()
     query = """
     mutation DeleteBook($id: GlobalID!) {
       deleteBook(id: $id)
@@ -426,17 +597,18 @@ def test_delete_book_mutation(book: Book):
 
     variables = {"id": to_global_id(book)}
 
-    result = execute_query(query, variables)
+    result = await execute_query_async(query, variables)
 
     assert result.errors is None
     assert result.data["deleteBook"] is True
 
     # DB에서 실제로 삭제되었는지 확인
-    assert not Book.objects.filter(id=book.id).exists()
+    assert not await Book.objects.filter(id=book.id).aexists()
 
 
 @pytest.mark.django_db
-def test_update_book_with_invalid_id():
+@pytest.mark.asyncio
+async def test_update_book_with_invalid_id():
     query = """
     mutation UpdateBook($id: GlobalID!, $title: String) {
       updateBook(id: $id, title: $title) {
@@ -451,7 +623,7 @@ def test_update_book_with_invalid_id():
         "title": "This Should Fail",
     }
 
-    result = execute_query(query, variables)
+    result = await execute_query_async(query, variables)
 
     assert result.errors is not None
     assert len(result.errors) > 0
@@ -459,7 +631,8 @@ def test_update_book_with_invalid_id():
 
 
 @pytest.mark.django_db
-def test_delete_book_with_invalid_id():
+@pytest.mark.asyncio
+async def test_delete_book_with_invalid_id():
     query = """
     mutation DeleteBook($id: GlobalID!) {
       deleteBook(id: $id)
@@ -470,13 +643,86 @@ def test_delete_book_with_invalid_id():
         "id": to_global_id(Book(id=99999))  # 존재하지 않는 ID
     }
 
-    result = execute_query(query, variables)
+    result = await execute_query_async(query, variables)
 
     assert result.errors is not None
     assert len(result.errors) > 0
     assert "Book matching query does not exist" in str(result.errors[0])
 
 
+@pytest.mark.django_db
+def test_update_books_mutation(library: Library, author: Author):
+    books = [
+        Book.objects.create(title=f"Book {i}", library=library, author=author, published_date="2024-01-01")
+        for i in range(3)
+    ]
+    query = """
+    mutation UpdateBooks($patches: [BookPatch!]!) {
+      updateBooks(patches: $patches) {
+        id
+        ok
+        error
+      }
+    }
+    """
+    patches = [
+        {"id": to_global_id(books[0]), "title": "Renamed"},
+        {"id": to_global_id(books[1]), "title": "Redated", "publishedDate": "2025-02-03"},
+        {"id": to_global_id(books[2]), "publishedDate": "not a date"},
+        {"id": to_global_id(Book(id=99999)), "title": "Missing"},
+        {"id": to_global_id(library), "title": "Not a book"},
+    ]
+
+    with CaptureQueriesContext(connection) as queries:
+        result = execute_query(query, {"patches": patches})
+
+    assert result.errors is None
+    assert [item["ok"] for item in result.data["updateBooks"]] == [True, True, False, False, False]
+    assert result.data["updateBooks"][3]["error"] == "Book matching query does not exist."
+    # 바뀐 필드 조합(title / title+published_date)마다 UPDATE 한 번씩
+    assert sum(query["sql"].startswith("UPDATE") for query in queries.captured_queries) == 2
+
+    books = Book.objects.filter(library=library).order_by("id")
+    assert [(book.title, str(book.published_date)) for book in books] == [
+        ("Renamed", "2024-01-01"),
+        ("Redated", "2025-02-03"),
+        ("Book 2", "2024-01-01"),
+    ]
+
+
+@pytest.mark.django_db
+def test_delete_books_mutation_keeps_book_counts(library: Library, author: Author):
+    other_library = Library.objects.create(name="Other Library")
+    books = [
+        Book.objects.create(
+            title=f"Book {i}", library=library if i < 3 else other_library, author=author, published_date="2024-01-01"
+        )
+        for i in range(4)
+    ]
+    query = """
+    mutation DeleteBooks($ids: [GlobalID!]!) {
+      deleteBooks(ids: $ids) {
+        ok
+        error
+      }
+    }
+    """
+    ids = [to_global_id(book) for book in (books[0], books[1], books[3])] + [to_global_id(Book(id=99999))]
+
+    with CaptureQueriesContext(connection) as queries:
+        result = execute_query(query, {"ids": ids})
+
+    assert result.errors is None
+    assert [item["ok"] for item in result.data["deleteBooks"]] == [True, True, True, False]
+    assert list(Book.objects.filter(author=author).values_list("id", flat=True)) == [books[2].id]
+    # DELETE 1회 + 부모별 delta 묶음마다 UPDATE 1회 (library 2개는 delta 가 달라 2회, author 1회)
+    assert len([query for query in queries.captured_queries if "SAVEPOINT" not in query["sql"]]) == 4
+    library.refresh_from_db()
+    other_library.refresh_from_db()
+    author.refresh_from_db()
+    assert (library.book_count, other_library.book_count, author.book_count) == (1, 0, 1)
+
+
 @pytest.mark.django_db
 def test_get_books_filtered_by_title_icontains(library: Library, author: Author):
     # 테스트용 책들 생성
@@ -552,3 +798,1529 @@ def test_get_books_with_no_matches(library: Library, author: Author):
     assert result.errors is None
     books = result.data["books"]
     assert len(books) == 0  # 매칭되는 책이 없어야 함
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_get_books_with_author_and_library_query_count_is_constant():
+    query = """
+    query GetBooksByTitle($title: String!) {
+      books(filters: { title: { startsWith: $title } }) {
+        title
+        author {
+          name
+        }
+        library {
+          name
+        }
+      }
+    }
+    """
+
+    query_counts = []
+    for count in (2, 10):
+        prefix = FuzzyText().fuzz()
+        for i in range(count):
+            library = await sync_to_async(Library.objects.create)(name=f"Library {i}")
+            author = await sync_to_async(Author.objects.create)(name=f"Author {i}", title="Dr")
+            await sync_to_async(Book.objects.create)(
+                title=f"{prefix} {i}", author=author, library=library, published_date="2024-01-01"
+            )
+
+        # optimizer 의 select_related 없이 DataLoader 만으로 배치되는지 확인
+        with DjangoOptimizerExtension.disabled():
+            async with acapture_queries() as queries:
+                result = await execute_query_async(query, {"title": prefix})
+
+        assert result.errors is None
+        assert len(result.data["books"]) == count
+        query_counts.append(len(queries))
+
+    # books 1회 + author 1회 + library 1회, 책 수와 무관해야 함
+    assert query_counts == [3, 3]
+
+
+@pytest.mark.django_db
+def test_get_library_with_books_is_optimized(library: Library, author: Author):
+    for i in range(3):
+        Book.objects.create(title=f"Book {i}", author=author, library=library, published_date="2024-01-01")
+
+    query = """
+    query GetLibraryWithBooks($id: GlobalID!, $first: Int) {
+      node(id: $id) {
+        ... on LibraryNode {
+          name
+          books(first: $first) {
+            totalCount
+            totalCountKind
+            edges {
+              node {
+                title
+                author {
+                  name
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+    """
+
+    with CaptureQueriesContext(connection) as queries:
+        result = execute_query(query, {"id": to_global_id(library), "first": 2})
+
+    assert result.errors is None
+    books = result.data["node"]["books"]
+    assert books["totalCount"] == 3
+    assert books["totalCountKind"] == "COUNTER"
+    assert len(books["edges"]) == 2
+    assert books["edges"][0]["node"]["author"]["name"] == "Test Author"
+
+    # library 1회 + books(keyset 페이지, author JOIN 포함) 1회 + totalCount(library.book_count) 1회
+    assert len(queries) == 3
+    library_sql, books_sql, count_sql = (q["sql"] for q in queries.captured_queries)
+    assert '"libraries_library"."created_at"' not in library_sql
+    assert "OFFSET" not in books_sql
+    assert "ROW_NUMBER()" not in books_sql
+    assert '"libraries_library"."book_count"' in count_sql
+    assert "COUNT(" not in count_sql
+    assert 'INNER JOIN "libraries_author"' in books_sql
+    assert '"libraries_book"."published_date"' not in books_sql
+    assert '"libraries_author"."title"' not in books_sql
+
+
+@pytest.mark.django_db
+def test_get_author_with_books_is_optimized(library: Library, author: Author, book: Book):
+    query = """
+    query GetAuthorWithBooks($id: GlobalID!) {
+      node(id: $id) {
+        ... on AuthorNode {
+          name
+          books {
+            totalCount
+            edges {
+              node {
+                title
+                library {
+                  name
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+    """
+
+    with CaptureQueriesContext(connection) as queries:
+        result = execute_query(query, {"id": to_global_id(author)})
+
+    assert result.errors is None
+    books = result.data["node"]["books"]
+    assert books["totalCount"] == 1
+    assert books["edges"][0]["node"]["library"]["name"] == "Test Library"
+
+    assert len(queries) == 3
+    author_sql, books_sql, _ = (q["sql"] for q in queries.captured_queries)
+    assert '"libraries_author"."title"' not in author_sql
+    assert 'INNER JOIN "libraries_library"' in books_sql
+    assert '"libraries_library"."created_at"' not in books_sql
+
+
+@pytest.mark.django_db
+def test_get_books_selects_only_requested_columns(library: Library, author: Author):
+    for i in range(3):
+        Book.objects.create(title=f"Python {i}", author=author, library=library, published_date="2024-01-01")
+
+    query = """
+    query GetBooksByTitle($title: String!) {
+      books(filters: { title: { startsWith: $title } }) {
+        title
+        author {
+          name
+        }
+      }
+    }
+    """
+
+    with CaptureQueriesContext(connection) as queries:
+        result = execute_query(query, {"title": "Python"})
+
+    assert result.errors is None
+    assert len(result.data["books"]) == 3
+
+    assert len(queries) == 1
+    books_sql = queries.captured_queries[0]["sql"]
+    assert 'INNER JOIN "libraries_author"' in books_sql
+    assert '"libraries_book"."published_date"' not in books_sql
+    assert '"libraries_book"."library_id"' not in books_sql
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_nested_books_connections_are_batched_per_parent():
+    query = """
+    query GetBooksWithLibraryBooks($title: String!) {
+      books(filters: { title: { startsWith: $title } }) {
+        library {
+          name
+          first: books(first: 2) {
+            totalCount
+            pageInfo {
+              hasNextPage
+            }
+            edges {
+              node {
+                title
+              }
+            }
+          }
+          last: books(last: 1) {
+            totalCount
+            pageInfo {
+              hasPreviousPage
+            }
+            edges {
+              node {
+                title
+              }
+            }
+          }
+        }
+      }
+    }
+    """
+
+    query_counts = []
+    for count in (2, 10):
+        prefix = FuzzyText().fuzz()
+        author = await sync_to_async(Author.objects.create)(name="Author", title="Dr")
+        for i in range(count):
+            library = await sync_to_async(Library.objects.create)(name=f"Library {i}")
+            for j in range(3):
+                await sync_to_async(Book.objects.create)(
+                    title=f"{prefix} {i}-{j}", author=author, library=library, published_date="2024-01-01"
+                )
+
+        # optimizer 의 prefetch 없이 BatchedConnectionExtension 만으로 묶이는지 확인
+        with DjangoOptimizerExtension.disabled():
+            async with acapture_queries() as queries:
+                result = await execute_query_async(query, {"title": prefix})
+
+        assert result.errors is None
+        books = result.data["books"]
+        assert len(books) == count * 3
+        for book in books:
+            index = book["library"]["name"].split()[-1]
+            first, last = book["library"]["first"], book["library"]["last"]
+            assert first["totalCount"] == 3
+            assert first["pageInfo"]["hasNextPage"] is True
+            assert [edge["node"]["title"] for edge in first["edges"]] == [f"{prefix} {index}-0", f"{prefix} {index}-1"]
+            assert last["totalCount"] == 3
+            assert last["pageInfo"]["hasPreviousPage"] is True
+            assert [edge["node"]["title"] for edge in last["edges"]] == [f"{prefix} {index}-2"]
+        query_counts.append(len(queries))
+
+    # books 1회 + library 1회 + (first, last) 각각 페이지 1회 + totalCount 1회, 부모 수와 무관해야 함
+    assert query_counts == [6, 6]
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_batched_connection_loaders_are_keyed_by_arguments_and_total_count():
+    book = await acreate_book()
+    for i in range(3):
+        await Book.objects.acreate(
+            title=f"Book {i}", author_id=book.author_id, library_id=book.library_id, published_date="2024-01-02"
+        )
+    query = """
+    query GetLibraryBooks($id: GlobalID!, $first: Int) {
+      node(id: $id) {
+        ... on LibraryNode {
+          books(first: $first) {
+            edges { node { id } }
+            %s
+          }
+        }
+      }
+    }
+    """
+    library_id = base64.b64encode(f"LibraryNode:{book.library_id}".encode()).decode()
+
+    # 같은 컨텍스트(로더)로 같은 응답 경로를 인자·totalCount 선택만 바꿔 동시에 실행해도 서로의 페이지를 받지 않는다
+    context = SimpleNamespace(loaders=ModelLoaders())
+    results = await asyncio.gather(
+        schema.execute(query % "", variable_values={"id": library_id, "first": 1}, context_value=context),
+        schema.execute(query % "totalCount", variable_values={"id": library_id, "first": 4}, context_value=context),
+    )
+
+    assert [result.errors for result in results] == [None, None]
+    first, second = (result.data["node"]["books"] for result in results)
+    assert len(first["edges"]) == 1
+    assert "totalCount" not in first
+    assert len(second["edges"]) == 4
+    assert second["totalCount"] == 4
+
+
+@pytest.mark.django_db
+def test_library_books_keyset_pagination(library: Library, author: Author):
+    for i in range(5):
+        Book.objects.create(title=f"Book {i}", author=author, library=library, published_date="2024-01-01")
+
+    query = """
+    query GetLibraryBooksPage($id: GlobalID!, $first: Int, $after: String) {
+      node(id: $id) {
+        ... on LibraryNode {
+          books(first: $first, after: $after) {
+            pageInfo {
+              hasNextPage
+              hasPreviousPage
+              endCursor
+            }
+            edges {
+              node {
+                title
+              }
+            }
+          }
+        }
+      }
+    }
+    """
+
+    titles = []
+    after = None
+    while True:
+        with CaptureQueriesContext(connection) as queries:
+            result = execute_query(query, {"id": to_global_id(library), "first": 2, "after": after})
+        assert result.errors is None
+        # totalCount 를 선택하지 않았으므로 library + 페이지 쿼리만 실행된다
+        assert len(queries) == 2
+        books = result.data["node"]["books"]
+        titles += [edge["node"]["title"] for edge in books["edges"]]
+        assert books["pageInfo"]["hasPreviousPage"] is (after is not None)
+        if after is not None:
+            # 뒤 페이지도 OFFSET 없이 커서 값 이후를 seek 한다
+            books_sql = queries.captured_queries[1]["sql"]
+            assert "OFFSET" not in books_sql
+            assert '"libraries_book"."id" >' in books_sql
+        if not books["pageInfo"]["hasNextPage"]:
+            break
+        after = books["pageInfo"]["endCursor"]
+
+    assert titles == [f"Book {i}" for i in range(5)]
+
+    result = execute_query(query, {"id": to_global_id(library), "first": 2, "after": "invalid"})
+    assert result.errors is not None
+
+
+@pytest.mark.django_db
+def test_book_counts_follow_book_changes(library: Library, author: Author):
+    other_library = Library.objects.create(name="Other Library")
+    book = Book.objects.create(title="Book", author=author, library=library, published_date="2024-01-01")
+    Book.objects.create(title="Book 2", author=author, library=library, published_date="2024-01-01")
+
+    library.refresh_from_db()
+    author.refresh_from_db()
+    assert (library.book_count, author.book_count) == (2, 2)
+
+    book = Book.objects.get(pk=book.pk)
+    book.library = other_library
+    book.save()
+    library.refresh_from_db()
+    other_library.refresh_from_db()
+    assert (library.book_count, other_library.book_count) == (1, 1)
+
+    book.delete()
+    other_library.refresh_from_db()
+    author.refresh_from_db()
+    assert (other_library.book_count, author.book_count) == (0, 1)
+
+    # 시그널을 거치지 않는 bulk_create 뒤에는 다시 계산한다
+    Book.objects.bulk_create(
+        [Book(title=f"Bulk {i}", author=author, library=library, published_date="2024-01-01") for i in range(3)]
+    )
+    refresh_book_counts()
+    library.refresh_from_db()
+    author.refresh_from_db()
+    assert (library.book_count, author.book_count) == (4, 4)
+
+
+@pytest.mark.django_db
+def test_count_per_parent_estimate_and_capped(library: Library, author: Author):
+    small_library = Library.objects.create(name="Small Library")
+    for i in range(5):
+        Book.objects.create(title=f"Book {i}", author=author, library=library, published_date="2024-01-01")
+    Book.objects.create(title="Book", author=author, library=small_library, published_date="2024-01-01")
+
+    related_field = Book._meta.get_field("library")
+    parent_ids = [library.pk, small_library.pk]
+
+    with CaptureQueriesContext(connection) as queries:
+        capped = count_per_parent(TotalCountKind.CAPPED, Book.objects.all(), related_field, parent_ids, cap=3)
+    assert capped == {library.pk: (3, TotalCountKind.CAPPED), small_library.pk: (1, TotalCountKind.EXACT)}
+    assert len(queries) == 1
+
+    # 부모별 EXPLAIN 도 한 번에 보낸다
+    with CaptureQueriesContext(connection) as queries:
+        estimated = count_per_parent(TotalCountKind.ESTIMATE, Book.objects.all(), related_field, parent_ids)
+    assert set(estimated) == set(parent_ids)
+    assert all(kind is TotalCountKind.ESTIMATE and count >= 0 for count, kind in estimated.values())
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_books_connection_is_bounded_keyset_page(library: Library, author: Author):
+    Book.objects.bulk_create(
+        [
+            Book(title=f"Bounded {i:03}", author=author, library=library, published_date="2024-01-01")
+            for i in range(BOOKS_MAX_RESULTS + 5)
+        ]
+    )
+
+    query = """
+    query GetBooksConnection($title: String!, $first: Int, $after: String) {
+      booksConnection(filters: { title: { startsWith: $title } }, first: $first, after: $after) {
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+        edges {
+          node {
+            title
+          }
+        }
+      }
+    }
+    """
+
+    # first 를 생략하면 기본 페이지 크기만큼만 가져온다
+    with CaptureQueriesContext(connection) as queries:
+        result = execute_query(query, {"title": "Bounded"})
+    assert result.errors is None
+    books = result.data["booksConnection"]
+    assert [edge["node"]["title"] for edge in books["edges"]] == [
+        f"Bounded {i:03}" for i in range(BOOKS_DEFAULT_LIMIT)
+    ]
+    assert books["pageInfo"]["hasNextPage"] is True
+    assert len(queries) == 1
+    assert f"LIMIT {BOOKS_DEFAULT_LIMIT + 1}" in queries.captured_queries[0]["sql"]
+
+    result = execute_query(query, {"title": "Bounded", "first": 5, "after": books["pageInfo"]["endCursor"]})
+    assert result.errors is None
+    assert [edge["node"]["title"] for edge in result.data["booksConnection"]["edges"]] == [
+        f"Bounded {i:03}" for i in range(BOOKS_DEFAULT_LIMIT, BOOKS_DEFAULT_LIMIT + 5)
+    ]
+
+    # totalCount 를 세지 않았으면 totalCountKind 도 null 이다
+    kind_query = "query ($first: Int) { booksConnection(first: $first) { %s totalCountKind } }"
+    result = execute_query(kind_query % "", {"first": 1})
+    assert result.errors is None
+    assert result.data["booksConnection"] == {"totalCountKind": None}
+    result = execute_query(kind_query % "totalCount", {"first": 1})
+    assert result.errors is None
+    assert result.data["booksConnection"]["totalCountKind"] == "EXACT"
+
+    # 서버 상한을 넘는 페이지 크기는 거부한다
+    result = execute_query(query, {"title": "Bounded", "first": BOOKS_MAX_RESULTS + 1})
+    assert result.errors is not None
+
+    # 페이지네이션이 없는 books 리스트도 상한까지만 돌려준다
+    result = execute_query('{ books(filters: { title: { startsWith: "Bounded" } }) { title } }')
+    assert result.errors is None
+    assert len(result.data["books"]) == BOOKS_MAX_RESULTS
+
+
+def explain_books_filter(filters: BookFilter) -> str:
+    """BookFilter 가 만든 queryset 의 실행 계획. 작은 테이블에서도 인덱스 사용 여부가 드러나도록 seq scan 을 끈다"""
+    queryset = strawberry_django.filters.apply(filters, Book.objects.all())
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+
+def pg_trgm_available() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ("filters", "index_name"),
+    [
+        (BookFilter(title=FilterLookup(exact="Python")), "book_title_like_idx"),
+        (BookFilter(title=FilterLookup(starts_with="Py")), "book_title_like_idx"),
+        (BookFilter(title=FilterLookup(i_exact="python")), "book_title_upper_like_idx"),
+        (BookFilter(title=FilterLookup(i_starts_with="py")), "book_title_upper_like_idx"),
+        (BookFilter(search="python"), "book_title_search_idx"),
+    ],
+)
+def test_book_title_filters_use_index(filters: BookFilter, index_name: str):
+    assert index_name in explain_books_filter(filters)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ("filters", "index_name"),
+    [
+        (BookFilter(title=FilterLookup(contains="yth")), "book_title_trgm_idx"),
+        (BookFilter(title=FilterLookup(i_regex="^py")), "book_title_trgm_idx"),
+        (BookFilter(title=FilterLookup(i_contains="yth")), "book_title_upper_trgm_idx"),
+    ],
+)
+def test_book_title_substring_filters_use_trigram_index(filters: BookFilter, index_name: str):
+    if not pg_trgm_available():
+        pytest.skip("pg_trgm extension is not available")
+
+    # 테스트 DB 는 마이그레이션 없이 만들어지므로 0008 의 trigram 인덱스를 직접 만든다
+    migration = importlib.import_module("play_with_gql.libraries.migrations.0008_book_title_search")
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for sql in migration.TRIGRAM_INDEXES_SQL:
+            cursor.execute(sql)
+
+    assert index_name in explain_books_filter(filters)
+
+
+@pytest.mark.django_db
+def test_books_connection_search_is_ranked(library: Library, author: Author):
+    Book.objects.create(title="Cooking for programmers", author=author, library=library, published_date="2024-01-01")
+    Book.objects.create(title="Python Python Python", author=author, library=library, published_date="2024-01-01")
+    Book.objects.create(title="Learning Python", author=author, library=library, published_date="2024-01-01")
+
+    query = """
+    query SearchBooks($search: String!, $first: Int, $after: String) {
+      booksConnection(filters: { search: $search }, first: $first, after: $after) {
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+        edges {
+          node {
+            title
+          }
+        }
+      }
+    }
+    """
+
+    result = execute_query(query, {"search": "python", "first": 1})
+    assert result.errors is None
+    books = result.data["booksConnection"]
+    assert [edge["node"]["title"] for edge in books["edges"]] == ["Python Python Python"]
+    assert books["pageInfo"]["hasNextPage"] is True
+
+    # 커서에 순위 값이 담겨 다음 페이지도 순위 순서를 이어간다
+    result = execute_query(query, {"search": "python", "first": 10, "after": books["pageInfo"]["endCursor"]})
+    assert result.errors is None
+    books = result.data["booksConnection"]
+    assert [edge["node"]["title"] for edge in books["edges"]] == ["Learning Python"]
+    assert books["pageInfo"]["hasNextPage"] is False
+
+
+def persisted_query_extensions(query: str) -> dict[str, Any]:
+    return {"persistedQuery": {"version": 1, "sha256Hash": sha256_hash(query)}}
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_automatic_persisted_query_registration():
+    client = AsyncClient()
+    query = f"query Me{FuzzyText().fuzz()} {{ me }}"
+    extensions = persisted_query_extensions(query)
+
+    # 처음 보는 해시는 PERSISTED_QUERY_NOT_FOUND 로 응답해 클라이언트가 쿼리와 함께 다시 보내게 한다
+    response = await client.post("/graphql/", {"extensions": extensions}, content_type="application/json")
+    assert response.status_code == 200
+    assert response.json()["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+
+    response = await client.post(
+        "/graphql/", {"query": query, "extensions": extensions}, content_type="application/json"
+    )
+    assert response.json()["data"] == {"me": None}
+
+    # 등록된 뒤에는 해시만으로 실행된다 (GET 포함)
+    response = await client.post("/graphql/", {"extensions": extensions}, content_type="application/json")
+    assert response.json()["data"] == {"me": None}
+    response = await client.get("/graphql/", {"extensions": json.dumps(extensions)}, HTTP_ACCEPT="application/json")
+    assert response.json()["data"] == {"me": None}
+
+    response = await client.post(
+        "/graphql/",
+        {"query": "query { me }", "extensions": extensions},
+        content_type="application/json",
+    )
+    assert response.json()["errors"][0]["extensions"]["code"] == "INVALID_PERSISTED_QUERY_HASH"
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_persisted_query_allowlist_rejects_unknown_documents(monkeypatch):
+    allowed_query = "query AllowedMe { me }"
+    monkeypatch.setattr(
+        AsyncGraphQLView, "persisted_queries", PersistedQueries(allowlist={sha256_hash(allowed_query): allowed_query})
+    )
+    client = AsyncClient()
+
+    response = await client.post(
+        "/graphql/", {"extensions": persisted_query_extensions(allowed_query)}, content_type="application/json"
+    )
+    assert response.json()["data"] == {"me": None}
+
+    response = await client.post("/graphql/", {"query": allowed_query}, content_type="application/json")
+    assert response.json()["data"] == {"me": None}
+
+    for body in (
+        {"query": "query { me }"},
+        {"query": "query { me }", "extensions": persisted_query_extensions("query { me }")},
+    ):
+        response = await client.post("/graphql/", body, content_type="application/json")
+        assert response.json()["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_ALLOWED"
+
+
+def test_cached_documents_skip_parse_and_validation(monkeypatch):
+    parse_calls = []
+    validate_calls = []
+    parse_document = strawberry_execute.parse_document
+    validate_document = strawberry_execute.validate_document
+    monkeypatch.setattr(
+        strawberry_execute, "parse_document", lambda *args: parse_calls.append(args) or parse_document(*args)
+    )
+    monkeypatch.setattr(
+        strawberry_execute, "validate_document", lambda *args: validate_calls.append(args) or validate_document(*args)
+    )
+    query = f"query Typename{FuzzyText().fuzz()} {{ __typename }}"
+
+    for _ in range(3):
+        result = execute_query(query)
+        assert result.errors is None
+
+    assert document_cache.get(sha256_hash(query)) is not None
+    assert (len(parse_calls), len(validate_calls)) == (1, 1)
+
+    # 검증에 실패한 문서는 캐시하지 않는다
+    assert execute_query("query { unknownField }").errors is not None
+    assert document_cache.get(sha256_hash("query { unknownField }")) is None
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_response_cache_serves_repeated_reads_until_touched_rows_change(monkeypatch):
+    monkeypatch.setattr(schema, "response_cache", ResponseCache(timeout=60, maxsize=16))
+    book = await acreate_book()
+    query = """
+    query CachedBook($id: GlobalID!) {
+      node(id: $id) {
+        ... on BookNode {
+          title
+          library { name }
+        }
+      }
+    }
+    """
+    variables = {"id": to_global_id(book)}
+
+    # 처음 본 문서는 검증을 거쳐 document_cache 에 들어간 다음 실행부터 캐시된다
+    for _ in range(2):
+        result = await execute_query_async(query, variables)
+        assert result.errors is None
+
+    async with acapture_queries() as queries:
+        cached = await execute_query_async(query, variables)
+    assert cached.data == result.data
+    assert len(queries) == 0
+
+    # 응답이 읽지 않은 행의 변경은 캐시에 영향이 없다
+    await Library.objects.acreate(name="Another Library")
+    async with acapture_queries() as queries:
+        await execute_query_async(query, variables)
+    assert len(queries) == 0
+
+    book.title = "Renamed"
+    await book.asave()
+    result = await execute_query_async(query, variables)
+    assert result.data["node"]["title"] == "Renamed"
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_response_cache_keeps_librarian_only_fields_per_user(monkeypatch):
+    monkeypatch.setattr(schema, "response_cache", ResponseCache(timeout=60, maxsize=16))
+    library = await Library.objects.acreate(name="Private Library")
+    librarian_user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    other_user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    librarian = await Librarian.objects.acreate(user=librarian_user, library=library)
+    query = """
+    query CachedLibrary($nodeId: String!) {
+      library(nodeId: $nodeId) { name }
+    }
+    """
+
+    async def execute_as(user: User):
+        context = SimpleNamespace(user=user, loaders=ModelLoaders())
+        return await schema.execute(query, variable_values={"nodeId": to_global_id(library)}, context_value=context)
+
+    for _ in range(2):
+        assert (await execute_as(librarian_user)).data == {"library": {"name": "Private Library"}}
+    async with acapture_queries() as queries:
+        assert (await execute_as(librarian_user)).data == {"library": {"name": "Private Library"}}
+    assert len(queries) == 0
+
+    # 사서의 캐시된 응답이 다른 사용자에게 가지 않는다
+    assert [error.message for error in (await execute_as(other_user)).errors] == ["Forbidden"]
+
+    # 사서에서 빠지면 그 사용자의 캐시된 응답도 버린다
+    await librarian.adelete()
+    assert [error.message for error in (await execute_as(librarian_user)).errors] == ["Forbidden"]
+
+
+# 이름: (쿼리, 예상 행 수)
+COST_QUERIES = {
+    "connection": (
+        "query { booksConnection(first: 5) { totalCount edges { node { title author { name } } } } }",
+        5 + 5,
+    ),
+    "nested": (
+        """
+        query NestedCost($id: GlobalID!) {
+          node(id: $id) {
+            ... on LibraryNode {
+              name
+              books(first: 3) {
+                totalCount
+                edges { node { title author { name books(first: 2) { edges { node { title } } } } } }
+              }
+            }
+          }
+        }
+        """,
+        # 도서관 1 + 책 3 + 저자 3 + 저자별 책 2
+        1 + 3 + 3 + 3 * 2,
+    ),
+    # books 상한과 책마다 도서관 하나
+    "list": ("query { books { title library { name } } }", BOOKS_MAX_RESULTS * 2),
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", COST_QUERIES)
+async def test_query_cost_estimate_bounds_actual_queries(name: str):
+    book = await acreate_book()
+    for i in range(4):
+        await Book.objects.acreate(
+            title=f"Book {i}", library_id=book.library_id, author_id=book.author_id, published_date="2024-01-01"
+        )
+
+    query, rows = COST_QUERIES[name]
+    async with acapture_queries() as queries:
+        result = await execute_query_async(query, {"id": to_global_id(book.library)})
+
+    assert result.errors is None
+    cost = result.extensions["cost"]
+    # 추정치는 상한이다. optimizer 가 FK 를 JOIN 으로 합치면 실제 쿼리는 더 적다
+    assert 0 < len(queries) <= cost["queries"]
+    assert cost["rows"] == rows
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_query_cost_rejects_over_budget_operations(settings):
+    query = """
+    query {
+      booksConnection(first: 100) {
+        edges {
+          node { library { books(first: 100) { edges { node { author { books(first: 100) { totalCount } } } } } } }
+        }
+      }
+    }
+    """
+
+    async with acapture_queries() as queries:
+        result = await execute_query_async(query)
+
+    assert len(queries) == 0
+    assert result.data is None
+    [error] = result.errors
+    assert error.extensions["code"] == "QUERY_TOO_EXPENSIVE"
+    assert error.extensions["cost"]["rows"] == 100 + 100 + 100 * 100 + 100 * 100 + 100 * 100 * 100
+
+    settings.GRAPHQL_QUERY_MAX_DEPTH = 3
+    result = await execute_query_async("query { booksConnection(first: 1) { edges { node { title } } } }")
+    assert [error.extensions["code"] for error in result.errors] == ["QUERY_TOO_DEEP"]
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_tracing_records_resolver_and_sql_spans(settings, tmp_path):
+    settings.GRAPHQL_TRACING_IN_RESPONSE = True
+    settings.GRAPHQL_TRACING_EXPORT_PATH = tmp_path / "spans.jsonl"
+    book = await acreate_book()
+    query = """
+    query TracedLibrary($id: GlobalID!) {
+      node(id: $id) {
+        ... on LibraryNode {
+          books(first: 5) { edges { node { title author { name } } } }
+        }
+      }
+    }
+    """
+
+    result = await execute_query_async(query, {"id": to_global_id(book.library)})
+
+    assert result.errors is None
+    spans = result.extensions["tracing"]["spans"]
+    parents = {span["name"]: span["parent"] for span in spans}
+    assert parents["graphql.operation TracedLibrary"] is None
+    assert {parents["graphql.parse"], parents["graphql.validate"], parents["graphql.execute"]} == {
+        "graphql.operation TracedLibrary"
+    }
+    assert parents["LibraryNode.books"] == "graphql.execute"
+    # 단순 속성 필드(title)는 스팬을 만들지 않는다
+    assert "BookNode.title" not in parents
+    # SQL 은 그 SQL 을 실행한 resolver 스팬 아래에 남는다
+    sql_resolvers = {span["parent"] for span in spans if span["name"] == "sql"}
+    assert {"Query.node", "LibraryNode.books"} <= sql_resolvers
+
+    exported = [json.loads(line) for line in settings.GRAPHQL_TRACING_EXPORT_PATH.read_text().splitlines()]
+    assert len(exported) == len(spans)
+    assert {span["traceId"] for span in exported} == {result.extensions["tracing"]["traceId"]}
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_tracing_is_sampled(settings, tmp_path):
+    settings.GRAPHQL_TRACING_SAMPLE_RATE = 0.0
+    settings.GRAPHQL_TRACING_EXPORT_PATH = tmp_path / "spans.jsonl"
+
+    result = await execute_query_async("query { me }")
+
+    assert "tracing" not in result.extensions
+    assert not settings.GRAPHQL_TRACING_EXPORT_PATH.exists()
+
+
+@strawberry_django.type(Book, name="NaiveBookNode")
+class NaiveBookNode:
+    title: str
+    # DataLoader 없이 행마다 저자를 읽는 N+1
+    author: AuthorNode
+
+
+@strawberry.type
+class NaiveBooksQuery:
+    @strawberry_django.field
+    def books(self, library_id: int) -> list[NaiveBookNode]:
+        return Book.objects.filter(library_id=library_id)
+
+
+NAIVE_BOOKS_QUERY = """
+query NaiveBooks($libraryId: Int!) {
+  books(libraryId: $libraryId) { title author { name } }
+}
+"""
+
+
+def create_books_by_different_authors(library: Library, count: int) -> None:
+    for i in range(count):
+        author = Author.objects.create(name=f"Author {i}", title="Professor")
+        Book.objects.create(title=f"Book {i}", author=author, library=library, published_date="2024-01-01")
+
+
+def test_normalize_sql_ignores_values():
+    assert normalize_sql("SELECT * FROM book WHERE id IN (%s, %s) LIMIT 21") == normalize_sql(
+        "SELECT *\n  FROM book WHERE id IN (%s, %s, %s) LIMIT 5"
+    )
+    assert normalize_sql("SELECT 'a''b', 1.5") == "SELECT ?, ?"
+
+
+@pytest.mark.django_db
+def test_n_plus_one_fails_operation(library: Library):
+    create_books_by_different_authors(library, 3)
+    naive_schema = strawberry.Schema(query=NaiveBooksQuery, extensions=[NPlusOneExtension])
+
+    result = naive_schema.execute_sync(NAIVE_BOOKS_QUERY, {"libraryId": library.pk})
+
+    assert result.data is None
+    assert len(result.errors) == 1
+    assert "N+1 query detected: NaiveBookNode.author ran 3x (books.0.author)" in result.errors[0].message
+
+
+@pytest.mark.django_db
+def test_n_plus_one_is_logged_in_production(library: Library, settings, caplog):
+    settings.GRAPHQL_N_PLUS_ONE_RAISE = False
+    create_books_by_different_authors(library, 3)
+    naive_schema = strawberry.Schema(query=NaiveBooksQuery, extensions=[NPlusOneExtension])
+
+    with caplog.at_level("WARNING", logger="play_with_gql.n_plus_one"):
+        result = naive_schema.execute_sync(NAIVE_BOOKS_QUERY, {"libraryId": library.pk})
+
+    assert result.errors is None
+    assert len(result.data["books"]) == 3
+    (record,) = caplog.records
+    assert record.n_plus_one["operation"] == "NaiveBooks"
+    assert record.n_plus_one["resolver"] == "NaiveBookNode.author"
+    assert record.n_plus_one["count"] == 3
+    assert 'FROM "libraries_author"' in record.n_plus_one["sql"]
+
+
+def book_table_indexes_and_constraints() -> set[str]:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'libraries_book'")
+        names = {name for (name,) in cursor.fetchall()}
+        cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = 'libraries_book'::regclass")
+        return names | {name for (name,) in cursor.fetchall()}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["copy", "bulk_create"])
+def test_seed_libraries_command(method: str):
+    indexes_and_constraints = book_table_indexes_and_constraints()
+    libraries_before = set(Library.objects.values_list("pk", flat=True))
+
+    call_command(
+        "seed_libraries",
+        books=200,
+        libraries=3,
+        authors=10,
+        librarians_per_library=2,
+        author_skew=2.0,
+        method=method,
+        seed=1,
+        stdout=StringIO(),
+    )
+
+    libraries = Library.objects.exclude(pk__in=libraries_before)
+    assert libraries.count() == 3
+    books = Book.objects.filter(library__in=libraries)
+    assert books.count() == 200
+    assert books.values("author").distinct().count() <= 10
+    assert Librarian.objects.filter(library__in=libraries).count() == 6
+    # 시그널 없이 넣었어도 book_count 가 맞는다
+    assert sum(libraries.values_list("book_count", flat=True)) == 200
+    # 미뤄 둔 인덱스와 FK 제약이 되살아난다
+    assert book_table_indexes_and_constraints() == indexes_and_constraints
+
+
+async def aexport_books(client: AsyncClient, **params: str) -> tuple[int, bytes]:
+    response = await client.get("/export/books/", params)
+    if not response.streaming:
+        return response.status_code, response.content
+    return response.status_code, b"".join([chunk async for chunk in response.streaming_content])
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_export_books_streams_ndjson_and_csv_since_watermark():
+    staff_user = await sync_to_async(User.objects.create_superuser)(
+        username=FuzzyText().fuzz(), email="export@example.com", password="password123"
+    )
+    client = AsyncClient()
+    await client.aforce_login(staff_user)
+    book = await acreate_book()
+    # COPY 의 이스케이프가 JSON 에 섞이지 않아야 한다
+    await Book.objects.filter(pk=book.pk).aupdate(title='Quote " and \\ backslash')
+    book = await Book.objects.aget(pk=book.pk)
+
+    status, body = await aexport_books(client, since=book.updated_at.isoformat())
+
+    assert status == 200
+    rows = [json.loads(line) for line in body.decode().splitlines()]
+    # 워터마크 순서로 나온다
+    assert [row["updated_at"] for row in rows] == sorted(row["updated_at"] for row in rows)
+    (exported,) = [row for row in rows if row["id"] == book.pk]
+    assert exported["title"] == 'Quote " and \\ backslash'
+    assert exported["author_name"] == "Test Author"
+    assert exported["library_name"] == "Test Library"
+    assert exported["published_date"] == "2024-01-01"
+
+    # 워터마크 이후에 바뀌지 않은 책은 빠진다
+    later = (book.updated_at + timedelta(seconds=1)).isoformat()
+    status, body = await aexport_books(client, since=later)
+    assert status == 200
+    assert all(json.loads(line)["id"] != book.pk for line in body.decode().splitlines())
+
+    status, body = await aexport_books(client, format="csv", since=book.updated_at.isoformat())
+    assert status == 200
+    header, *lines = body.decode().splitlines()
+    assert header == "id,title,published_date,updated_at,author_name,library_name"
+    assert any(line.startswith(f'{book.pk},"Quote "" and \\ backslash",2024-01-01,') for line in lines)
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_export_books_requires_staff():
+    user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    client = AsyncClient()
+    await client.aforce_login(user)
+
+    status, _ = await aexport_books(client)
+
+    assert status == 403
+
+
+async def aincremental_payloads(client: AsyncClient, query: str, variables: dict[str, Any]) -> list[dict[str, Any]]:
+    response = await client.post(
+        "/graphql/",
+        {"query": query, "variables": variables},
+        content_type="application/json",
+        headers={"Accept": "multipart/mixed; deferSpec=20220824, application/json"},
+    )
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("multipart/mixed")
+    body = "".join([chunk.decode() async for chunk in response.streaming_content])
+    assert body.endswith("\r\n-----\r\n")
+    parts = body.removesuffix("\r\n-----\r\n").split("\r\n---\r\n")[1:]
+    return [json.loads(part.split("\r\n\r\n", 1)[1]) for part in parts]
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_library_books_are_deferred_and_streamed():
+    book = await acreate_book()
+    await Book.objects.acreate(
+        title="Second Book", author_id=book.author_id, library_id=book.library_id, published_date="2024-01-02"
+    )
+    await sync_to_async(refresh_book_counts)()
+    user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    await Librarian.objects.acreate(user=user, library_id=book.library_id)
+    client = AsyncClient()
+    await client.aforce_login(user)
+    library = await Library.objects.aget(pk=book.library_id)
+    query = """
+    query GetLibrary($nodeId: String!) {
+      library(nodeId: $nodeId) {
+        name
+        ... on LibraryNode @defer(label: "books") {
+          books { totalCount }
+        }
+        streamed: books {
+          edges @stream(initialCount: 1) { node { title author { name } } }
+        }
+      }
+    }
+    """
+
+    initial, *subsequent = await aincremental_payloads(client, query, {"nodeId": to_global_id(library)})
+
+    # 처음 응답에는 지연·스트림 부분이 빠진다
+    assert initial["hasNext"] is True
+    assert initial["data"]["library"]["name"] == "Test Library"
+    assert "books" not in initial["data"]["library"]
+    assert len(initial["data"]["library"]["streamed"]["edges"]) == 1
+    assert subsequent[-1]["hasNext"] is False
+    incremental = [item for payload in subsequent for item in payload["incremental"]]
+    (deferred,) = [item for item in incremental if "data" in item]
+    assert deferred == {"data": {"books": {"totalCount": 2}}, "path": ["library"], "label": "books"}
+    (streamed,) = [item for item in incremental if "items" in item]
+    assert streamed["path"] == ["library", "streamed", "edges", 1]
+    assert [edge["node"]["author"]["name"] for edge in streamed["items"]] == ["Test Author"]
+
+    # multipart 를 받지 않는 클라이언트는 한 번에 전체 응답을 받는다
+    response = await client.post(
+        "/graphql/", {"query": query, "variables": {"nodeId": to_global_id(library)}}, content_type="application/json"
+    )
+    data = response.json()
+    assert data.get("errors") is None
+    assert data["data"]["library"]["books"]["totalCount"] == 2
+    assert len(data["data"]["library"]["streamed"]["edges"]) == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_invalid_incremental_queries_are_graphql_errors():
+    client = AsyncClient()
+    queries = [
+        # 없는 조각
+        "query { books { ...Missing @defer } }",
+        # 자기 자신을 펼치는 조각
+        "query { books { ...Cycle @defer } } fragment Cycle on BookNode { title ...Cycle }",
+    ]
+
+    for query in queries:
+        response = await client.post(
+            "/graphql/",
+            {"query": query},
+            content_type="application/json",
+            headers={"Accept": "multipart/mixed; deferSpec=20220824, application/json"},
+        )
+        # 서버 오류(500)가 아니라 검증 오류로 응답한다
+        assert response.status_code == 200
+        data = response.json()
+        assert data["data"] is None
+        assert data["errors"]
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_incremental_queries_are_budgeted_before_splitting(settings):
+    client = AsyncClient()
+    # 부분 하나하나는 예산 안이지만 합치면 넘는다
+    query = "query { ... @defer { books { title } } ... @defer { more: books { title } } }"
+
+    async def post() -> dict[str, Any]:
+        response = await client.post(
+            "/graphql/",
+            {"query": query},
+            content_type="application/json",
+            headers={"Accept": "multipart/mixed; deferSpec=20220824, application/json"},
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    settings.GRAPHQL_QUERY_MAX_ROWS = BOOKS_MAX_RESULTS + 1
+    [error] = (await post())["errors"]
+    assert error["extensions"]["code"] == "QUERY_TOO_EXPENSIVE"
+    assert error["extensions"]["cost"]["rows"] == 2 * BOOKS_MAX_RESULTS
+
+    settings.GRAPHQL_QUERY_MAX_ROWS = 2 * BOOKS_MAX_RESULTS
+    settings.GRAPHQL_INCREMENTAL_MAX_PARTS = 1
+    [error] = (await post())["errors"]
+    assert error["extensions"]["code"] == "TOO_MANY_INCREMENTAL_PARTS"
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_deferred_total_count_inside_books_connection():
+    book = await acreate_book()
+    await Book.objects.acreate(
+        title="Second Book", author_id=book.author_id, library_id=book.library_id, published_date="2024-01-02"
+    )
+    user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    await Librarian.objects.acreate(user=user, library_id=book.library_id)
+    client = AsyncClient()
+    await client.aforce_login(user)
+    library = await Library.objects.aget(pk=book.library_id)
+    query = """
+    query GetLibrary($nodeId: String!) {
+      library(nodeId: $nodeId) {
+        books(first: 1) {
+          edges { node { title } }
+          ... @defer(label: "count") { totalCount }
+        }
+      }
+    }
+    """
+
+    # 처음 응답과 지연 부분이 같은 경로(library.books)의 connection 로더를 나눠 쓰지 않는다
+    initial, *subsequent = await aincremental_payloads(client, query, {"nodeId": to_global_id(library)})
+
+    assert initial.get("errors") is None
+    assert initial["data"]["library"]["books"] == {"edges": [{"node": {"title": "Test Book"}}]}
+    incremental = [item for payload in subsequent for item in payload["incremental"]]
+    assert incremental == [{"data": {"totalCount": 2}, "path": ["library", "books"], "label": "count"}]
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_streamed_list_reads_only_initial_count_for_the_initial_payload():
+    book = await acreate_book()
+    for i in range(3):
+        await Book.objects.acreate(
+            title=f"Book {i}", author_id=book.author_id, library_id=book.library_id, published_date="2024-01-02"
+        )
+    query = "query { books @stream(initialCount: 1) { title } }"
+    plan = plan_incremental(schema, query, None, None)
+
+    async with acapture_queries() as queries:
+        initial, subsequent = await execute_incrementally(
+            schema, plan, context_value=SimpleNamespace(loaders=ModelLoaders())
+        )
+        payloads = [payload async for payload in subsequent]
+
+    titles = [title async for title in Book.objects.order_by("pk").values_list("title", flat=True)]
+    assert initial.data == {"books": [{"title": titles[0]}]}
+    assert [item["title"] for item in payloads[0]["incremental"][0]["items"]] == titles[1:BOOKS_MAX_RESULTS]
+    # 처음 응답은 목록을 다 읽고 자르지 않고 initialCount 개만 읽는다
+    limits = sorted(query["sql"].rsplit("LIMIT", 1)[-1].strip() for query in queries.captured_queries)
+    assert limits == ["1", str(BOOKS_MAX_RESULTS)]
+
+
+@pytest.mark.asyncio
+async def test_subscription_hub_fans_out_and_drops_oldest_for_slow_subscribers():
+    hub = Hub(queue_size=2)
+    fast, slow = hub.subscribe("topic"), hub.subscribe("topic")
+    first = asyncio.ensure_future(anext(fast))
+    second = asyncio.ensure_future(anext(slow))
+    await asyncio.sleep(0)
+    assert hub.subscriber_count("topic") == 2
+
+    hub.publish([("topic", {"n": 1}), ("other", {"n": 0})])
+    # 같은 루프의 구독자들은 같은 Event 를 받는다
+    assert (await first) is (await second)
+
+    for n in range(2, 6):
+        hub.publish([("topic", {"n": n})])
+    # 큐가 찬 구독자는 가장 오래된 이벤트를 버리고 최신 이벤트를 유지한다
+    assert [(await anext(slow)).payload["n"] for _ in range(2)] == [4, 5]
+
+    await fast.aclose()
+    await slow.aclose()
+    assert hub.subscriber_count() == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_postgres_subscription_backend_delivers_notifications():
+    hub = Hub(queue_size=10)
+    backend = PostgresBackend(hub, channel=f"test_subscriptions_{FuzzyText().fuzz().lower()}")
+    await sync_to_async(backend.start)()
+    events = hub.subscribe("topic")
+    received = asyncio.ensure_future(anext(events))
+    await asyncio.sleep(0)
+
+    # 한 NOTIFY 에 담기지 않는 메시지들은 여러 payload 로 나눠 보낸다
+    await backend.apublish([("topic", {"title": "x" * 5_000}), ("topic", {"title": "y"})])
+
+    assert (await asyncio.wait_for(received, 5)).payload["title"] == "x" * 5_000
+    assert (await asyncio.wait_for(anext(events), 5)).payload["title"] == "y"
+    await events.aclose()
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_subscriptions_on_one_connection_do_not_share_event_loaders():
+    book = await acreate_book()
+    user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    await Librarian.objects.acreate(user=user, library_id=book.library_id)
+    library_id = to_global_id(await Library.objects.aget(pk=book.library_id))
+    query = """
+    subscription BookChanged($libraryId: String!) {
+      bookChanged(libraryId: $libraryId) { kind book { title author { name } } }
+    }
+    """
+    # 한 웹소켓 연결의 구독들은 컨텍스트 하나를 함께 쓴다
+    context = SubscriptionContext(request=None, user=user)
+
+    async def first_event() -> ExecutionResult:
+        # schema.subscribe 는 첫 결과까지 기다린다
+        stream = await schema.subscribe(query, variable_values={"libraryId": library_id}, context_value=context)
+        try:
+            return await anext(stream)
+        finally:
+            await stream.aclose()
+
+    # graphql-ws 핸들러처럼 구독마다 따로 도는 태스크에서 이벤트를 기다린다
+    events = [asyncio.ensure_future(first_event()) for _ in range(2)]
+    async with asyncio.timeout(5):
+        while hub.subscriber_count() < 2:
+            await asyncio.sleep(0.01)
+
+    await subscriptions.apublish([book_changed(UPDATED, book.pk, book.library_id)])
+    results = await asyncio.wait_for(asyncio.gather(*events), timeout=5)
+
+    assert [result.errors for result in results] == [None, None]
+    assert [result.data["bookChanged"]["book"]["author"]["name"] for result in results] == ["Test Author"] * 2
+    # 이벤트마다 새 로더는 각 구독의 태스크에만 두고 공유 컨텍스트는 바꾸지 않는다
+    assert context.loaders is None
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_book_changed_subscription_over_graphql_ws():
+    from play_with_gql.asgi import application
+
+    book = await acreate_book()
+    user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    await Librarian.objects.acreate(user=user, library_id=book.library_id)
+    client = AsyncClient()
+    await client.aforce_login(user)
+    library_id = to_global_id(await Library.objects.aget(pk=book.library_id))
+
+    communicator = WebsocketCommunicator(
+        application,
+        "/graphql/",
+        subprotocols=["graphql-transport-ws"],
+        headers=[(b"cookie", f"sessionid={client.cookies['sessionid'].value}".encode())],
+    )
+    connected, _ = await communicator.connect()
+    assert connected
+    await communicator.send_json_to({"type": "connection_init"})
+    assert (await communicator.receive_json_from())["type"] == "connection_ack"
+    await communicator.send_json_to(
+        {
+            "id": "1",
+            "type": "subscribe",
+            "payload": {
+                "query": """
+                subscription BookChanged($libraryId: String!) {
+                  bookChanged(libraryId: $libraryId) { kind id book { title author { name } } }
+                }
+                """,
+                "variables": {"libraryId": library_id},
+            },
+        }
+    )
+    # 구독이 허브에 등록될 때까지 기다린다
+    async with asyncio.timeout(5):
+        while not hub.subscriber_count():
+            await asyncio.sleep(0.01)
+
+    await client.post(
+        "/graphql/",
+        {
+            "query": 'mutation ($id: GlobalID!) { updateBook(id: $id, title: "Live Title") { title } }',
+            "variables": {"id": to_global_id(book)},
+        },
+        content_type="application/json",
+    )
+    message = await communicator.receive_json_from(timeout=5)
+    assert message["type"] == "next"
+    assert message["payload"]["data"]["bookChanged"] == {
+        "kind": "UPDATED",
+        "id": to_global_id(book),
+        "book": {"title": "Live Title", "author": {"name": "Test Author"}},
+    }
+
+    await Book.objects.filter(pk=book.pk).adelete()
+    message = await communicator.receive_json_from(timeout=5)
+    assert message["payload"]["data"]["bookChanged"]["kind"] == "DELETED"
+    assert message["payload"]["data"]["bookChanged"]["book"] is None
+    await communicator.disconnect()
+    assert hub.subscriber_count() == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_batched_operations_share_one_context(monkeypatch, settings):
+    user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    libraries = [await Library.objects.acreate(name=f"Library {i}") for i in range(2)]
+    await Librarian.objects.acreate(user=user, library=libraries[0])
+    client = AsyncClient()
+    await client.aforce_login(user)
+    contexts = []
+    get_context = AsyncGraphQLView.get_context
+
+    async def spy_get_context(self, request, response):
+        contexts.append(await get_context(self, request, response))
+        return contexts[-1]
+
+    monkeypatch.setattr(AsyncGraphQLView, "get_context", spy_get_context)
+    library_query = "query GetLibrary($nodeId: String!) { library(nodeId: $nodeId) { name } }"
+
+    async with acapture_queries() as queries:
+        response = await client.post(
+            "/graphql/",
+            [
+                {"query": "query { me }"},
+                {"query": library_query, "variables": {"nodeId": to_global_id(libraries[0])}},
+                {"query": library_query, "variables": {"nodeId": to_global_id(libraries[1])}},
+                {"query": "query { unknownField }"},
+            ],
+            content_type="application/json",
+        )
+
+    assert response.status_code == 200
+    me, allowed, forbidden, invalid = response.json()
+    # 결과는 요청 순서대로, 오류는 operation 별로 온다
+    assert me["data"] == {"me": user.username}
+    assert allowed["data"] == {"library": {"name": "Library 0"}}
+    assert "errors" not in allowed
+    assert [error["message"] for error in forbidden["errors"]] == ["Forbidden"]
+    assert invalid["data"] is None
+    assert len(invalid["errors"]) == 1
+    # 컨텍스트(사용자 해석)와 권한 캐시를 한 번만 만든다
+    assert len(contexts) == 1
+    assert sum("libraries_librarian" in query["sql"] for query in queries.captured_queries) == 1
+
+    settings.GRAPHQL_BATCH_MAX_OPERATIONS = 2
+    response = await client.post("/graphql/", [{"query": "query { me }"}] * 3, content_type="application/json")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_batched_operations_have_their_own_loaders(monkeypatch):
+    book = await acreate_book()
+    for i in range(3):
+        await Book.objects.acreate(
+            title=f"Book {i}", author_id=book.author_id, library_id=book.library_id, published_date="2024-01-02"
+        )
+    query = """
+    query GetLibraryBooks($id: GlobalID!, $first: Int) {
+      node(id: $id) { ... on LibraryNode { books(first: $first) { edges { node { id } } } } }
+    }
+    """
+    library_id = base64.b64encode(f"LibraryNode:{book.library_id}".encode()).decode()
+    contexts = []
+    execute = schema.execute
+
+    async def spy_execute(*args, **kwargs):
+        contexts.append(kwargs["context_value"])
+        return await execute(*args, **kwargs)
+
+    monkeypatch.setattr(schema, "execute", spy_execute)
+
+    response = await AsyncClient().post(
+        "/graphql/",
+        [{"query": query, "variables": {"id": library_id, "first": first}} for first in (1, 4, 2)],
+        content_type="application/json",
+    )
+
+    assert response.status_code == 200
+    assert [len(result["data"]["node"]["books"]["edges"]) for result in response.json()] == [1, 4, 2]
+    # 같은 경로의 connection 이라도 operation 끼리 로더를 나눠 쓰지 않고, 권한 캐시는 함께 쓴다
+    assert len({id(context.loaders) for context in contexts}) == 3
+    assert len({id(context.permissions) for context in contexts}) == 1
+
+
+@pytest.mark.asyncio
+async def test_response_encoders_agree_and_stream_long_lists():
+    data = {
+        "data": {
+            "books": [{"id": i, "title": f"Book {i}", "publishedDate": date(2024, 1, 1)} for i in range(5)],
+            "price": Decimal("1.50"),
+            "empty": [],
+        },
+        "extensions": {"cost": {"rows": 5}},
+    }
+
+    encoded = StdlibEncoder().encode(data)
+    assert json.loads(OrjsonEncoder().encode(data)) == json.loads(encoded)
+    # 긴 리스트를 나눠 인코딩해도 같은 JSON 이 된다
+    chunks = [chunk async for chunk in aiter_encode(OrjsonEncoder(), data, chunk_items=2)]
+    assert json.loads(b"".join(chunks)) == json.loads(encoded)
+
+
+@pytest.mark.django_db
+@pytest.mark.asyncio
+async def test_large_list_responses_are_streamed(settings):
+    book = await acreate_book()
+    for i in range(3):
+        await Book.objects.acreate(
+            title=f"Streamed {i}", author_id=book.author_id, library_id=book.library_id, published_date="2024-01-01"
+        )
+    query = {"query": "query { books { title publishedDate } }"}
+    client = AsyncClient()
+    expected = (await client.post("/graphql/", query, content_type="application/json")).json()
+
+    settings.GRAPHQL_RESPONSE_STREAM_ITEMS = 2
+    response = await client.post("/graphql/", query, content_type="application/json")
+
+    assert response.streaming
+    assert response["Content-Type"] == "application/json"
+    assert json.loads(b"".join([chunk async for chunk in response.streaming_content])) == expected
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_requests_borrow_connections_from_the_pool():
+    from play_with_gql.asgi import application
+
+    pool = connection.pool
+    assert pool is not None
+    author = await Author.objects.acreate(name="Pooled Author", title="Professor")
+    author_id = base64.b64encode(f"AuthorNode:{author.pk}".encode()).decode()
+    body = json.dumps({"query": f'{{ node(id: "{author_id}") {{ ... on AuthorNode {{ name }} }} }}'}).encode()
+
+    async def post() -> dict[str, Any]:
+        # 테스트 클라이언트와 달리 ASGI 핸들러는 요청이 끝날 때 커넥션을 닫는다(풀에 돌려준다)
+        communicator = HttpCommunicator(
+            application, "POST", "/graphql/", body=body, headers=[(b"content-type", b"application/json")]
+        )
+        response = await communicator.get_response()
+        # 응답을 보낸 뒤 request_finished 로 커넥션을 돌려줄 때까지 기다린다
+        await communicator.wait()
+        return json.loads(response["body"])
+
+    assert (await post())["data"] == {"node": {"name": "Pooled Author"}}
+    opened = pool.get_stats()["connections_num"]
+    for _ in range(5):
+        await post()
+
+    # 요청마다 커넥션을 새로 맺지 않고 풀에 돌아온 커넥션을 다시 쓴다
+    stats = pool.get_stats()
+    assert stats["connections_num"] == opened
+    assert stats["requests_num"] >= 6
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+def test_bulk_mutations_write_to_the_write_alias(monkeypatch, library: Library, author: Author):
+    books = [
+        Book.objects.create(title=f"Book {i}", library=library, author=author, published_date="2024-01-01")
+        for i in range(2)
+    ]
+    # 읽기가 복제본으로 가더라도 raw SQL 쓰기와 그 트랜잭션은 쓰기 alias 에서 실행한다
+    monkeypatch.setattr(ReplicaRouter, "db_for_read", lambda self, model, **hints: "replica")
+    update_books = "mutation ($patches: [BookPatch!]!) { updateBooks(patches: $patches) { ok } }"
+    delete_books = "mutation ($ids: [GlobalID!]!) { deleteBooks(ids: $ids) { ok } }"
+
+    with CaptureQueriesContext(connections["replica"]) as replica:
+        updated = execute_query(
+            update_books,
+            {"patches": [{"id": to_global_id(books[0]), "title": "Renamed"}, {"id": to_global_id(books[1])}]},
+        )
+        deleted = execute_query(delete_books, {"ids": [to_global_id(books[1])]})
+
+    assert updated.errors is None
+    assert [item["ok"] for item in updated.data["updateBooks"]] == [True, True]
+    assert deleted.errors is None
+    assert [item["ok"] for item in deleted.data["deleteBooks"]] == [True]
+    assert replica.captured_queries == []
+    assert list(Book.objects.using(DEFAULT_DB_ALIAS).values_list("title", flat=True)) == ["Renamed"]
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+@pytest.mark.asyncio
+async def test_queries_read_from_replica_until_the_user_mutates(settings, monkeypatch):
+    settings.DATABASE_REPLICA_ALIAS = "replica"
+    # sticky 캐시를 이벤트 루프 스레드에서 동기로 읽고 쓰면 루프가 막힌다
+    cache_class = type(caches[settings.DATABASE_REPLICA_STICKY_CACHE])
+    loop_thread = threading.get_ident()
+
+    def off_loop(method):
+        def wrapper(*args, **kwargs):
+            assert threading.get_ident() != loop_thread
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(cache_class, "get", off_loop(cache_class.get))
+    monkeypatch.setattr(cache_class, "set", off_loop(cache_class.set))
+    book = await acreate_book()
+    librarian = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    await Librarian.objects.acreate(user=librarian, library_id=book.library_id)
+    book_id, library_id = to_global_id(book), to_global_id(await Library.objects.aget(pk=book.library_id))
+    book_query = f'query {{ node(id: "{book_id}") {{ ... on BookNode {{ title }} }} }}'
+    library_query = f'query {{ library(nodeId: "{library_id}") {{ name }} }}'
+    update_book = f'mutation {{ updateBook(id: "{book_id}", title: "Renamed") {{ title }} }}'
+
+    async def execute(query: str, user: User) -> tuple[Any, list[str], list[str]]:
+        context = SimpleNamespace(user=user, loaders=ModelLoaders())
+        async with acapture_queries() as primary, acapture_queries("replica") as replica:
+            result = await schema.execute(query, context_value=context)
+        assert result.errors is None
+        return result.data, [q["sql"] for q in primary.captured_queries], [q["sql"] for q in replica.captured_queries]
+
+    # query 는 복제본에서 읽고, 사서 권한은 최신 값이 필요하므로 primary 에서 확인한다
+    data, primary, replica = await execute(library_query, librarian)
+    assert data == {"library": {"name": "Test Library"}}
+    assert any("libraries_librarian" in sql for sql in primary)
+    assert replica
+    assert not any("libraries_librarian" in sql for sql in replica)
+
+    # mutation 은 primary 에서만 실행한다
+    data, primary, replica = await execute(update_book, librarian)
+    assert data == {"updateBook": {"title": "Renamed"}}
+    assert primary
+    assert not replica
+
+    # mutation 을 실행한 사용자는 잠시 primary 에서 읽어 자기가 쓴 값을 본다
+    data, primary, replica = await execute(book_query, librarian)
+    assert data == {"node": {"title": "Renamed"}}
+    assert primary
+    assert not replica
+
+    other_user = await sync_to_async(User.objects.create_user)(username=FuzzyText().fuzz(), password="password123")
+    _, primary, replica = await execute(book_query, other_user)
+    assert replica
+    assert not primary
+
+
+def test_execute_sync_uses_the_sync_replica_extension():
+    sync_extensions = [type(extension) for extension in schema.get_extensions(sync=True)]
+    async_extensions = [type(extension) for extension in schema.get_extensions()]
+    assert ReplicaExtensionSync in sync_extensions
+    assert ReplicaExtension not in sync_extensions
+    assert ReplicaExtension in async_extensions
@@ -12,5 +12,25 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "play_with_gql.settings")
+# 커넥션 풀 크기 등 ASGI 프로필 설정을 쓴다
+os.environ.setdefault("PLAY_WITH_GQL_SERVER_PROFILE", "asgi")
 
-application = get_asgi_application()
+# 앱 레지스트리가 준비된 뒤에 스키마·모델을 import 한다
+django_application = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from django.urls import re_path  # noqa: E402
+
+from play_with_gql.consumers import GraphQLWSConsumer  # noqa: E402
+from play_with_gql.schema import schema  # noqa: E402
+
+application = ProtocolTypeRouter(
+    {
+        "http": django_application,
+        # graphql-transport-ws 와 이전 graphql-ws 프로토콜 모두 받는다
+        "websocket": AuthMiddlewareStack(
+            URLRouter([re_path(r"^graphql/?$", GraphQLWSConsumer.as_asgi(schema=schema))])
+        ),
+    }
+)
@@ -0,0 +1,38 @@
+from dataclasses import dataclass, field
+from typing import Any
+
+from django.contrib.auth.models import AnonymousUser
+from strawberry.channels import GraphQLWSConsumer as BaseGraphQLWSConsumer
+
+from play_with_gql.api.libraries.loaders import ModelLoaders
+from play_with_gql.api.libraries.permissions import PermissionCache
+
+
+@dataclass
+class SubscriptionContext:
+    """웹소켓 연결 하나 동안 유지되는 컨텍스트. HTTP 뷰의 컨텍스트와 같은 속성을 갖는다"""
+
+    request: BaseGraphQLWSConsumer
+    user: Any
+    # 연결 단위 로더는 두지 않는다. 구독 이벤트마다 `use_own_loaders` 로 새 로더를 만든다
+    loaders: ModelLoaders | None = None
+    permissions: PermissionCache = field(init=False)
+    connection_params: Any = None
+
+    def __post_init__(self):
+        self.permissions = PermissionCache(self.user)
+
+    # strawberry 의 프로토콜 핸들러는 context["connection_params"] 로 쓴다
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        setattr(self, key, value)
+
+
+class GraphQLWSConsumer(BaseGraphQLWSConsumer):
+    async def get_context(
+        self, request: BaseGraphQLWSConsumer, response: BaseGraphQLWSConsumer
+    ) -> SubscriptionContext:
+        # AuthMiddlewareStack 이 연결 시점에 세션 사용자를 해석해 둔다
+        return SubscriptionContext(request=request, user=request.scope.get("user") or AnonymousUser())
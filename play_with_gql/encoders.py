@@ -0,0 +1,91 @@
+import json
+from collections.abc import AsyncIterator, Iterator
+from typing import Any, Protocol
+
+import orjson
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+# 스트리밍 응답에서 작은 조각을 모아 이만큼씩 보낸다
+STREAM_CHUNK_BYTES = 64 * 1024
+
+_django_default = DjangoJSONEncoder().default
+
+
+class ResponseEncoder(Protocol):
+    def encode(self, data: Any) -> bytes: ...
+
+
+class StdlibEncoder:
+    """표준 json 모듈과 DjangoJSONEncoder. strawberry Django 뷰의 기본 인코딩과 같은 출력을 낸다"""
+
+    def encode(self, data: Any) -> bytes:
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class OrjsonEncoder:
+    """orjson 으로 중간 문자열 없이 바로 bytes 를 만든다
+
+    date/datetime/UUID/dataclass 는 orjson 이 직접 인코딩하고, Decimal·지연 번역 문자열 등 나머지는
+    DjangoJSONEncoder 로 넘긴다.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS
+
+    def encode(self, data: Any) -> bytes:
+        return orjson.dumps(data, default=_django_default, option=self.option)
+
+
+def encoder_from_settings() -> ResponseEncoder:
+    return import_string(settings.GRAPHQL_RESPONSE_ENCODER)()
+
+
+def has_long_list(value: Any, max_items: int) -> bool:
+    """`max_items` 개보다 긴 리스트가 들어 있는지. 긴 리스트의 항목 안은 보지 않는다"""
+    if isinstance(value, dict):
+        return any(has_long_list(item, max_items) for item in value.values())
+    if isinstance(value, list):
+        return len(value) > max_items or any(has_long_list(item, max_items) for item in value)
+    return False
+
+
+def _iter_encode(encoder: ResponseEncoder, value: Any, chunk_items: int) -> Iterator[bytes]:
+    if isinstance(value, list) and len(value) > chunk_items:
+        yield b"["
+        for start in range(0, len(value), chunk_items):
+            # "[a,b]" 에서 괄호를 떼고 이어 붙인다
+            chunk = encoder.encode(value[start : start + chunk_items])[1:-1]
+            yield b"," + chunk if start else chunk
+        yield b"]"
+    elif isinstance(value, dict | list) and has_long_list(value, chunk_items):
+        if isinstance(value, dict):
+            yield b"{"
+            for i, (key, item) in enumerate(value.items()):
+                yield (b"," if i else b"") + encoder.encode(str(key)) + b":"
+                yield from _iter_encode(encoder, item, chunk_items)
+            yield b"}"
+        else:
+            yield b"["
+            for i, item in enumerate(value):
+                if i:
+                    yield b","
+                yield from _iter_encode(encoder, item, chunk_items)
+            yield b"]"
+    else:
+        yield encoder.encode(value)
+
+
+async def aiter_encode(encoder: ResponseEncoder, value: Any, chunk_items: int) -> AsyncIterator[bytes]:
+    """긴 리스트를 `chunk_items` 개씩 인코딩해 STREAM_CHUNK_BYTES 단위로 흘려보낸다
+
+    전체 응답 bytes 를 한 번에 만들지 않으므로 큰 결과에서 첫 바이트가 빨리 나가고 출력 버퍼가 작게 유지된다.
+    """
+    buffer = bytearray()
+    for piece in _iter_encode(encoder, value, chunk_items):
+        buffer += piece
+        if len(buffer) >= STREAM_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
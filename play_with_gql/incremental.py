@@ -0,0 +1,492 @@
+import asyncio
+import copy
+import inspect
+from collections.abc import AsyncIterator, Awaitable, Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+import strawberry
+from django.conf import settings
+from django.db.models import QuerySet
+from graphql import (
+    DirectiveLocation,
+    DirectiveNode,
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLArgument,
+    GraphQLBoolean,
+    GraphQLDirective,
+    GraphQLError,
+    GraphQLInt,
+    GraphQLNamedType,
+    GraphQLNonNull,
+    GraphQLSchema,
+    GraphQLString,
+    InlineFragmentNode,
+    NameNode,
+    Node,
+    OperationDefinitionNode,
+    OperationType,
+    SelectionSetNode,
+    VariableNode,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_list_type,
+    parse,
+    print_ast,
+    validate,
+    value_from_ast_untyped,
+    visit,
+)
+from graphql.language import Visitor
+from strawberry.extensions import SchemaExtension
+from strawberry.types import ExecutionResult
+
+from play_with_gql.api.libraries.loaders import with_own_loaders
+from play_with_gql.query_cost import budget_error, estimate_query_cost
+
+DeferDirective = GraphQLDirective(
+    name="defer",
+    locations=[DirectiveLocation.FRAGMENT_SPREAD, DirectiveLocation.INLINE_FRAGMENT],
+    args={
+        "if": GraphQLArgument(GraphQLNonNull(GraphQLBoolean), default_value=True),
+        "label": GraphQLArgument(GraphQLString),
+    },
+    description="Deliver the fragment after the rest of the response (multipart/mixed only).",
+)
+StreamDirective = GraphQLDirective(
+    name="stream",
+    locations=[DirectiveLocation.FIELD],
+    args={
+        "if": GraphQLArgument(GraphQLNonNull(GraphQLBoolean), default_value=True),
+        "label": GraphQLArgument(GraphQLString),
+        "initialCount": GraphQLArgument(GraphQLNonNull(GraphQLInt), default_value=0),
+    },
+    description="Deliver list items after the first `initialCount` in a later payload (multipart/mixed only).",
+)
+INCREMENTAL_DIRECTIVES = (DeferDirective.name, StreamDirective.name)
+
+# 지연 조각을 빼서 비어 버린 선택 집합을 채우는 필드. 응답에서는 지운다
+PLACEHOLDER_ALIAS = "incrementalPlaceholder"
+
+# 처음 응답을 실행하는 동안 @stream 목록 필드의 (목록 색인을 뺀 응답 경로 -> initialCount)
+_stream_initial_counts: ContextVar[dict[tuple[str, ...], int] | None] = ContextVar(
+    "stream_initial_counts", default=None
+)
+
+
+class IncrementalQueryError(Exception):
+    """@defer / @stream 문서를 나눌 수 없을 때. `errors` 를 실행 결과의 errors 로 응답한다"""
+
+    def __init__(self, errors: list[GraphQLError]):
+        super().__init__(errors[0].message)
+        self.errors = errors
+
+
+def add_incremental_directives(schema: strawberry.Schema) -> None:
+    """@defer / @stream 을 검증이 받아들이도록 실행 스키마에 등록한다
+
+    strawberry directive 로 등록하면 DirectivesExtension 이 모든 필드 resolve 를 감싸므로, 실행기는 이 지시어를
+    보지 않고 `plan_incremental` 이 문서를 나눠 처리한다.
+    """
+    graphql_schema = schema._schema
+    names = {directive.name for directive in graphql_schema.directives}
+    graphql_schema.directives = (
+        *graphql_schema.directives,
+        *(directive for directive in (DeferDirective, StreamDirective) if directive.name not in names),
+    )
+
+
+def has_incremental_directives(query: str | None) -> bool:
+    # 대부분의 요청은 파싱 없이 걸러낸다
+    return query is not None and ("@defer" in query or "@stream" in query)
+
+
+def _replace(node: Node, **changes: Any) -> Any:
+    node = copy.copy(node)
+    for key, value in changes.items():
+        setattr(node, key, value)
+    return node
+
+
+def _response_key(node: FieldNode) -> str:
+    return node.alias.value if node.alias else node.name.value
+
+
+def _without_directive(node: Node, name: str) -> Any:
+    return _replace(node, directives=tuple(d for d in node.directives if d.name.value != name))
+
+
+@dataclass
+class IncrementalPart:
+    """처음 응답 뒤에 따로 실행해 보내는 부분"""
+
+    kind: str  # "defer" | "stream"
+    label: str | None
+    # 루트에서 이 부분의 부모 객체까지의 필드·인라인 조각
+    ancestors: tuple[FieldNode | InlineFragmentNode, ...]
+    # 지연 조각(defer) 또는 목록 필드(stream). 지시어는 지워져 있다
+    node: InlineFragmentNode | FieldNode
+    initial_count: int = 0
+    query: str = ""
+
+    @property
+    def response_path(self) -> tuple[str, ...]:
+        """목록 색인을 뺀, 루트에서 이 부분의 필드까지의 응답 키"""
+        keys = tuple(_response_key(node) for node in self.ancestors if isinstance(node, FieldNode))
+        return (*keys, _response_key(self.node)) if isinstance(self.node, FieldNode) else keys
+
+
+@dataclass
+class IncrementalPlan:
+    initial_query: str
+    parts: list[IncrementalPart] = field(default_factory=list)
+
+    @property
+    def stream_initial_counts(self) -> dict[tuple[str, ...], int]:
+        # initialCount 가 0 인 목록은 처음 응답 문서에서 빠지므로 자를 필요가 없다
+        return {
+            part.response_path: part.initial_count
+            for part in self.parts
+            if part.kind == "stream" and part.initial_count
+        }
+
+
+class _Planner:
+    def __init__(self, schema: GraphQLSchema, document: DocumentNode, variables: dict[str, Any] | None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        self.parts: list[IncrementalPart] = []
+
+    def _active(self, node: Node, directive_name: str) -> dict[str, Any] | None:
+        directive: DirectiveNode | None = next((d for d in node.directives if d.name.value == directive_name), None)
+        if directive is None:
+            return None
+        arguments = {
+            argument.name.value: value_from_ast_untyped(argument.value, self.variables)
+            for argument in directive.arguments
+        }
+        return arguments if arguments.get("if", True) else None
+
+    def inline(self, selection_set: SelectionSetNode | None, flatten: bool = False) -> SelectionSetNode | None:
+        """조각 전개(...Name)를 인라인 조각으로 펼친다. flatten 이면 안쪽 @defer / @stream 도 지운다"""
+        if selection_set is None:
+            return None
+        selections = []
+        for original in selection_set.selections:
+            selection = original
+            if isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments[selection.name.value]
+                selection = InlineFragmentNode(
+                    type_condition=fragment.type_condition,
+                    directives=selection.directives,
+                    selection_set=fragment.selection_set,
+                )
+            if flatten:
+                for name in INCREMENTAL_DIRECTIVES:
+                    selection = _without_directive(selection, name)
+            selections.append(_replace(selection, selection_set=self.inline(selection.selection_set, flatten)))
+        return SelectionSetNode(selections=tuple(selections))
+
+    def split(
+        self,
+        parent_type: GraphQLNamedType,
+        selection_set: SelectionSetNode,
+        ancestors: tuple[FieldNode | InlineFragmentNode, ...],
+    ) -> SelectionSetNode:
+        """처음 응답에 들어갈 선택 집합을 돌려주고, 지연·스트림 부분은 self.parts 에 모은다"""
+        selections = []
+        for original in selection_set.selections:
+            selection = original
+            if isinstance(selection, InlineFragmentNode):
+                fragment_type = (
+                    self.schema.get_type(selection.type_condition.name.value)
+                    if selection.type_condition
+                    else parent_type
+                )
+                defer = self._active(selection, DeferDirective.name)
+                if defer is not None:
+                    # 지연 조각 안의 @defer / @stream 은 이 조각과 함께 보낸다
+                    node = _replace(
+                        _without_directive(selection, DeferDirective.name),
+                        selection_set=self.inline(selection.selection_set, flatten=True),
+                    )
+                    self.parts.append(IncrementalPart("defer", defer.get("label"), ancestors, node))
+                    continue
+                selection = _replace(
+                    _without_directive(selection, DeferDirective.name),
+                    selection_set=self.split(fragment_type, selection.selection_set, (*ancestors, selection)),
+                )
+                selections.append(selection)
+                continue
+
+            field_def = getattr(parent_type, "fields", {}).get(selection.name.value)
+            stream = self._active(selection, StreamDirective.name)
+            selection = _without_directive(selection, StreamDirective.name)
+            if stream is not None:
+                if field_def is None or not is_list_type(get_nullable_type(field_def.type)):
+                    raise GraphQLError("@stream can only be used on list fields.", selection)
+                node = _replace(selection, selection_set=self.inline(selection.selection_set, flatten=True))
+                initial_count = max(stream.get("initialCount", 0), 0)
+                self.parts.append(IncrementalPart("stream", stream.get("label"), ancestors, node, initial_count))
+                if initial_count:
+                    # 처음 응답은 앞 initialCount 개만 남기고 자른다
+                    selections.append(node)
+                continue
+            if selection.selection_set is not None and field_def is not None:
+                selection = _replace(
+                    selection,
+                    selection_set=self.split(
+                        get_named_type(field_def.type), selection.selection_set, (*ancestors, selection)
+                    ),
+                )
+            selections.append(selection)
+
+        if not selections:
+            selections.append(FieldNode(alias=NameNode(value=PLACEHOLDER_ALIAS), name=NameNode(value="__typename")))
+        return SelectionSetNode(selections=tuple(selections))
+
+
+def _document(operation: OperationDefinitionNode, selection_set: SelectionSetNode) -> str:
+    # 이 문서에서 쓰지 않는 변수 정의는 검증 오류이므로 뺀다
+    used: set[str] = set()
+
+    class VariableVisitor(Visitor):
+        def enter_variable(self, node: VariableNode, *args: Any) -> None:
+            used.add(node.name.value)
+
+    visit(selection_set, VariableVisitor())
+    operation = _replace(
+        operation,
+        selection_set=selection_set,
+        variable_definitions=tuple(
+            definition for definition in operation.variable_definitions if definition.variable.name.value in used
+        ),
+    )
+    return print_ast(DocumentNode(definitions=(operation,)))
+
+
+def plan_incremental(
+    schema: strawberry.Schema, query: str, operation_name: str | None, variables: dict[str, Any] | None
+) -> IncrementalPlan | None:
+    """활성 @defer / @stream 이 있는 query operation 을 처음 응답 문서와 부분별 문서로 나눈다. 없으면 None
+
+    mutation 은 나눠 실행하면 두 번 반영되므로 나누지 않는다 (지시어는 무시되고 한 번에 응답한다).
+    검증되지 않은 문서(없는 조각, 순환하는 조각 등), 비용 예산을 넘는 문서, 부분이 `GRAPHQL_INCREMENTAL_MAX_PARTS` 보다
+    많은 문서는 나누기 전에 `IncrementalQueryError` 로 거부한다.
+    """
+    try:
+        document = parse(query)
+    except GraphQLError:
+        return None
+    operation = get_operation_ast(document, operation_name)
+    if operation is None or operation.operation is not OperationType.QUERY:
+        return None
+    # 조각 펼치기는 조각이 있고 순환하지 않는다고 가정하므로 먼저 검증한다
+    errors = validate(schema._schema, document)
+    if errors:
+        raise IncrementalQueryError(errors)
+    # 부분 문서는 QueryCostExtension 이 따로 검사하므로, 잘게 나눠 예산을 피하지 못하게 원래 문서 전체로 검사한다
+    cost = estimate_query_cost(schema, document, operation_name, variables)
+    error = cost and budget_error(cost)
+    if error is not None:
+        raise IncrementalQueryError([error])
+
+    planner = _Planner(schema._schema, document, variables)
+    root_type = schema._schema.get_root_type(operation.operation)
+    try:
+        initial = planner.split(root_type, planner.inline(operation.selection_set), ())
+    except GraphQLError as error:
+        raise IncrementalQueryError([error]) from error
+    if not planner.parts:
+        return None
+    max_parts = settings.GRAPHQL_INCREMENTAL_MAX_PARTS
+    if len(planner.parts) > max_parts:
+        raise IncrementalQueryError(
+            [
+                GraphQLError(
+                    f"Query has {len(planner.parts)} @defer / @stream parts, over the maximum of {max_parts}.",
+                    extensions={"code": "TOO_MANY_INCREMENTAL_PARTS"},
+                )
+            ]
+        )
+
+    for part in planner.parts:
+        selection_set = SelectionSetNode(selections=(part.node,))
+        for ancestor in reversed(part.ancestors):
+            selection_set = SelectionSetNode(selections=(_replace(ancestor, selection_set=selection_set),))
+        part.query = _document(operation, selection_set)
+    return IncrementalPlan(initial_query=_document(operation, initial), parts=planner.parts)
+
+
+def _objects_at(
+    value: Any, ancestors: tuple[FieldNode | InlineFragmentNode, ...], path: tuple[str | int, ...] = ()
+) -> Iterator[tuple[tuple[str | int, ...], dict[str, Any]]]:
+    """응답 데이터에서 ancestors 경로의 객체들을 (응답 경로, 객체) 로 돌려준다. 목록은 항목마다 펼친다"""
+    if value is None:
+        return
+    if isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from _objects_at(item, ancestors, (*path, index))
+        return
+    if not ancestors:
+        yield path, value
+        return
+    head, rest = ancestors[0], ancestors[1:]
+    if isinstance(head, InlineFragmentNode):
+        yield from _objects_at(value, rest, path)
+        return
+    key = _response_key(head)
+    yield from _objects_at(value.get(key), rest, (*path, key))
+
+
+def _strip_placeholders(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_strip_placeholders(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _strip_placeholders(item) for key, item in value.items() if key != PLACEHOLDER_ALIAS}
+    return value
+
+
+def _formatted_errors(result: ExecutionResult) -> dict[str, Any]:
+    return {"errors": [error.formatted for error in result.errors]} if result.errors else {}
+
+
+def _initial_data(plan: IncrementalPlan, data: dict[str, Any] | None) -> dict[str, Any] | None:
+    data = _strip_placeholders(data)
+    for part in plan.parts:
+        if part.kind != "stream":
+            continue
+        key = _response_key(part.node)
+        for _, parent in _objects_at(data, part.ancestors):
+            parent[key] = parent[key][: part.initial_count] if parent.get(key) is not None else []
+    return data
+
+
+def _subsequent_payload(part: IncrementalPart, result: ExecutionResult) -> dict[str, Any]:
+    data = _strip_placeholders(result.data)
+    label = {"label": part.label} if part.label else {}
+    incremental = []
+    if part.kind == "defer":
+        for path, obj in _objects_at(data, part.ancestors):
+            if obj:
+                # 조건 타입이 맞지 않는 객체는 빈 객체가 되므로 보내지 않는다
+                incremental.append({"data": obj, "path": list(path), **label})
+    else:
+        key = _response_key(part.node)
+        for path, parent in _objects_at(data, part.ancestors):
+            items = parent.get(key)
+            if items and len(items) > part.initial_count:
+                incremental.append(
+                    {"items": items[part.initial_count :], "path": [*path, key, part.initial_count], **label}
+                )
+    if result.errors:
+        if not incremental:
+            incremental.append({"data": None, "path": [], **label})
+        incremental[0].update(_formatted_errors(result))
+    return {"incremental": incremental}
+
+
+def stream_initial_count(info: Any) -> int | None:
+    """처음 응답을 실행하는 중이고 이 필드에 @stream 이 있으면 그 initialCount, 아니면 None
+
+    목록을 직접 읽는 resolver 는 이 값으로 처음부터 그만큼만 읽을 수 있다.
+    """
+    # 스키마가 resolve 훅을 첫 요청의 확장 인스턴스로 캐시하므로 요청 상태는 컨텍스트 변수에서 읽는다
+    counts = _stream_initial_counts.get()
+    if not counts:
+        return None
+    return counts.get(tuple(key for key in info.path.as_list() if not isinstance(key, int)))
+
+
+class StreamInitialCountExtension(SchemaExtension):
+    """처음 응답에서 @stream 목록을 완성(하위 필드 해석)하기 전에 앞 initialCount 개로 자른다
+
+    나머지 항목은 stream 부분이 따로 보내므로, 처음 응답은 나머지 항목의 하위 필드를 해석하지 않는다.
+    """
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        result = _next(root, info, *args, **kwargs)
+        count = stream_initial_count(info)
+        if count is None:
+            return result
+        if inspect.isawaitable(result):
+            return self._await_and_truncate(result, count)
+        return _truncate(result, count)
+
+    @staticmethod
+    async def _await_and_truncate(result: Awaitable, count: int) -> Any:
+        return _truncate(await result, count)
+
+
+def _truncate(result: Any, count: int) -> Any:
+    # QuerySet 은 잘라도 아직 읽지 않았으므로 LIMIT 으로 읽는다
+    return result[:count] if isinstance(result, QuerySet | list | tuple) else result
+
+
+async def execute_incrementally(
+    schema: strawberry.Schema,
+    plan: IncrementalPlan,
+    variable_values: dict[str, Any] | None = None,
+    context_value: Any | None = None,
+    root_value: Any | None = None,
+    operation_name: str | None = None,
+) -> tuple[ExecutionResult, AsyncIterator[dict[str, Any]]]:
+    """처음 응답과 부분 문서를 함께 실행해 처음 응답과, 부분이 끝나는 순서대로 나오는 후속 payload 를 돌려준다
+
+    모든 문서가 같은 사용자·권한 캐시를 쓰고, DataLoader 는 문서마다 따로 둔다 (같은 응답 경로의 connection 이 다른
+    선택으로 로더를 나눠 쓰지 않도록). 처음 응답이 끝나기 전에 끝난 부분도 처음 응답 뒤에 보낸다.
+    """
+
+    def execute(query: str) -> asyncio.Task[ExecutionResult]:
+        return asyncio.ensure_future(
+            schema.execute(
+                query,
+                variable_values=variable_values,
+                context_value=with_own_loaders(context_value) if context_value is not None else None,
+                root_value=root_value,
+                operation_name=operation_name,
+            )
+        )
+
+    part_tasks = {execute(part.query): part for part in plan.parts}
+    # 태스크는 만들 때의 컨텍스트 변수를 복사하므로 처음 응답 태스크에만 initialCount 가 보인다
+    token = _stream_initial_counts.set(plan.stream_initial_counts)
+    try:
+        initial_task = execute(plan.initial_query)
+    finally:
+        _stream_initial_counts.reset(token)
+    try:
+        initial = await initial_task
+    except BaseException:
+        for task in part_tasks:
+            task.cancel()
+        raise
+
+    initial = ExecutionResult(
+        data=_initial_data(plan, initial.data), errors=initial.errors, extensions=initial.extensions
+    )
+
+    async def subsequent() -> AsyncIterator[dict[str, Any]]:
+        pending = set(part_tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                incremental = []
+                for task in done:
+                    incremental.extend(_subsequent_payload(part_tasks[task], task.result())["incremental"])
+                yield {"incremental": incremental, "hasNext": bool(pending)}
+        finally:
+            for task in pending:
+                task.cancel()
+
+    return initial, subsequent()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LibraryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "play_with_gql.libraries"
+
+    def ready(self):
+        from play_with_gql.libraries import signals  # noqa: F401
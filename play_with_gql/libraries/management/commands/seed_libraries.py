@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from play_with_gql.libraries.seeding import SeedPlan, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed realistic libraries, authors, librarians and books in bulk. "
+        "Books are written with PostgreSQL COPY while the book indexes and foreign keys are dropped, then rebuilt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=100_000)
+        parser.add_argument("--libraries", type=int, help="Default: one library per 1,000 books")
+        parser.add_argument("--authors", type=int, help="Default: one author per 50 books")
+        parser.add_argument("--librarians-per-library", type=int, default=1)
+        parser.add_argument(
+            "--author-skew",
+            type=float,
+            default=1.0,
+            help="1 spreads books evenly over authors; larger values concentrate them on a few popular authors",
+        )
+        parser.add_argument("--method", choices=["copy", "bulk_create"], help="Default: copy on PostgreSQL")
+        parser.add_argument(
+            "--no-defer-indexes",
+            action="store_false",
+            dest="defer_indexes",
+            help="Keep book indexes and foreign keys during the load",
+        )
+        parser.add_argument("--seed", type=int, help="Random seed for reproducible data")
+
+    def handle(self, *args, **options):
+        books = options["books"]
+        method = options["method"] or ("copy" if connection.vendor == "postgresql" else "bulk_create")
+        if connection.vendor != "postgresql" and (method == "copy" or options["defer_indexes"]):
+            if method == "copy":
+                raise CommandError("--method copy requires PostgreSQL.")
+            options["defer_indexes"] = False
+
+        plan = SeedPlan(
+            books=books,
+            libraries=options["libraries"] or max(1, books // 1_000),
+            authors=options["authors"] or max(1, books // 50),
+            librarians_per_library=options["librarians_per_library"],
+            author_skew=options["author_skew"],
+            method=method,
+            defer_indexes=options["defer_indexes"],
+            seed=options["seed"],
+        )
+        if plan.libraries < 1 or plan.authors < 1 or plan.books < 0 or plan.librarians_per_library < 0:
+            raise CommandError("--libraries and --authors must be positive and --books must not be negative.")
+
+        started = time.perf_counter()
+        created = seed(plan)
+        elapsed = time.perf_counter() - started
+        summary = ", ".join(f"{count} {name}" for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {elapsed:.1f}s ({method})."))
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 00:56
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_book_counts(apps, schema_editor):
+    Book = apps.get_model("libraries", "Book")
+    for parent_model, field_name in ((apps.get_model("libraries", "Library"), "library"), (apps.get_model("libraries", "Author"), "author")):
+        counts = (
+            Book.objects.filter(**{field_name: OuterRef("pk")})
+            .order_by()
+            .values(field_name)
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        parent_model.objects.update(book_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libraries', '0006_book_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='library',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_book_counts, migrations.RunPython.noop),
+    ]
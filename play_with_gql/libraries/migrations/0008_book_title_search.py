@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# pg_trgm 연산자 클래스를 쓰는 인덱스는 모델 상태 밖에서 관리한다 (확장이 없는 DB 에서도 모델 테이블은 만들 수 있도록)
+TRIGRAM_INDEXES_SQL = [
+    # contains / endsWith / regex / iRegex
+    'CREATE INDEX IF NOT EXISTS "book_title_trgm_idx" ON "libraries_book" USING gin ("title" gin_trgm_ops)',
+    # iContains / iEndsWith (`UPPER(title) LIKE UPPER('%x%')`)
+    'CREATE INDEX IF NOT EXISTS "book_title_upper_trgm_idx" ON "libraries_book" USING gin (UPPER("title") gin_trgm_ops)',
+]
+DROP_TRIGRAM_INDEXES_SQL = [
+    'DROP INDEX IF EXISTS "book_title_trgm_idx"',
+    'DROP INDEX IF EXISTS "book_title_upper_trgm_idx"',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('libraries', '0007_book_counts'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(TRIGRAM_INDEXES_SQL, DROP_TRIGRAM_INDEXES_SQL),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title'], name='book_title_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='text_pattern_ops'), name='book_title_upper_like_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('title', config='simple'), name='book_title_search_idx'),
+        ),
+    ]
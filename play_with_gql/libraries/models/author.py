@@ -4,3 +4,5 @@ from django.db import models
 class Author(models.Model):
     title = models.CharField(max_length=255)
     name = models.CharField(max_length=255)
+    # Book 시그널이 유지하는 저서 수 (books connection 의 COUNTER totalCount)
+    book_count = models.PositiveIntegerField(default=0, editable=False)
@@ -1,4 +1,10 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector
 from django.db import models
+from django.db.models.functions import Now, Upper
+
+# search 필터가 쓰는 전문 검색 설정. 형태소 분석 없이 공백 단위로 토큰화한다
+TITLE_SEARCH_CONFIG = "simple"
 
 
 class Book(models.Model):
@@ -6,3 +12,34 @@ class Book(models.Model):
     title = models.CharField(max_length=255)
     author = models.ForeignKey("libraries.Author", on_delete=models.CASCADE, related_name="books")
     published_date = models.DateField()
+    # 증분 export 의 워터마크. COPY 처럼 값을 주지 않는 INSERT 는 DB 기본값이 채운다.
+    # QuerySet.update 는 auto_now 를 채우지 않으므로 일괄 수정은 직접 갱신한다
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
+
+    # book_count 를 유지하는 부모 FK (libraries.signals)
+    COUNTED_PARENT_IDS = ("library_id", "author_id")
+
+    class Meta:
+        # keyset 페이지네이션(`WHERE library_id = ? AND id > ? ORDER BY id`)용 복합 인덱스
+        indexes = [
+            models.Index(fields=["library", "id"], name="book_library_id_id_idx"),
+            models.Index(fields=["author", "id"], name="book_author_id_id_idx"),
+            # 증분 export (`WHERE updated_at >= ? ORDER BY updated_at, id`)
+            models.Index(fields=["updated_at", "id"], name="book_updated_at_id_idx"),
+            # title exact / startsWith (`title = ?`, `title LIKE 'x%'`)
+            models.Index(fields=["title"], opclasses=["varchar_pattern_ops"], name="book_title_like_idx"),
+            # title iExact / iStartsWith (`UPPER(title) LIKE UPPER('x%')`)
+            models.Index(OpClass(Upper("title"), name="text_pattern_ops"), name="book_title_upper_like_idx"),
+            # search 필터의 tsvector
+            GinIndex(SearchVector("title", config=TITLE_SEARCH_CONFIG), name="book_title_search_idx"),
+            # contains / iContains / regex 용 pg_trgm GIN 인덱스는 확장이 필요해 마이그레이션(0008)에서만 만든다
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 저장 시 부모 이동을 감지할 수 있도록 로드 시점의 FK 값을 기억한다
+        instance._loaded_parent_ids = {
+            attname: instance.__dict__[attname] for attname in cls.COUNTED_PARENT_IDS if attname in instance.__dict__
+        }
+        return instance
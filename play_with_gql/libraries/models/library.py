@@ -5,3 +5,5 @@ class Library(models.Model):
     name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Book 시그널이 유지하는 소장 도서 수 (books connection 의 COUNTER totalCount)
+    book_count = models.PositiveIntegerField(default=0, editable=False)
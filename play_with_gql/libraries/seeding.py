@@ -0,0 +1,193 @@
+import contextlib
+import itertools
+import random
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import date
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from play_with_gql import response_cache
+from play_with_gql.libraries.factories import AuthorFactory, BookFactory, LibraryFactory
+from play_with_gql.libraries.models import Author, Book, Librarian, Library
+from play_with_gql.libraries.signals import refresh_book_counts
+from play_with_gql.users.models import User
+
+# 팩토리(Faker)로 만들어 돌려 쓰는 이름·제목 수. 행마다 Faker 를 부르면 천만 권에서 몇 시간이 걸린다
+NAME_POOL_SIZE = 10_000
+BULK_CREATE_BATCH_SIZE = 10_000
+# COPY 한 번에 보내는 행 수. 메모리에는 이만큼만 올린다
+COPY_CHUNK_ROWS = 100_000
+# 미뤄 둔 인덱스를 다시 만들 때 쓰는 정렬 메모리. 큰 GIN 인덱스 빌드가 빨라진다
+INDEX_BUILD_MEMORY = "512MB"
+PUBLISHED_DATE_RANGE = (date(1950, 1, 1).toordinal(), date(2024, 12, 31).toordinal())
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+@dataclass
+class SeedPlan:
+    books: int
+    libraries: int
+    authors: int
+    librarians_per_library: int = 1
+    # 저자 인기도 편중. 1 이면 고르게, 클수록 앞쪽 저자에게 책이 몰린다 (index = authors * random() ** skew)
+    author_skew: float = 1.0
+    # "copy" 는 PostgreSQL COPY FROM STDIN, "bulk_create" 는 ORM 배치 INSERT
+    method: str = "copy"
+    # 책을 넣는 동안 libraries_book 의 보조 인덱스와 FK 제약을 지웠다가 끝나고 한 번에 다시 만든다
+    defer_indexes: bool = True
+    seed: int | None = None
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def copy_rows(model: type[models.Model], fields: list[str], rows: Iterable[tuple]) -> int:
+    """`rows` 를 PostgreSQL `COPY ... FROM STDIN` 으로 넣는다. 모델 시그널은 보내지 않는다"""
+    meta = model._meta
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(quote_name(meta.get_field(name).column) for name in fields)
+    sql = f"COPY {quote_name(meta.db_table)} ({columns}) FROM STDIN"
+
+    count = 0
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while chunk := list(itertools.islice(rows, COPY_CHUNK_ROWS)):
+            with cursor.copy(sql) as copy:
+                copy.write("".join("\t".join(map(_copy_value, row)) + "\n" for row in chunk))
+            count += len(chunk)
+    return count
+
+
+def bulk_create_rows(model: type[models.Model], fields: list[str], rows: Iterable[tuple]) -> int:
+    """`copy_rows` 와 같은 입력을 bulk_create 배치로 넣는다. PostgreSQL 이 아닌 DB 용"""
+    attnames = [model._meta.get_field(name).attname for name in fields]
+    count = 0
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, BULK_CREATE_BATCH_SIZE)):
+        model._default_manager.bulk_create(model(**dict(zip(attnames, row, strict=True))) for row in chunk)
+        count += len(chunk)
+    return count
+
+
+@contextlib.contextmanager
+def deferred_indexes(model: type[models.Model]) -> Iterator[list[str]]:
+    """블록 동안 테이블의 보조 인덱스와 FK 제약을 지우고 블록이 끝나면 다시 만든다. 지운 이름을 돌려준다
+
+    행마다 인덱스를 갱신하고 FK 트리거를 쌓는 대신, 끝나고 인덱스를 한 번에 만들고 FK 는 테이블 전체를 한 번 훑어
+    검증한다. PK·unique 인덱스는 그대로 둔다. 트랜잭션 안에서 써야 실패해도 롤백으로 되살아난다.
+    """
+    table = model._meta.db_table
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT index_class.relname, pg_get_indexdef(index_class.oid)
+            FROM pg_index
+            JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+            WHERE pg_index.indrelid = %s::regclass AND NOT pg_index.indisprimary AND NOT pg_index.indisunique
+            """,
+            [table],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype = 'f'
+            """,
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        for name, _ in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote_name(table)} DROP CONSTRAINT {quote_name(name)}")
+        for name, _ in indexes:
+            cursor.execute(f"DROP INDEX {quote_name(name)}")
+
+    yield [name for name, _ in [*indexes, *foreign_keys]]
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL maintenance_work_mem = '{INDEX_BUILD_MEMORY}'")
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote_name(table)} ADD CONSTRAINT {quote_name(name)} {definition}")
+
+
+def _name_pool(factory, attribute: str, size: int) -> list[str]:
+    return [getattr(instance, attribute) for instance in factory.build_batch(size)]
+
+
+def seed(plan: SeedPlan) -> dict[str, int]:
+    """계획대로 도서관·저자·사서·책을 만들고 모델별로 만든 행 수를 돌려준다
+
+    모두 한 트랜잭션에서 만들고, 시그널을 거치지 않으므로 끝나고 book_count 와 응답 캐시를 한 번에 맞춘다.
+    """
+    rng = random.Random(plan.seed)
+    pool_size = min(NAME_POOL_SIZE, max(plan.libraries, plan.authors, plan.books, 1))
+    author_names = _name_pool(AuthorFactory, "name", pool_size)
+    author_titles = _name_pool(AuthorFactory, "title", pool_size)
+    library_names = _name_pool(LibraryFactory, "name", pool_size)
+    book_titles = _name_pool(BookFactory, "title", pool_size)
+
+    with transaction.atomic():
+        libraries = Library.objects.bulk_create(
+            (Library(name=f"{rng.choice(library_names)} Library") for _ in range(plan.libraries)),
+            batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+        authors = Author.objects.bulk_create(
+            (Author(name=rng.choice(author_names), title=rng.choice(author_titles)) for _ in range(plan.authors)),
+            batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+        users = User.objects.bulk_create(
+            (
+                # 로그인할 수 없는 비밀번호. make_password 로 행마다 해시를 만들지 않는다
+                User(username=f"librarian-{library.pk}-{i}", password="!", date_joined=timezone.now())
+                for library in libraries
+                for i in range(plan.librarians_per_library)
+            ),
+            batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+        librarians = Librarian.objects.bulk_create(
+            (
+                Librarian(user=user, library=libraries[i // plan.librarians_per_library], name=user.username)
+                for i, user in enumerate(users)
+            ),
+            batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+
+        library_ids = [library.pk for library in libraries]
+        author_ids = [author.pk for author in authors]
+
+        def book_rows() -> Iterator[tuple]:
+            for _ in range(plan.books):
+                yield (
+                    rng.choice(library_ids),
+                    author_ids[int(len(author_ids) * rng.random() ** plan.author_skew)],
+                    rng.choice(book_titles),
+                    date.fromordinal(rng.randint(*PUBLISHED_DATE_RANGE)),
+                )
+
+        write_rows = copy_rows if plan.method == "copy" else bulk_create_rows
+        indexes = deferred_indexes(Book) if plan.defer_indexes else contextlib.nullcontext()
+        with indexes:
+            books = write_rows(Book, ["library", "author", "title", "published_date"], book_rows())
+
+        refresh_book_counts()
+        for model in (Library, Author, Book, Librarian):
+            response_cache.invalidate(model)
+
+    if connection.vendor == "postgresql":
+        # 플래너가 새 행 수를 바로 알도록 통계를 갱신한다
+        with connection.cursor() as cursor:
+            for model in (Library, Author, Book, Librarian):
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+    return {"libraries": len(libraries), "authors": len(authors), "librarians": len(librarians), "books": books}
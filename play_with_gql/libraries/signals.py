@@ -0,0 +1,124 @@
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from typing import Any
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from play_with_gql import response_cache, subscriptions
+from play_with_gql.libraries.models import Author, Book, Librarian, Library
+
+CREATED = "CREATED"
+UPDATED = "UPDATED"
+DELETED = "DELETED"
+
+
+def book_topic(library_id: Any) -> str:
+    return f"library:{library_id}:books"
+
+
+def library_topic(library_id: Any) -> str:
+    return f"library:{library_id}"
+
+
+def book_changed(kind: str, book_id: Any, library_id: Any) -> subscriptions.Message:
+    """`bookChanged(libraryId)` 구독자에게 보낼 메시지"""
+    return book_topic(library_id), {"kind": kind, "id": book_id}
+
+
+def library_updated(kind: str, library_id: Any) -> subscriptions.Message:
+    """`libraryUpdated(nodeId)` 구독자에게 보낼 메시지"""
+    return library_topic(library_id), {"kind": kind, "id": library_id}
+
+
+def _add_book_count(attname: str, parent_id: Any, delta: int) -> None:
+    parent_model = Book._meta.get_field(attname).related_model
+    parent_model._default_manager.filter(pk=parent_id).update(book_count=F("book_count") + delta)
+
+
+@receiver(post_save, sender=Book)
+def update_book_counts_on_save(sender, instance: Book, created: bool, **kwargs) -> None:
+    loaded_parent_ids = getattr(instance, "_loaded_parent_ids", {})
+    for attname in Book.COUNTED_PARENT_IDS:
+        if attname not in instance.__dict__:
+            continue
+        parent_id = instance.__dict__[attname]
+        # 로드 시점 값을 모르면(직접 만든 인스턴스의 갱신 등) 부모가 바뀌지 않은 것으로 본다
+        previous_id = None if created else loaded_parent_ids.get(attname, parent_id)
+        if previous_id == parent_id:
+            continue
+        if previous_id is not None:
+            _add_book_count(attname, previous_id, -1)
+        _add_book_count(attname, parent_id, 1)
+        loaded_parent_ids[attname] = parent_id
+    instance._loaded_parent_ids = loaded_parent_ids
+
+
+@receiver(post_delete, sender=Book)
+def update_book_counts_on_delete(sender, instance: Book, **kwargs) -> None:
+    for attname in Book.COUNTED_PARENT_IDS:
+        _add_book_count(attname, getattr(instance, attname), -1)
+
+
+@receiver(post_save, sender=Library)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Librarian)
+@receiver(post_delete, sender=Library)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Librarian)
+def invalidate_cached_responses(sender, instance, **kwargs) -> None:
+    response_cache.invalidate(sender, [instance.pk])
+
+
+@receiver(post_save, sender=Book)
+def publish_book_saved(sender, instance: Book, created: bool, **kwargs) -> None:
+    subscriptions.publish([book_changed(CREATED if created else UPDATED, instance.pk, instance.library_id)])
+
+
+@receiver(post_delete, sender=Book)
+def publish_book_deleted(sender, instance: Book, **kwargs) -> None:
+    subscriptions.publish([book_changed(DELETED, instance.pk, instance.library_id)])
+
+
+@receiver(post_save, sender=Library)
+def publish_library_saved(sender, instance: Library, created: bool, **kwargs) -> None:
+    if not created:
+        subscriptions.publish([library_updated(UPDATED, instance.pk)])
+
+
+@receiver(post_delete, sender=Library)
+def publish_library_deleted(sender, instance: Library, **kwargs) -> None:
+    subscriptions.publish([library_updated(DELETED, instance.pk)])
+
+
+def refresh_book_counts() -> None:
+    """bulk_create, QuerySet.update 처럼 시그널을 거치지 않는 변경 뒤에 book_count 를 다시 계산한다"""
+    for attname in Book.COUNTED_PARENT_IDS:
+        field = Book._meta.get_field(attname)
+        counts = (
+            Book.objects.filter(**{field.name: OuterRef("pk")})
+            .order_by()
+            .values(field.name)
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        field.related_model._default_manager.update(book_count=Coalesce(Subquery(counts), 0))
+
+
+def subtract_book_counts(deleted_parent_ids: Iterable[dict[str, Any]]) -> None:
+    """시그널 없이 한 번에 지운 책들({FK attname: 부모 id})만큼 부모별 book_count 를 뺀다
+
+    부모를 빼는 수(delta)별로 묶어 delta 종류마다 UPDATE 한 번으로 끝낸다.
+    """
+    deleted_parent_ids = list(deleted_parent_ids)
+    for attname in Book.COUNTED_PARENT_IDS:
+        parent_ids_by_delta: defaultdict[int, list[Any]] = defaultdict(list)
+        for parent_id, delta in Counter(parent_ids[attname] for parent_ids in deleted_parent_ids).items():
+            parent_ids_by_delta[delta].append(parent_id)
+        parent_model = Book._meta.get_field(attname).related_model
+        for delta, parent_ids in parent_ids_by_delta.items():
+            parent_model._default_manager.filter(pk__in=parent_ids).update(book_count=F("book_count") - delta)
@@ -0,0 +1,164 @@
+import inspect
+import logging
+import re
+import threading
+from collections.abc import Awaitable, Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from graphql import GraphQLResolveInfo
+from strawberry.extensions import SchemaExtension
+
+from play_with_gql.tracing import is_traced_field
+
+logger = logging.getLogger(__name__)
+
+# 실행 중인 operation 의 SQL 모양별 집계. 감지가 켜진 operation 에서만 설정된다
+_current_queries: ContextVar["QueryShapes | None"] = ContextVar("n_plus_one_queries", default=None)
+# 지금 실행 중인 resolver ("BookNode.author", "books.edges.0.node.author")
+_current_resolver: ContextVar[tuple[str, str] | None] = ContextVar("n_plus_one_resolver", default=None)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+
+
+def normalize_sql(sql: str) -> str:
+    """값만 다른 SQL 이 같은 문자열이 되도록 리터럴과 IN 목록 길이를 지운다"""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER_LIST.sub("(%s, ...)", sql)
+    return " ".join(sql.split())
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+@dataclass
+class RepeatedQuery:
+    sql: str
+    count: int
+    # 이 SQL 을 실행한 resolver ("BookNode.author") 와 그 중 첫 번째 필드 경로
+    resolver: str | None
+    path: str | None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"sql": self.sql, "count": self.count, "resolver": self.resolver, "path": self.path}
+
+    def __str__(self) -> str:
+        return f"{self.resolver or 'operation'} ran {self.count}x ({self.path}): {self.sql}"
+
+
+@dataclass
+class _Shape:
+    count: int = 0
+    resolver: tuple[str, str] | None = None
+
+
+@dataclass
+class QueryShapes:
+    """한 operation 에서 실행된 SQL 을 정규화한 모양별로 센다. sync_to_async 스레드에서도 기록된다"""
+
+    shapes: dict[tuple[str, str | None], _Shape] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, sql: str) -> None:
+        resolver = _current_resolver.get()
+        # 같은 SQL 이라도 다른 resolver 가 실행했다면 따로 센다
+        key = (normalize_sql(sql), resolver[0] if resolver else None)
+        with self._lock:
+            shape = self.shapes.setdefault(key, _Shape(resolver=resolver))
+            shape.count += 1
+
+    def repeated(self, threshold: int) -> list[RepeatedQuery]:
+        return [
+            RepeatedQuery(
+                sql=sql,
+                count=shape.count,
+                resolver=shape.resolver[0] if shape.resolver else None,
+                path=shape.resolver[1] if shape.resolver else None,
+            )
+            for (sql, _), shape in self.shapes.items()
+            if shape.count > threshold
+        ]
+
+
+def count_sql(execute, sql, params, many, context):
+    """`connection.execute_wrapper` 훅. 감지가 켜진 operation 의 SQL 을 모양별로 센다"""
+    queries = _current_queries.get()
+    if queries is not None:
+        queries.add(sql)
+    return execute(sql, params, many, context)
+
+
+def install_sql_counter(connection, **kwargs) -> None:
+    if count_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_sql)
+
+
+connection_created.connect(install_sql_counter)
+for _connection in connections.all(initialized_only=True):
+    install_sql_counter(_connection)
+
+
+class NPlusOneExtension(SchemaExtension):
+    """한 operation 안에서 같은 모양의 SQL 이 `GRAPHQL_N_PLUS_ONE_THRESHOLD` 번을 넘게 실행되면 알린다
+
+    resolver 경로와 함께 경고 로그를 남기고, `GRAPHQL_N_PLUS_ONE_RAISE` 면 `NPlusOneError` 로 operation 을 실패시킨다.
+    threshold 가 None 이면 꺼진다.
+    """
+
+    def on_operation(self) -> Iterator[None]:
+        threshold = settings.GRAPHQL_N_PLUS_ONE_THRESHOLD
+        if threshold is None:
+            yield
+            return
+
+        queries = QueryShapes()
+        token = _current_queries.set(queries)
+        try:
+            yield
+        finally:
+            _current_queries.reset(token)
+
+        repeated = queries.repeated(threshold)
+        for query in repeated:
+            logger.warning(
+                "N+1 query detected in %s: %s",
+                self.execution_context.operation_name or "anonymous operation",
+                query,
+                extra={"n_plus_one": {"operation": self.execution_context.operation_name, **query.as_dict()}},
+            )
+        if repeated and settings.GRAPHQL_N_PLUS_ONE_RAISE:
+            raise NPlusOneError("N+1 query detected: " + "; ".join(map(str, repeated)))
+
+    def resolve(self, _next, root, info: GraphQLResolveInfo, *args, **kwargs):
+        # 스키마가 resolve 훅을 첫 요청의 확장 인스턴스로 캐시하므로 요청 상태는 컨텍스트 변수에서 읽는다
+        if _current_queries.get() is None or not is_traced_field(info):
+            return _next(root, info, *args, **kwargs)
+
+        resolver = (
+            f"{info.parent_type.name}.{info.field_name}",
+            ".".join(str(key) for key in info.path.as_list()),
+        )
+        token = _current_resolver.set(resolver)
+        try:
+            result = _next(root, info, *args, **kwargs)
+        finally:
+            _current_resolver.reset(token)
+        if inspect.isawaitable(result):
+            return self._await_in_resolver(result, resolver)
+        return result
+
+    @staticmethod
+    async def _await_in_resolver(result: Awaitable, resolver: tuple[str, str]) -> Any:
+        token = _current_resolver.set(resolver)
+        try:
+            return await result
+        finally:
+            _current_resolver.reset(token)
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import DocumentNode
+from strawberry.extensions import SchemaExtension
+
+PERSISTED_QUERY_CACHE_PREFIX = "graphql:apq:"
+
+
+def sha256_hash(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+class DocumentCache:
+    """sha256 을 키로 파싱·검증까지 끝난 DocumentNode 를 보관하는 LRU 캐시"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._documents: OrderedDict[str, DocumentNode] = OrderedDict()
+        # execute_sync 는 sync_to_async 스레드에서도 실행되므로 순서 갱신을 잠금으로 보호한다
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> DocumentNode | None:
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def set(self, key: str, document: DocumentNode) -> None:
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._documents.clear()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+
+document_cache = DocumentCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+
+
+class DocumentCacheExtension(SchemaExtension):
+    """검증을 통과한 문서를 `document_cache` 에 두고, 같은 쿼리는 파싱과 검증을 모두 건너뛴다
+
+    클래스로 등록해 요청마다 인스턴스가 만들어지게 한다 (캐시 자체는 프로세스 전역).
+    """
+
+    def on_parse(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        assert execution_context.query is not None
+        self.key = sha256_hash(execution_context.query)
+        document = document_cache.get(self.key)
+        if document is not None:
+            execution_context.graphql_document = document
+            # 검증 통과한 문서만 캐시하므로 errors 를 채워 두면 strawberry 가 검증 단계를 건너뛴다
+            execution_context.errors = []
+        self.cached = document is not None
+        yield
+
+    def on_validate(self) -> Iterator[None]:
+        yield
+        execution_context = self.execution_context
+        if not self.cached and not execution_context.errors and execution_context.graphql_document is not None:
+            document_cache.set(self.key, execution_context.graphql_document)
+
+
+class PersistedQueryError(Exception):
+    """APQ 요청을 처리할 수 없을 때. `message`/`code` 는 Apollo 클라이언트가 기대하는 값을 따른다"""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class PersistedQueries:
+    """Automatic Persisted Queries: sha256 해시로 쿼리를 찾고, 처음 보는 해시는 쿼리와 함께 등록받는다
+
+    `allowlist` 가 주어지면 목록의 문서만 실행하고 등록은 받지 않는다.
+    """
+
+    def __init__(
+        self,
+        cache_alias: str = "default",
+        timeout: int | None = None,
+        allowlist: dict[str, str] | None = None,
+    ):
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.allowlist = allowlist
+
+    @classmethod
+    def from_settings(cls) -> "PersistedQueries":
+        allowlist_path: Path | None = settings.GRAPHQL_PERSISTED_QUERIES_ALLOWLIST
+        return cls(
+            cache_alias=settings.GRAPHQL_PERSISTED_QUERIES_CACHE,
+            timeout=settings.GRAPHQL_PERSISTED_QUERIES_TIMEOUT,
+            allowlist=json.loads(Path(allowlist_path).read_text()) if allowlist_path else None,
+        )
+
+    async def aresolve(self, query: str | None, extensions: dict[str, Any] | None) -> str | None:
+        """요청의 query 와 `extensions.persistedQuery` 로 실행할 쿼리 문자열을 정한다"""
+        persisted_query = (extensions or {}).get("persistedQuery")
+        if persisted_query is None:
+            if self.allowlist is not None and query is not None and sha256_hash(query) not in self.allowlist:
+                raise PersistedQueryError("PersistedQueryNotAllowed", "PERSISTED_QUERY_NOT_ALLOWED")
+            return query
+
+        query_hash = persisted_query.get("sha256Hash")
+        if persisted_query.get("version") != 1 or not isinstance(query_hash, str):
+            raise PersistedQueryError("PersistedQueryNotSupported", "PERSISTED_QUERY_NOT_SUPPORTED")
+
+        if query is None:
+            if self.allowlist is not None:
+                query = self.allowlist.get(query_hash)
+            else:
+                query = await caches[self.cache_alias].aget(PERSISTED_QUERY_CACHE_PREFIX + query_hash)
+            if query is None:
+                raise PersistedQueryError("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+            return query
+
+        if sha256_hash(query) != query_hash:
+            raise PersistedQueryError("provided sha does not match query", "INVALID_PERSISTED_QUERY_HASH")
+        if self.allowlist is not None:
+            if query_hash not in self.allowlist:
+                raise PersistedQueryError("PersistedQueryNotAllowed", "PERSISTED_QUERY_NOT_ALLOWED")
+            return query
+
+        await caches[self.cache_alias].aset(PERSISTED_QUERY_CACHE_PREFIX + query_hash, query, self.timeout)
+        return query
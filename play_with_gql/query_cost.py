@@ -0,0 +1,206 @@
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+import strawberry
+from django.conf import settings
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLField,
+    GraphQLNamedType,
+    InlineFragmentNode,
+    IntValueNode,
+    SelectionSetNode,
+    VariableNode,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_abstract_type,
+    is_composite_type,
+    is_list_type,
+)
+from strawberry import relay
+from strawberry.extensions import SchemaExtension
+from strawberry.types import ExecutionResult
+from strawberry_django.utils.typing import get_django_definition
+
+
+@dataclass
+class QueryCost:
+    # 조회할 것으로 예상되는 모델 행 수. 목록·connection 의 페이지 크기를 부모 수에 곱해 누적한다
+    rows: int = 0
+    # 예상 SQL 쿼리 수. DataLoader·배치 connection 은 부모 수와 무관하게 단계마다 한 번으로 본다 (권한 검사 제외)
+    queries: int = 0
+    # 가장 깊은 필드 중첩 단계
+    depth: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {"rows": self.rows, "queries": self.queries, "depth": self.depth}
+
+
+def _is_model_type(graphql_type: GraphQLNamedType) -> bool:
+    definition = graphql_type.extensions.get("strawberry-definition")
+    return definition is not None and get_django_definition(definition.origin) is not None
+
+
+def _is_connection_type(graphql_type: GraphQLNamedType) -> bool:
+    definition = graphql_type.extensions.get("strawberry-definition")
+    return (
+        definition is not None
+        and isinstance(definition.origin, type)
+        and issubclass(definition.origin, relay.Connection)
+    )
+
+
+class _CostEstimator:
+    def __init__(self, schema: strawberry.Schema, document: DocumentNode, variables: dict[str, Any] | None):
+        self.schema = schema._schema
+        self.default_list_size = schema.config.relay_max_results
+        self.variables = variables or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        self.cost = QueryCost()
+
+    def _fields(
+        self, parent_type: GraphQLNamedType, selection_set: SelectionSetNode | None
+    ) -> Iterator[tuple[GraphQLNamedType, FieldNode]]:
+        # 조각(fragment)은 펼쳐서 조건 타입과 함께 필드를 돌려준다. @skip/@include 는 무시해 상한으로 추정한다
+        for selection in selection_set.selections if selection_set else ():
+            if isinstance(selection, FieldNode):
+                yield parent_type, selection
+            elif isinstance(selection, InlineFragmentNode):
+                type_condition = selection.type_condition
+                fragment_type = self.schema.get_type(type_condition.name.value) if type_condition else parent_type
+                yield from self._fields(fragment_type, selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments.get(selection.name.value)
+                if fragment is not None:
+                    fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                    yield from self._fields(fragment_type, fragment.selection_set)
+
+    def _is_model(self, graphql_type: GraphQLNamedType) -> bool:
+        # node(id) 처럼 인터페이스를 돌려주는 필드는 구현 타입 중 모델 타입이 있으면 모델로 본다
+        if is_abstract_type(graphql_type):
+            return any(_is_model_type(possible) for possible in self.schema.get_possible_types(graphql_type))
+        return _is_model_type(graphql_type)
+
+    def _page_size(self, field_def: GraphQLField, node: FieldNode) -> int:
+        requested = None
+        for argument in node.arguments:
+            if argument.name.value not in ("first", "last"):
+                continue
+            if isinstance(argument.value, IntValueNode):
+                requested = int(argument.value.value)
+            elif isinstance(argument.value, VariableNode):
+                requested = self.variables.get(argument.value.name.value)
+            if requested is not None:
+                break
+
+        # 페이지 상한·기본값은 필드(`CappedListField`)나 확장(`KeysetConnectionExtension`)이 `max_results` 로 가진다
+        field = field_def.extensions.get("strawberry-definition")
+        owners = [field, *getattr(field, "extensions", ())] if field is not None else []
+        max_results = next((owner.max_results for owner in owners if getattr(owner, "max_results", None)), None)
+        default_limit = next((owner.default_limit for owner in owners if getattr(owner, "default_limit", None)), None)
+        max_results = max_results or self.default_list_size
+        return min(requested if isinstance(requested, int) else default_limit or max_results, max_results)
+
+    def walk(
+        self, parent_type: GraphQLNamedType, selection_set: SelectionSetNode, parents: int, depth: int, root: bool
+    ) -> None:
+        # parents: 이 선택 집합이 해석되는 부모 객체 수
+        parent_is_model = root or self._is_model(parent_type)
+        for field_parent_type, node in self._fields(parent_type, selection_set):
+            field_def = getattr(field_parent_type, "fields", {}).get(node.name.value)
+            if field_def is None:
+                # __typename, 인트로스펙션
+                continue
+            self.cost.depth = max(self.cost.depth, depth + 1)
+            nullable_type = get_nullable_type(field_def.type)
+            named_type = get_named_type(nullable_type)
+            if not is_composite_type(named_type):
+                continue
+
+            children = parents
+            if _is_connection_type(named_type):
+                page_size = self._page_size(field_def, node)
+                children = parents * page_size
+                self.cost.rows += children
+                self.cost.queries += 1
+                if any(child.name.value == "totalCount" for _, child in self._fields(named_type, node.selection_set)):
+                    self.cost.queries += 1
+            elif is_list_type(nullable_type) and self._is_model(named_type):
+                children = parents * self._page_size(field_def, node)
+                self.cost.rows += children
+                self.cost.queries += 1
+            elif self._is_model(named_type) and parent_is_model:
+                # 최상위 조회나 FK 관계. edges.node 처럼 이미 읽은 행을 감싼 필드는 제외한다
+                self.cost.rows += parents
+                self.cost.queries += 1
+
+            self.walk(named_type, node.selection_set, children, depth + 1, root=False)
+
+
+def estimate_query_cost(
+    schema: strawberry.Schema,
+    document: DocumentNode,
+    operation_name: str | None = None,
+    variables: dict[str, Any] | None = None,
+) -> QueryCost | None:
+    """실행 전에 operation 이 읽을 행 수, 쿼리 수, 깊이를 추정한다. operation 을 고를 수 없으면 None"""
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return None
+    estimator = _CostEstimator(schema, document, variables)
+    root_type = estimator.schema.get_root_type(operation.operation)
+    estimator.walk(root_type, operation.selection_set, parents=1, depth=0, root=True)
+    return estimator.cost
+
+
+def budget_error(cost: QueryCost) -> GraphQLError | None:
+    """추정 비용이 `GRAPHQL_QUERY_MAX_DEPTH` / `GRAPHQL_QUERY_MAX_ROWS` 를 넘으면 그 오류를, 아니면 None"""
+    extensions = {"cost": cost.as_dict()}
+    if cost.depth > settings.GRAPHQL_QUERY_MAX_DEPTH:
+        return GraphQLError(
+            f"Query depth {cost.depth} exceeds the maximum of {settings.GRAPHQL_QUERY_MAX_DEPTH}.",
+            extensions={"code": "QUERY_TOO_DEEP", **extensions},
+        )
+    if cost.rows > settings.GRAPHQL_QUERY_MAX_ROWS:
+        return GraphQLError(
+            f"Query would read an estimated {cost.rows} rows, "
+            f"over the budget of {settings.GRAPHQL_QUERY_MAX_ROWS}. Request smaller pages.",
+            extensions={"code": "QUERY_TOO_EXPENSIVE", **extensions},
+        )
+    return None
+
+
+class QueryCostExtension(SchemaExtension):
+    """실행 전에 정적 비용을 추정해 예산을 넘는 operation 은 실행하지 않고, 추정치를 응답 extensions.cost 에 싣는다
+
+    클래스로 등록해 요청마다 인스턴스가 만들어지게 한다.
+    """
+
+    cost: QueryCost | None = None
+
+    def on_execute(self) -> Iterator[None]:
+        execution_context = self.execution_context
+        if execution_context.graphql_document is not None:
+            self.cost = estimate_query_cost(
+                execution_context.schema,
+                execution_context.graphql_document,
+                execution_context.operation_name,
+                execution_context.variables,
+            )
+        error = self.cost and budget_error(self.cost)
+        if error is not None:
+            execution_context.result = ExecutionResult(data=None, errors=[error])
+        yield
+
+    def get_results(self) -> dict[str, Any]:
+        return {"cost": self.cost.as_dict()} if self.cost is not None else {}
@@ -0,0 +1,124 @@
+import contextlib
+from collections.abc import AsyncIterator, Iterator
+from contextvars import ContextVar
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+
+STICKY_CACHE_PREFIX = "db:primary-sticky:"
+
+# 지금 operation 이 읽기에 쓰는 DB alias. 설정되지 않으면(None) default 에서 읽는다
+_read_alias: ContextVar[str | None] = ContextVar("replica_read_alias", default=None)
+
+
+class ReplicaRouter:
+    """query operation 안의 읽기만 복제본으로 보내는 라우터
+
+    쓰기와 operation 밖(뷰·관리 명령·mutation·subscription)의 읽기는 모두 default(primary)로 간다.
+    """
+
+    def db_for_read(self, model, **hints) -> str | None:
+        instance = hints.get("instance")
+        # 관계를 따라 읽을 때는 부모 행을 읽은 DB 를 그대로 쓴다
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # 복제본은 같은 데이터이므로 어느 DB 에서 읽은 행끼리도 관계를 맺을 수 있다
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, **hints) -> bool:
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextlib.contextmanager
+def primary() -> Iterator[None]:
+    """블록 안의 읽기를 복제본 지연 없이 primary 에서 한다. 권한 검사처럼 최신 값이 필요한 곳에서 쓴다"""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def _sticky_key(context: Any) -> str | None:
+    # 로그인 사용자는 여러 세션(탭·기기)에서 같은 쓰기를 봐야 하므로 사용자 단위로 묶는다
+    user = getattr(context, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"{STICKY_CACHE_PREFIX}user:{user.pk}"
+    session = getattr(getattr(context, "request", None), "session", None)
+    if session is not None and session.session_key:
+        return f"{STICKY_CACHE_PREFIX}session:{session.session_key}"
+    return None
+
+
+class ReplicaExtension(SchemaExtension):
+    """query operation 은 `DATABASE_REPLICA_ALIAS` 에서 읽고, mutation 을 실행한 사용자·세션은 잠시 primary 에 붙인다
+
+    mutation 뒤 `DATABASE_REPLICA_STICKY_SECONDS` 동안은 같은 사용자의 query 도 primary 에서 읽어 복제 지연 중에도
+    자기가 쓴 값을 읽는다 (read-your-writes). 복제본 alias 가 None 이면 꺼진다.
+    sticky 캐시는 이벤트 루프를 막지 않도록 async 로 읽고 쓴다. `execute_sync` 에서는 `ReplicaExtensionSync` 를 쓴다.
+    """
+
+    def _sticky_target(self) -> tuple[str | None, str | None]:
+        """(복제본 alias, sticky 키). 복제본을 쓰지 않는 operation 이면 alias 가 None"""
+        replica = settings.DATABASE_REPLICA_ALIAS
+        if replica is None or self.execution_context.operation_type is OperationType.SUBSCRIPTION:
+            return None, None
+        return replica, _sticky_key(self.execution_context.context)
+
+    async def on_execute(self) -> AsyncIterator[None]:
+        replica, sticky_key = self._sticky_target()
+        if replica is None:
+            yield
+            return
+
+        cache = caches[settings.DATABASE_REPLICA_STICKY_CACHE]
+        if self.execution_context.operation_type is OperationType.MUTATION:
+            yield
+            if sticky_key is not None:
+                await cache.aset(sticky_key, True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+            return
+
+        if sticky_key is not None and await cache.aget(sticky_key):
+            yield
+            return
+        token = _read_alias.set(replica)
+        try:
+            yield
+        finally:
+            _read_alias.reset(token)
+
+
+class ReplicaExtensionSync(ReplicaExtension):
+    """`execute_sync` 용 `ReplicaExtension`. 이벤트 루프 밖이므로 sticky 캐시를 동기로 읽고 쓴다"""
+
+    def on_execute(self) -> Iterator[None]:
+        replica, sticky_key = self._sticky_target()
+        if replica is None:
+            yield
+            return
+
+        cache = caches[settings.DATABASE_REPLICA_STICKY_CACHE]
+        if self.execution_context.operation_type is OperationType.MUTATION:
+            yield
+            if sticky_key is not None:
+                cache.set(sticky_key, True, settings.DATABASE_REPLICA_STICKY_SECONDS)
+            return
+
+        if sticky_key is not None and cache.get(sticky_key):
+            yield
+            return
+        token = _read_alias.set(replica)
+        try:
+            yield
+        finally:
+            _read_alias.reset(token)
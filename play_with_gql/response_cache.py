@@ -0,0 +1,307 @@
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+import strawberry
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, transaction
+from graphql import (
+    DocumentNode,
+    GraphQLNamedType,
+    GraphQLObjectType,
+    GraphQLOutputType,
+    OperationType,
+    TypeInfo,
+    TypeInfoVisitor,
+    Visitor,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_list_type,
+    visit,
+)
+from strawberry import relay
+from strawberry.extensions import SchemaExtension
+from strawberry.types import ExecutionResult
+from strawberry_django.utils.typing import get_django_definition
+
+from play_with_gql.persisted_queries import document_cache, sha256_hash
+
+RESPONSE_CACHE_PREFIX = "graphql:response:"
+TAG_CACHE_PREFIX = "graphql:response-tag:"
+# 필드 metadata 키. 값이 True 인 필드를 고른 문서는 권한 필드처럼 사용자별로 캐시한다
+USER_SCOPED = "response_cache_user_scoped"
+
+# 실행 중인 요청이 읽은 모델·행 태그. 캐시 대상 요청에서만 설정된다
+_recorded_tags: ContextVar[set[str] | None] = ContextVar("response_cache_tags", default=None)
+
+
+def model_tag(model: type[models.Model], pk: Any = None) -> str:
+    label = model._meta.label_lower
+    return label if pk is None else f"{label}:{pk}"
+
+
+def record(model: type[models.Model], pk: Any = None) -> None:
+    """현재 요청의 응답이 `model`(pk 가 없으면 모델 전체)에 의존한다고 기록한다"""
+    tags = _recorded_tags.get()
+    if tags is not None:
+        tags.add(model_tag(model, pk))
+
+
+def _invalidation_tags(model: type[models.Model], pks: Iterable[Any] | None) -> dict[str, float]:
+    # 행이 바뀌면 목록 구성도 바뀔 수 있으므로 모델 태그는 항상 함께 무효화한다
+    now = time.time()
+    tags = {TAG_CACHE_PREFIX + model_tag(model): now}
+    tags.update((TAG_CACHE_PREFIX + model_tag(model, pk), now) for pk in pks or ())
+    return tags
+
+
+def invalidate(model: type[models.Model], pks: Iterable[Any] | None = None) -> None:
+    """`model` 의 행(pks)과 그 모델을 목록으로 읽은 캐시 응답을 무효화한다
+
+    커밋 전 데이터로 다시 채워지지 않도록 트랜잭션 커밋 뒤에 반영한다.
+    """
+    tags = _invalidation_tags(model, pks)
+    transaction.on_commit(
+        lambda: caches[settings.GRAPHQL_RESPONSE_CACHE_BACKEND].set_many(tags, settings.GRAPHQL_RESPONSE_CACHE_TIMEOUT)
+    )
+
+
+async def ainvalidate(model: type[models.Model], pks: Iterable[Any] | None = None) -> None:
+    """autocommit 으로 이미 커밋된 async ORM 쓰기 뒤에 쓰는 `invalidate`"""
+    await caches[settings.GRAPHQL_RESPONSE_CACHE_BACKEND].aset_many(
+        _invalidation_tags(model, pks), settings.GRAPHQL_RESPONSE_CACHE_TIMEOUT
+    )
+
+
+@dataclass(frozen=True)
+class DocumentAnalysis:
+    # 권한 검사나 사용자별 값이 있는 필드를 골라 사용자별로 캐시해야 하는지
+    user_scoped: bool
+    # 목록·connection 으로 읽는 모델. 행이 추가·삭제되면 결과가 바뀐다
+    collection_tags: frozenset[str]
+
+
+def _model_of(graphql_type: GraphQLNamedType) -> type[models.Model] | None:
+    definition = graphql_type.extensions.get("strawberry-definition")
+    django_definition = definition and get_django_definition(definition.origin)
+    return django_definition.model if django_definition else None
+
+
+def _collection_model(graphql_type: GraphQLOutputType) -> type[models.Model] | None:
+    nullable_type = get_nullable_type(graphql_type)
+    named_type = get_named_type(nullable_type)
+    if is_list_type(nullable_type):
+        return _model_of(named_type)
+
+    definition = named_type.extensions.get("strawberry-definition")
+    if (
+        isinstance(named_type, GraphQLObjectType)
+        and definition is not None
+        and isinstance(definition.origin, type)
+        and issubclass(definition.origin, relay.Connection)
+    ):
+        edge_type = get_named_type(named_type.fields["edges"].type)
+        return _model_of(get_named_type(edge_type.fields["node"].type))
+    return None
+
+
+def analyze_document(schema: strawberry.Schema, document: DocumentNode) -> DocumentAnalysis:
+    type_info = TypeInfo(schema._schema)
+    user_scoped = False
+    collection_tags: set[str] = set()
+
+    class FieldVisitor(Visitor):
+        def enter_field(self, *args: Any) -> None:
+            nonlocal user_scoped
+            field_def = type_info.get_field_def()
+            if field_def is None:
+                return
+            field = field_def.extensions.get("strawberry-definition")
+            if field is not None and (field.permission_classes or field.metadata.get(USER_SCOPED)):
+                user_scoped = True
+            if (model := _collection_model(field_def.type)) is not None:
+                collection_tags.add(model_tag(model))
+
+    # 조각(fragment)까지 모두 방문하므로 문서의 여러 operation 중 어느 것을 실행해도 안전한 쪽으로 판단한다
+    visit(document, TypeInfoVisitor(type_info, FieldVisitor()))
+    return DocumentAnalysis(user_scoped=user_scoped, collection_tags=frozenset(collection_tags))
+
+
+class LRUCache:
+    """만료 시각을 함께 두는 프로세스 내 LRU"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: OrderedDict[str, tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, timeout: float | None = None) -> None:
+        with self._lock:
+            self._items[key] = (None if timeout is None else time.monotonic() + timeout, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    # 실행을 시작한 시각. 이후에 무효화된 태그가 하나라도 있으면 버린다
+    started_at: float
+    tags: frozenset[str]
+    data: dict[str, Any]
+
+
+class ResponseCache:
+    """읽기 전용 operation 의 응답 캐시
+
+    프로세스 내 LRU 를 먼저 보고 없으면 Django 캐시 백엔드를 본다. 무효화는 태그별 마지막 무효화 시각을
+    백엔드에 남기는 방식이라 여러 프로세스가 같은 백엔드를 쓰면 서로의 무효화가 반영된다.
+    """
+
+    def __init__(self, cache_alias: str = "default", timeout: int = 60, maxsize: int = 1024, replica_lag: float = 0):
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        # 무효화 뒤 이 시간(초) 안에 시작한 응답은 복제 지연으로 이전 값을 읽었을 수 있으므로 쓰지 않는다
+        self.replica_lag = replica_lag
+        self.responses = LRUCache(maxsize)
+        self.analyses = LRUCache(maxsize)
+
+    @classmethod
+    def from_settings(cls) -> "ResponseCache":
+        return cls(
+            cache_alias=settings.GRAPHQL_RESPONSE_CACHE_BACKEND,
+            timeout=settings.GRAPHQL_RESPONSE_CACHE_TIMEOUT,
+            maxsize=settings.GRAPHQL_RESPONSE_CACHE_SIZE,
+            replica_lag=settings.DATABASE_REPLICA_STICKY_SECONDS if settings.DATABASE_REPLICA_ALIAS else 0,
+        )
+
+    def analyze(self, schema: strawberry.Schema, query_hash: str, document: DocumentNode) -> DocumentAnalysis:
+        analysis = self.analyses.get(query_hash)
+        if analysis is None:
+            analysis = analyze_document(schema, document)
+            self.analyses.set(query_hash, analysis)
+        return analysis
+
+    async def aget(self, key: str) -> dict[str, Any] | None:
+        backend = caches[self.cache_alias]
+        response: CachedResponse | None = self.responses.get(key)
+        if response is None:
+            response = await backend.aget(RESPONSE_CACHE_PREFIX + key)
+            if response is None:
+                return None
+            self.responses.set(key, response, self.timeout)
+
+        invalidated_at = await backend.aget_many([TAG_CACHE_PREFIX + tag for tag in response.tags])
+        if any(timestamp >= response.started_at - self.replica_lag for timestamp in invalidated_at.values()):
+            self.responses.discard(key)
+            return None
+        return response.data
+
+    async def aset(self, key: str, response: CachedResponse) -> None:
+        self.responses.set(key, response, self.timeout)
+        await caches[self.cache_alias].aset(RESPONSE_CACHE_PREFIX + key, response, self.timeout)
+
+
+def _cache_key(query_hash: str, operation_name: str | None, variables: dict[str, Any] | None, scope: str) -> str:
+    payload = json.dumps([query_hash, operation_name, variables or {}, scope], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCacheSchema(strawberry.Schema):
+    """`response_cache` 가 설정되면 async 실행의 query operation 응답을 캐시하는 스키마
+
+    파싱·검증을 통과해 `document_cache` 에 있는 문서만 대상으로 하므로, 처음 보는 문서는 한 번 실행된 뒤부터 캐시된다.
+    사용자별로 달라지는 필드를 고른 문서는 사용자 id 를 키에 넣는다.
+    """
+
+    response_cache: ResponseCache | None = None
+
+    async def execute(
+        self,
+        query: str | None,
+        variable_values: dict[str, Any] | None = None,
+        context_value: Any | None = None,
+        root_value: Any | None = None,
+        operation_name: str | None = None,
+        allowed_operation_types: Iterable[OperationType] | None = None,
+    ) -> ExecutionResult:
+        execute = functools.partial(
+            super().execute,
+            query,
+            variable_values=variable_values,
+            context_value=context_value,
+            root_value=root_value,
+            operation_name=operation_name,
+            allowed_operation_types=allowed_operation_types,
+        )
+        response_cache = self.response_cache
+        if response_cache is None or query is None:
+            return await execute()
+
+        query_hash = sha256_hash(query)
+        document = document_cache.get(query_hash)
+        operation = document and get_operation_ast(document, operation_name)
+        if operation is None or operation.operation is not OperationType.QUERY:
+            return await execute()
+
+        analysis = response_cache.analyze(self, query_hash, document)
+        user = getattr(context_value, "user", None)
+        user_id = user.pk if analysis.user_scoped and user is not None and user.is_authenticated else None
+        scope = "public" if not analysis.user_scoped else f"user:{user_id}" if user_id else "anonymous"
+        key = _cache_key(query_hash, operation_name, variable_values, scope)
+
+        data = await response_cache.aget(key)
+        if data is not None:
+            return ExecutionResult(data=data, errors=None)
+
+        started_at = time.time()
+        tags = set(analysis.collection_tags)
+        if user_id is not None:
+            tags.add(model_tag(type(user), user_id))
+        token = _recorded_tags.set(tags)
+        try:
+            result = await execute()
+        finally:
+            _recorded_tags.reset(token)
+
+        if not result.errors and result.data is not None:
+            await response_cache.aset(key, CachedResponse(started_at, frozenset(tags), result.data))
+        return result
+
+
+class ResponseCacheExtension(SchemaExtension):
+    """캐시 대상 요청에서 필드를 해석한 모델 행을 응답의 태그로 기록한다"""
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        if isinstance(root, models.Model) and _recorded_tags.get() is not None:
+            record(type(root), root.pk)
+        return _next(root, info, *args, **kwargs)
@@ -1,7 +1,18 @@
 import strawberry
+from django.conf import settings
+from strawberry.extensions import SchemaExtension
+from strawberry_django.optimizer import DjangoOptimizerExtension
 
 from play_with_gql.api.libraries.mutations import DeleteBookMutation, UpdateBookMutation
 from play_with_gql.api.libraries.queries import GetBooksQuery, GetLibraryQuery, GetNodeQuery
+from play_with_gql.api.libraries.subscriptions import LibrarySubscription
+from play_with_gql.incremental import StreamInitialCountExtension, add_incremental_directives
+from play_with_gql.n_plus_one import NPlusOneExtension
+from play_with_gql.persisted_queries import DocumentCacheExtension
+from play_with_gql.query_cost import QueryCostExtension
+from play_with_gql.replicas import ReplicaExtension, ReplicaExtensionSync
+from play_with_gql.response_cache import ResponseCache, ResponseCacheExtension, ResponseCacheSchema
+from play_with_gql.tracing import TracingExtension
 
 
 @strawberry.type
@@ -14,4 +25,38 @@ class Mutation(UpdateBookMutation, DeleteBookMutation):
     pass
 
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
+@strawberry.type
+class Subscription(LibrarySubscription):
+    pass
+
+
+class Schema(ResponseCacheSchema):
+    def get_extensions(self, sync: bool = False) -> list[SchemaExtension]:
+        extensions = super().get_extensions(sync)
+        if not sync:
+            return extensions
+        # execute_sync 는 async 훅을 돌리지 못하므로 동기 버전으로 바꾼다
+        return [
+            ReplicaExtensionSync(execution_context=None) if type(extension) is ReplicaExtension else extension
+            for extension in extensions
+        ]
+
+
+schema = Schema(
+    query=Query,
+    mutation=Mutation,
+    subscription=Subscription,
+    extensions=[
+        TracingExtension,
+        NPlusOneExtension,
+        DocumentCacheExtension,
+        ResponseCacheExtension,
+        QueryCostExtension,
+        ReplicaExtension,
+        StreamInitialCountExtension,
+        DjangoOptimizerExtension(),
+    ],
+)
+add_incremental_directives(schema)
+if settings.GRAPHQL_RESPONSE_CACHE_ENABLED:
+    schema.response_cache = ResponseCache.from_settings()
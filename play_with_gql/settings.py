@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,12 +32,15 @@ ALLOWED_HOSTS = ["*"]
 # Application definition
 
 INSTALLED_APPS = [
+    # runserver 를 ASGI(웹소켓 포함)로 띄운다
+    "daphne",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "django_extensions",
     "play_with_gql.libraries",
     "play_with_gql.users",
@@ -71,11 +75,31 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "play_with_gql.wsgi.application"
+ASGI_APPLICATION = "play_with_gql.asgi.application"
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# 엔트리포인트(asgi.py / wsgi.py)가 settings 를 읽기 전에 정하는 실행 프로필. 커넥션 풀 크기가 달라진다
+SERVER_PROFILE = os.environ.get("PLAY_WITH_GQL_SERVER_PROFILE", "wsgi")
+# 프로세스 하나에서 동시에 DB 를 쓰는 수. WSGI 는 워커 스레드 수, ASGI 는 동시에 처리하는 요청 수
+DB_CONCURRENCY = int(os.environ.get("DB_CONCURRENCY", 20 if SERVER_PROFILE == "asgi" else 4))
+
+# psycopg3 커넥션 풀 (psycopg_pool.ConnectionPool 인자). 요청마다 연결을 새로 맺지 않고 풀에서 빌려 쓴다
+DB_POOL_PROFILES = {
+    # 요청마다 스레드가 바뀌므로 평소 동시 요청 몫만 열어 두고, 몰리면 max_size 까지 늘린 뒤 대기열에 세운다
+    "asgi": {"min_size": max(DB_CONCURRENCY // 4, 1), "max_size": DB_CONCURRENCY, "timeout": 10},
+    # 워커 스레드마다 커넥션 하나를 쓰므로 처음부터 스레드 수만큼 열어 둔다
+    "wsgi": {"min_size": DB_CONCURRENCY, "max_size": DB_CONCURRENCY, "timeout": 5},
+}
+DB_POOL_OPTIONS = {
+    **DB_POOL_PROFILES[SERVER_PROFILE],
+    # 쉬는 커넥션은 10분, 모든 커넥션은 1시간 뒤에 새로 맺는다
+    "max_idle": 10 * 60,
+    "max_lifetime": 60 * 60,
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -84,9 +108,34 @@ DATABASES = {
         "USER": "postgres",
         "PASSWORD": "password",
         "NAME": "play_with_gql",
+        # 풀을 쓰면 지속 커넥션(CONN_MAX_AGE)은 꺼야 한다. 요청이 끝나면 커넥션을 풀에 돌려준다
+        "CONN_MAX_AGE": 0,
+        # 풀에서 꺼낼 때 끊긴 커넥션인지 확인한다
+        "CONN_HEALTH_CHECKS": True,
+        # pgbouncer 처럼 앞단에 풀러가 있으면 DB_POOL=0 으로 끈다
+        "OPTIONS": {"pool": DB_POOL_OPTIONS} if os.environ.get("DB_POOL", "1") != "0" else {},
     }
 }
+# 읽기 전용 복제본. 로컬에서는 같은 서버의 같은 DB 를 가리키는 두 번째 alias 로 쓴다
+DATABASES["replica"] = {
+    **DATABASES["default"],
+    "HOST": os.environ.get("DB_REPLICA_HOST", "localhost"),
+    "PORT": int(os.environ.get("DB_REPLICA_PORT", 45432)),
+    "OPTIONS": {**DATABASES["default"]["OPTIONS"]},
+    # 테스트에서는 default 의 테스트 DB 를 그대로 본다
+    "TEST": {"MIRROR": "default"},
+}
+DATABASE_ROUTERS = ["play_with_gql.replicas.ReplicaRouter"]
+# query operation 이 읽는 alias. None 이면 모든 읽기를 default(primary)에서 한다
+DATABASE_REPLICA_ALIAS: str | None = "replica"
+# mutation 을 실행한 사용자·세션의 query 를 이 시간(초) 동안 primary 에서 읽는다 (복제 지연보다 길게)
+DATABASE_REPLICA_STICKY_SECONDS = 5
+DATABASE_REPLICA_STICKY_CACHE = "default"
 AUTH_USER_MODEL = "users.User"
+# 세션을 캐시에서 먼저 읽어 인증된 요청의 DB 조회를 사용자 1회로 줄인다
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+# GraphQL 컨텍스트의 세션 키 → 사용자 캐시 TTL(초)
+AUTH_SESSION_USER_CACHE_TTL = 10
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -127,3 +176,47 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# GraphQL persisted queries (APQ) 와 파싱·검증된 문서 캐시
+GRAPHQL_DOCUMENT_CACHE_SIZE = 512
+GRAPHQL_PERSISTED_QUERIES_CACHE = "default"
+GRAPHQL_PERSISTED_QUERIES_TIMEOUT = 60 * 60 * 24 * 7
+# {sha256: query} JSON 파일 경로. 지정하면 목록에 있는 문서만 실행하는 allowlist 전용 모드가 된다
+GRAPHQL_PERSISTED_QUERIES_ALLOWLIST: Path | None = None
+
+# 읽기 전용 query 응답 캐시 (opt-in). 프로세스 내 LRU 뒤에 Django 캐시 백엔드를 두고, 무효화 시각도 백엔드에 남긴다
+GRAPHQL_RESPONSE_CACHE_ENABLED = False
+GRAPHQL_RESPONSE_CACHE_BACKEND = "default"
+GRAPHQL_RESPONSE_CACHE_TIMEOUT = 60
+GRAPHQL_RESPONSE_CACHE_SIZE = 1024
+
+# 실행 전 정적 비용 분석. 예상 조회 행 수나 필드 중첩 깊이가 넘는 operation 은 실행하지 않는다
+GRAPHQL_QUERY_MAX_ROWS = 10_000
+GRAPHQL_QUERY_MAX_DEPTH = 15
+
+# resolver·SQL 추적. 샘플링된 operation 의 스팬을 OTLP/JSON 줄 단위로 파일에 내보낸다
+GRAPHQL_TRACING_SAMPLE_RATE = 0.0
+GRAPHQL_TRACING_EXPORT_PATH: Path | None = None
+# 디버그용. 모든 operation 을 추적하고 스팬을 응답 extensions.tracing 에 싣는다
+GRAPHQL_TRACING_IN_RESPONSE = False
+
+# N+1 감지. 한 operation 에서 같은 모양의 SQL 이 이 횟수를 넘게 실행되면 경고 로그를 남긴다 (None 이면 끔)
+GRAPHQL_N_PLUS_ONE_THRESHOLD: int | None = 10
+# 경고 대신 operation 을 실패시킨다. 테스트에서 켠다
+GRAPHQL_N_PLUS_ONE_RAISE = False
+
+# 응답 JSON 인코더. StdlibEncoder 는 표준 json 모듈을 쓴다
+GRAPHQL_RESPONSE_ENCODER = "play_with_gql.encoders.OrjsonEncoder"
+# 이 개수보다 긴 리스트가 있는 응답은 리스트를 이만큼씩 인코딩하며 스트리밍한다 (None 이면 끔)
+GRAPHQL_RESPONSE_STREAM_ITEMS: int | None = None
+
+# 배열로 묶어 보낸 operation 들은 한 컨텍스트로 동시에 실행한다. 한 요청에 받는 최대 operation 수
+GRAPHQL_BATCH_MAX_OPERATIONS = 20
+
+# @defer / @stream 으로 나눈 부분은 부분마다 조상 필드(권한 검사 포함)를 다시 해석하므로 한 요청의 부분 수를 제한한다
+GRAPHQL_INCREMENTAL_MAX_PARTS = 10
+
+# subscription 이벤트 전달. LocalBackend 는 같은 프로세스에만, PostgresBackend 는 LISTEN/NOTIFY 로 모든 워커에 보낸다
+GRAPHQL_SUBSCRIPTION_BACKEND = "play_with_gql.subscriptions.LocalBackend"
+# 구독자별로 쌓아 두는 최대 이벤트 수. 넘으면 가장 오래된 이벤트를 버린다
+GRAPHQL_SUBSCRIPTION_QUEUE_SIZE = 100
@@ -0,0 +1,219 @@
+import asyncio
+import functools
+import json
+import logging
+import threading
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payload 한도(8000 바이트) 아래로 메시지를 묶는다
+NOTIFY_PAYLOAD_BYTES = 7_500
+
+Message = tuple[str, dict[str, Any]]
+
+
+class Event:
+    """구독자들에게 함께 전달되는 이벤트 하나
+
+    같은 이벤트 루프의 구독자들은 같은 인스턴스를 받으므로, `shared` 로 읽은 행을 구독자마다 다시 조회하지 않는다.
+    """
+
+    def __init__(self, topic: str, payload: dict[str, Any]):
+        self.topic = topic
+        self.payload = payload
+        self._shared: dict[str, asyncio.Future] = {}
+
+    def shared(self, key: str, load: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        if key not in self._shared:
+            self._shared[key] = asyncio.ensure_future(load())
+        return self._shared[key]
+
+
+class Subscriber:
+    """토픽 하나를 구독하는 연결. 대기 중인 이벤트는 크기가 제한된 큐에 쌓인다
+
+    느린 구독자가 발행자나 다른 구독자를 막지 않도록, 큐가 차면 가장 오래된 이벤트를 버리고 `dropped` 를 센다.
+    """
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def deliver(self, event: Event) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class Hub:
+    """프로세스 내 토픽별 구독자 집합으로 이벤트를 나눠 주는 fan-out 허브
+
+    구독자는 큐를 기다릴 뿐 폴링하지 않으므로 쉬고 있는 구독자는 메모리만 쓴다. `publish` 는 어느 스레드에서나
+    부를 수 있고, 이벤트 루프마다 한 번 `call_soon_threadsafe` 로 넘겨 그 루프의 구독자들에게 한꺼번에 전달한다.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._topics: dict[str, dict[asyncio.AbstractEventLoop, set[Subscriber]]] = {}
+        self._lock = threading.Lock()
+
+    def subscriber_count(self, topic: str | None = None) -> int:
+        with self._lock:
+            loops = [self._topics.get(topic, {})] if topic is not None else list(self._topics.values())
+            return sum(len(subscribers) for by_loop in loops for subscribers in by_loop.values())
+
+    async def subscribe(self, topic: str) -> AsyncIterator[Event]:
+        loop = asyncio.get_running_loop()
+        subscriber = Subscriber(self.queue_size)
+        with self._lock:
+            self._topics.setdefault(topic, {}).setdefault(loop, set()).add(subscriber)
+        try:
+            while True:
+                yield await subscriber.queue.get()
+        finally:
+            with self._lock:
+                by_loop = self._topics.get(topic, {})
+                by_loop.get(loop, set()).discard(subscriber)
+                if not by_loop.get(loop, True):
+                    del by_loop[loop]
+                if not by_loop:
+                    self._topics.pop(topic, None)
+
+    def publish(self, messages: Iterable[Message]) -> None:
+        by_loop: dict[asyncio.AbstractEventLoop, list[tuple[str, dict[str, Any], tuple[Subscriber, ...]]]] = {}
+        with self._lock:
+            for topic, payload in messages:
+                for loop, subscribers in self._topics.get(topic, {}).items():
+                    by_loop.setdefault(loop, []).append((topic, payload, tuple(subscribers)))
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        for loop, deliveries in by_loop.items():
+            if loop is running_loop:
+                self._deliver(deliveries)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(self._deliver, deliveries)
+
+    @staticmethod
+    def _deliver(deliveries: list[tuple[str, dict[str, Any], tuple[Subscriber, ...]]]) -> None:
+        for topic, payload, subscribers in deliveries:
+            event = Event(topic, payload)
+            for subscriber in subscribers:
+                subscriber.deliver(event)
+
+
+class LocalBackend:
+    """같은 프로세스의 구독자에게만 보낸다. 개발·테스트나 워커가 하나일 때 쓴다"""
+
+    def __init__(self, hub: Hub):
+        self.hub = hub
+
+    def start(self) -> None:
+        pass
+
+    def publish(self, messages: list[Message]) -> None:
+        self.hub.publish(messages)
+
+    async def apublish(self, messages: list[Message]) -> None:
+        self.hub.publish(messages)
+
+
+class PostgresBackend:
+    """PostgreSQL LISTEN/NOTIFY 로 모든 워커의 허브에 보낸다
+
+    워커마다 LISTEN 전용 커넥션 하나를 스레드에서 기다리고, 받은 메시지를 로컬 허브로 넘긴다. NOTIFY 는 발행한
+    트랜잭션이 커밋될 때 전달된다.
+    """
+
+    def __init__(self, hub: Hub, channel: str = "graphql_subscriptions", using: str = DEFAULT_DB_ALIAS):
+        self.hub = hub
+        self.channel = channel
+        self.using = using
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        ready = threading.Event()
+        threading.Thread(target=self._listen, args=(ready,), daemon=True, name="graphql-subscriptions").start()
+        # 시작 직후에 발행된 메시지를 놓치지 않도록 LISTEN 이 걸릴 때까지 기다린다
+        ready.wait(timeout=5)
+
+    def _listen(self, ready: threading.Event) -> None:
+        database = connections[self.using]
+        while True:
+            try:
+                # 계속 열려 있는 LISTEN 이 풀 슬롯을 차지하지 않도록 풀 밖에서 따로 맺는다
+                with database.Database.connect(**database.get_connection_params(), autocommit=True) as listener:
+                    listener.execute(f"LISTEN {database.ops.quote_name(self.channel)}")
+                    ready.set()
+                    for notify in listener.notifies():
+                        self.hub.publish([(topic, payload) for topic, payload in json.loads(notify.payload)])
+            except Exception:
+                logger.exception("Subscription listener failed; reconnecting")
+                ready.set()
+                threading.Event().wait(1)
+
+    def _payloads(self, messages: list[Message]) -> list[str]:
+        payloads, batch, size = [], [], 2
+        for message in messages:
+            encoded = json.dumps(message, separators=(",", ":"))
+            if batch and size + len(encoded) + 1 > NOTIFY_PAYLOAD_BYTES:
+                payloads.append("[" + ",".join(batch) + "]")
+                batch, size = [], 2
+            batch.append(encoded)
+            size += len(encoded) + 1
+        if batch:
+            payloads.append("[" + ",".join(batch) + "]")
+        return payloads
+
+    def publish(self, messages: list[Message]) -> None:
+        payloads = self._payloads(messages)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload", [self.channel, payloads]
+            )
+
+    async def apublish(self, messages: list[Message]) -> None:
+        await sync_to_async(self.publish)(messages)
+
+
+hub = Hub(settings.GRAPHQL_SUBSCRIPTION_QUEUE_SIZE)
+
+
+@functools.cache
+def get_backend() -> LocalBackend | PostgresBackend:
+    return import_string(settings.GRAPHQL_SUBSCRIPTION_BACKEND)(hub)
+
+
+async def subscribe(topic: str) -> AsyncIterator[Event]:
+    get_backend().start()
+    async for event in hub.subscribe(topic):
+        yield event
+
+
+def publish(messages: Iterable[Message]) -> None:
+    """트랜잭션이 커밋되면 메시지들을 구독자에게 보낸다. 롤백되면 보내지 않는다"""
+    messages = list(messages)
+    if messages:
+        transaction.on_commit(lambda: get_backend().publish(messages))
+
+
+async def apublish(messages: Iterable[Message]) -> None:
+    """autocommit 으로 이미 커밋된 async ORM 쓰기 뒤에 쓰는 `publish`"""
+    messages = list(messages)
+    if messages:
+        await get_backend().apublish(messages)
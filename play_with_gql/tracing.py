@@ -0,0 +1,289 @@
+import inspect
+import json
+import random
+import secrets
+import threading
+import time
+from collections.abc import Awaitable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from graphql import GraphQLResolveInfo
+from strawberry.extensions import SchemaExtension
+
+# 지금 실행 중인 스팬. SQL 과 하위 스팬이 이 스팬을 부모로 삼는다 (sync_to_async 스레드에도 전파된다)
+_current_span: ContextVar["Span | None"] = ContextVar("tracing_current_span", default=None)
+
+
+@dataclass
+class Span:
+    trace: "Trace"
+    name: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1_000_000
+
+    def to_otlp(self) -> dict[str, Any]:
+        """OpenTelemetry OTLP/JSON 의 span 형식"""
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+        }
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Trace:
+    """한 operation 의 스팬 모음"""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: list[Span] = []
+
+    def start_span(self, name: str, parent: Span | None = None, **attributes: Any) -> Span:
+        span = Span(
+            trace=self,
+            name=name,
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes=attributes,
+        )
+        # sync_to_async 스레드에서도 추가되지만 list.append 는 원자적이다
+        self.spans.append(span)
+        return span
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """추적 중인 요청이면 현재 스팬 아래에 `name` 스팬을 연다. 추적하지 않는 요청에서는 아무것도 하지 않는다"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = parent.trace.start_span(name, parent, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def trace_sql(execute, sql, params, many, context):
+    """`connection.execute_wrapper` 훅. 추적 중인 요청의 SQL 을 그 SQL 을 실행한 resolver 스팬 아래에 기록한다"""
+    parent = _current_span.get()
+    if parent is None:
+        return execute(sql, params, many, context)
+
+    sql_span = parent.trace.start_span(
+        "sql",
+        parent,
+        **{"db.system": context["connection"].vendor, "db.statement": sql, "graphql.resolver": parent.name},
+    )
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sql_span.end()
+
+
+def install_sql_tracing(connection, **kwargs) -> None:
+    if trace_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(trace_sql)
+
+
+# 커넥션은 스레드마다 따로 만들어지므로 생성 시점에 훅을 건다. 이미 열린 현재 스레드의 커넥션에도 건다
+connection_created.connect(install_sql_tracing)
+for _connection in connections.all(initialized_only=True):
+    install_sql_tracing(_connection)
+
+
+class FileSpanExporter:
+    """스팬을 OTLP/JSON 한 줄씩 파일에 덧붙인다. 수집기(collector) 대신 로컬 파일로 내보낼 때 쓴다"""
+
+    # 요청마다 만들어지므로 같은 파일에 쓰는 인스턴스끼리 잠금을 공유한다
+    _lock = threading.Lock()
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def export(self, spans: list[Span]) -> None:
+        lines = "".join(json.dumps(span.to_otlp()) + "\n" for span in spans)
+        with self._lock, self.path.open("a") as file:
+            file.write(lines)
+
+
+_traced_fields: dict[tuple[str, str], bool] = {}
+
+
+def is_traced_field(info: GraphQLResolveInfo) -> bool:
+    """resolver·필드 확장·권한 검사가 있거나 모델 관계를 읽는 필드와 최상위 필드만 추적한다
+
+    단순 속성 필드는 스팬을 만들지 않는다.
+    """
+    key = (info.parent_type.name, info.field_name)
+    traced = _traced_fields.get(key)
+    if traced is None:
+        field_def = info.parent_type.fields.get(info.field_name)
+        if field_def is None:
+            # __typename, 인트로스펙션
+            return False
+        strawberry_field = field_def.extensions.get("strawberry-definition")
+        schema = info.schema
+        traced = (
+            info.parent_type in (schema.query_type, schema.mutation_type, schema.subscription_type)
+            or strawberry_field is None
+            or bool(
+                strawberry_field.base_resolver or strawberry_field.extensions or strawberry_field.permission_classes
+            )
+            or getattr(strawberry_field, "is_relation", False)
+        )
+        _traced_fields[key] = traced
+    return traced
+
+
+class TracingExtension(SchemaExtension):
+    """operation 의 parse/validate/execute, resolver, SQL 시간을 스팬으로 기록하는 확장
+
+    `GRAPHQL_TRACING_SAMPLE_RATE` 비율의 operation 만 추적해 `GRAPHQL_TRACING_EXPORT_PATH` 로 내보낸다.
+    `GRAPHQL_TRACING_IN_RESPONSE`(디버그용)면 모든 operation 을 추적하고 스팬을 응답 extensions.tracing 에 싣는다.
+    클래스로 등록해 요청마다 인스턴스가 만들어지게 한다.
+    """
+
+    trace: Trace | None = None
+
+    def on_operation(self) -> Iterator[None]:
+        in_response = settings.GRAPHQL_TRACING_IN_RESPONSE
+        if not in_response and random.random() >= settings.GRAPHQL_TRACING_SAMPLE_RATE:
+            self.trace = None
+            yield
+            return
+
+        self.trace = Trace()
+        self.root = self.trace.start_span("graphql.operation")
+        token = _current_span.set(self.root)
+        try:
+            yield
+        finally:
+            _current_span.reset(token)
+            # 이름을 넘기지 않은 operation 은 파싱한 뒤에야 이름을 알 수 있다
+            operation_name = self.execution_context.operation_name
+            self.root.name = f"graphql.operation {operation_name or 'anonymous'}"
+            self.root.attributes["graphql.operation.name"] = operation_name or ""
+            operation_type = self._operation_type()
+            if operation_type:
+                self.root.attributes["graphql.operation.type"] = operation_type
+            self.root.end()
+            if settings.GRAPHQL_TRACING_EXPORT_PATH is not None:
+                FileSpanExporter(settings.GRAPHQL_TRACING_EXPORT_PATH).export(self.trace.spans)
+
+    def _operation_type(self) -> str | None:
+        try:
+            return self.execution_context.operation_type.value
+        except RuntimeError:
+            # 파싱에 실패해 operation 을 알 수 없는 경우
+            return None
+
+    def _phase(self, name: str) -> Iterator[None]:
+        if self.trace is None:
+            yield
+            return
+        with span(name):
+            yield
+
+    def on_parse(self) -> Iterator[None]:
+        yield from self._phase("graphql.parse")
+
+    def on_validate(self) -> Iterator[None]:
+        yield from self._phase("graphql.validate")
+
+    def on_execute(self) -> Iterator[None]:
+        yield from self._phase("graphql.execute")
+
+    def resolve(self, _next, root, info: GraphQLResolveInfo, *args, **kwargs):
+        # 스키마가 resolve 훅을 첫 요청의 확장 인스턴스로 캐시하므로 요청 상태는 self 가 아닌 컨텍스트 변수에서 읽는다
+        parent = _current_span.get()
+        if parent is None or not is_traced_field(info):
+            return _next(root, info, *args, **kwargs)
+
+        resolver_span = parent.trace.start_span(
+            f"{info.parent_type.name}.{info.field_name}",
+            parent,
+            **{"graphql.field.path": ".".join(str(key) for key in info.path.as_list())},
+        )
+        token = _current_span.set(resolver_span)
+        try:
+            result = _next(root, info, *args, **kwargs)
+        except Exception:
+            resolver_span.attributes["error"] = True
+            resolver_span.end()
+            raise
+        finally:
+            _current_span.reset(token)
+
+        if inspect.isawaitable(result):
+            return self._await_in_span(result, resolver_span)
+        resolver_span.end()
+        return result
+
+    @staticmethod
+    async def _await_in_span(result: Awaitable, resolver_span: Span) -> Any:
+        # async resolver 는 await 하는 시점에 실행되므로 그동안 스팬을 현재 스팬으로 둔다
+        token = _current_span.set(resolver_span)
+        try:
+            return await result
+        except Exception:
+            resolver_span.attributes["error"] = True
+            raise
+        finally:
+            _current_span.reset(token)
+            resolver_span.end()
+
+    def get_results(self) -> dict[str, Any]:
+        if self.trace is None or not settings.GRAPHQL_TRACING_IN_RESPONSE:
+            return {}
+        spans_by_id = {span.span_id: span for span in self.trace.spans}
+        return {
+            "tracing": {
+                "traceId": self.trace.trace_id,
+                "spans": [
+                    {
+                        "name": span.name,
+                        "parent": spans_by_id[span.parent_id].name if span.parent_id in spans_by_id else None,
+                        "durationMs": round(span.duration_ms, 3),
+                        "attributes": span.attributes,
+                    }
+                    for span in self.trace.spans
+                ],
+            }
+        }
@@ -19,10 +19,12 @@ from django.contrib import admin
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
 
+from .api.libraries.exports import export_books
 from .schema import schema
 from .views import AsyncGraphQLView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("graphql/", csrf_exempt(AsyncGraphQLView.as_view(schema=schema))),
+    path("export/books/", export_books),
 ]
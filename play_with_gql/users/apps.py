@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "play_with_gql.users"
+
+    def ready(self):
+        from play_with_gql.users import auth  # noqa: F401
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, aget_user, load_backend
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.http import HttpRequest
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject, empty
+
+from play_with_gql import response_cache
+from play_with_gql.users.models import User
+
+
+class SessionUserCache:
+    """세션 키 → 사용자 매핑을 짧은 TTL 동안 보관하는 프로세스 내 캐시
+
+    로그아웃과 사용자 변경(비밀번호 등) 시 비워지므로,
+    TTL 은 다른 프로세스에서 일어난 변경이 반영되기까지의 지연 상한이다.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._users: OrderedDict[str, tuple[float, User]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_key: str) -> User | None:
+        with self._lock:
+            entry = self._users.get(session_key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._users[session_key]
+                return None
+            return user
+
+    def set(self, session_key: str, user: User) -> None:
+        with self._lock:
+            self._users[session_key] = (time.monotonic() + self.ttl, user)
+            self._users.move_to_end(session_key)
+            while len(self._users) > self.maxsize:
+                self._users.popitem(last=False)
+
+    def discard(self, session_key: str | None) -> None:
+        with self._lock:
+            self._users.pop(session_key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+
+
+session_user_cache = SessionUserCache(ttl=settings.AUTH_SESSION_USER_CACHE_TTL, maxsize=10_000)
+
+
+@receiver(user_logged_out)
+def discard_logged_out_session(sender, request: HttpRequest | None, **kwargs) -> None:
+    if request is not None:
+        session_user_cache.discard(request.session.session_key)
+
+
+@receiver(post_save, sender=User)
+def clear_session_user_cache(sender, instance: User, **kwargs) -> None:
+    # 비밀번호·활성 상태 변경이 캐시된 세션에 남지 않도록 전부 비운다 (사용자 저장은 드물다)
+    session_user_cache.clear()
+    response_cache.invalidate(User, [instance.pk])
+
+
+async def aget_request_user(request: HttpRequest) -> User | AnonymousUser:
+    """요청의 사용자를 돌려준다
+
+    AuthenticationMiddleware 가 이미 해석한 사용자를 먼저 쓰고, 없으면 세션 키 캐시를, 그래도 없으면
+    세션과 사용자를 async ORM 으로 읽는다. 캐시 적중 시 쿼리 0회, cached_db 세션이면 사용자 조회 1회다.
+    """
+    user = getattr(request, "user", None)
+    if isinstance(user, SimpleLazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    if user is not None:
+        return user
+
+    session_key = request.session.session_key
+    if session_key is None:
+        return AnonymousUser()
+
+    user = session_user_cache.get(session_key)
+    if user is None:
+        user = await _aget_session_user(request)
+        if user is None:
+            return AnonymousUser()
+        session_user_cache.set(session_key, user)
+    return user
+
+
+async def _aget_session_user(request: HttpRequest) -> User | None:
+    """`django.contrib.auth.get_user` 와 같은 검증을 async ORM 으로 수행한다 (세션 해시 불일치면 None)"""
+    session = request.session
+    user_id = await session.aget(SESSION_KEY)
+    backend_path = await session.aget(BACKEND_SESSION_KEY)
+    if user_id is None or backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return None
+
+    backend = load_backend(backend_path)
+    try:
+        user = await User._default_manager.aget(pk=User._meta.pk.to_python(user_id))
+    except User.DoesNotExist:
+        return None
+    if hasattr(backend, "user_can_authenticate") and not backend.user_can_authenticate(user):
+        return None
+
+    session_hash = await session.aget(HASH_SESSION_KEY)
+    if session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+        return user
+    if session_hash and settings.SECRET_KEY_FALLBACKS:
+        # 이전 SECRET_KEY 로 서명된 세션은 키 교체까지 처리하는 Django 기본 경로로 넘긴다
+        user = await aget_user(request)
+        return user if user.is_authenticated else None
+    return None
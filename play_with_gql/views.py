@@ -1,44 +1,241 @@
+import asyncio
+import json
 import traceback
+from collections.abc import AsyncIterator
 from typing import Any, List, Union
 
-from asgiref.sync import sync_to_async
-from django.contrib.auth.models import AnonymousUser
-from django.contrib.sessions.backends.db import SessionStore
-from django.http import HttpRequest, HttpResponse
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from graphql import GraphQLError
 from strawberry.django.views import AsyncGraphQLView as BaseAsyncGraphQLView
-from strawberry.http import GraphQLHTTPResponse
+from strawberry.exceptions import MissingQueryError
+from strawberry.http import GraphQLHTTPResponse, GraphQLRequestData
+from strawberry.http.async_base_view import AsyncHTTPRequestAdapter
+from strawberry.http.exceptions import HTTPException
+from strawberry.schema.exceptions import InvalidOperationTypeError
 from strawberry.types import ExecutionResult
+from strawberry.types.graphql import OperationType
 
-from play_with_gql.users.models import User
+from play_with_gql.api.libraries.loaders import ModelLoaders, with_own_loaders
+from play_with_gql.api.libraries.permissions import PermissionCache
+from play_with_gql.encoders import aiter_encode, encoder_from_settings, has_long_list
+from play_with_gql.incremental import (
+    IncrementalQueryError,
+    execute_incrementally,
+    has_incremental_directives,
+    plan_incremental,
+)
+from play_with_gql.persisted_queries import PersistedQueries, PersistedQueryError
+from play_with_gql.users.auth import aget_request_user
+
+# graphql-over-http incremental delivery (@defer / @stream) 의 multipart 응답
+INCREMENTAL_CONTENT_TYPE = 'multipart/mixed; boundary="-"; deferSpec=20220824'
+INCREMENTAL_PART_HEADER = b"\r\n---\r\nContent-Type: application/json; charset=utf-8\r\n\r\n"
+INCREMENTAL_END = b"\r\n-----\r\n"
 
 
 class AsyncGraphQLView(BaseAsyncGraphQLView):
+    persisted_queries = PersistedQueries.from_settings()
+    encoder = encoder_from_settings()
+
+    # 뷰 인스턴스는 요청마다 만들어지므로 요청 단위 상태를 둔다
+    _request_data: GraphQLRequestData | None = None
+    _incremental: AsyncIterator[dict[str, Any]] | None = None
+    _batch_response: list[GraphQLHTTPResponse] | None = None
+
+    async def execute_operation(self, request: HttpRequest, context, root_value):
+        try:
+            batch = await self._get_batch(request)
+            if batch is not None:
+                return await self._execute_batch(request, batch, context, root_value)
+            if "multipart/mixed" in request.headers.get("Accept", ""):
+                result = await self._execute_incrementally(request, context, root_value)
+                if result is not None:
+                    return result
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryError as error:
+            return self._persisted_query_error(error)
+
+    @staticmethod
+    def _persisted_query_error(error: PersistedQueryError) -> ExecutionResult:
+        # APQ 클라이언트는 200 응답의 errors[].extensions.code 를 보고 쿼리를 다시 보낸다
+        return ExecutionResult(data=None, errors=[GraphQLError(error.message, extensions={"code": error.code})])
+
+    async def _get_batch(self, request: HttpRequest) -> list[dict[str, Any]] | None:
+        """본문이 operation 배열(`[{"query": ...}, ...]`)인 POST 면 그 배열을, 아니면 None 을 돌려준다"""
+        request_adapter = self.request_adapter_class(request)
+        if request_adapter.method != "POST" or "application/json" not in (request_adapter.content_type or ""):
+            return None
+        body = await request_adapter.get_body()
+        if not body.lstrip().startswith("["):
+            return None
+        batch = self.parse_json(body)
+        if not batch or not all(isinstance(item, dict) for item in batch):
+            raise HTTPException(400, "A batch must be a non-empty array of operations")
+        if len(batch) > settings.GRAPHQL_BATCH_MAX_OPERATIONS:
+            raise HTTPException(400, f"A batch can have at most {settings.GRAPHQL_BATCH_MAX_OPERATIONS} operations")
+        return batch
+
+    async def _execute_batch(
+        self, request: HttpRequest, batch: list[dict[str, Any]], context, root_value
+    ) -> ExecutionResult:
+        """배열로 받은 operation 들을 같은 사용자·권한 캐시로 동시에 실행한다
+
+        DataLoader 는 operation 마다 따로 둔다 (같은 경로의 connection 이 다른 인자로 로더를 나눠 쓰지 않도록).
+
+        결과는 self._batch_response 에 요청 순서대로 두고 create_response 가 배열로 응답한다.
+        오류는 operation 별 결과에 따로 남는다.
+        """
+        results = await asyncio.gather(*(self._execute_batched(item, context, root_value) for item in batch))
+        self._batch_response = []
+        for result in results:
+            response_data = await self.process_result(request, result)
+            if result.errors:
+                self._handle_errors(result.errors, response_data)
+            self._batch_response.append(response_data)
+        return ExecutionResult(data=None, errors=None)
+
+    async def _execute_batched(self, item: dict[str, Any], context, root_value) -> ExecutionResult:
+        try:
+            query = await self.persisted_queries.aresolve(item.get("query"), item.get("extensions"))
+            return await self.schema.execute(
+                query,
+                root_value=root_value,
+                variable_values=item.get("variables"),
+                context_value=with_own_loaders(context),
+                operation_name=item.get("operationName"),
+                # subscription 은 웹소켓으로만 받는다
+                allowed_operation_types={OperationType.QUERY, OperationType.MUTATION},
+            )
+        except PersistedQueryError as error:
+            return self._persisted_query_error(error)
+        except MissingQueryError as error:
+            return ExecutionResult(data=None, errors=[GraphQLError(str(error))])
+        except InvalidOperationTypeError as error:
+            return ExecutionResult(data=None, errors=[GraphQLError(error.as_http_error_reason("POST"))])
+
+    async def _execute_incrementally(self, request: HttpRequest, context, root_value) -> ExecutionResult | None:
+        """@defer / @stream 이 있는 쿼리면 처음 응답을 돌려주고 후속 payload 는 self._incremental 에 둔다
+
+        나눌 것이 없거나 본문이 잘못되었으면 None 을 돌려 기본 실행(오류 응답 포함)에 맡긴다.
+        """
+        request_adapter = self.request_adapter_class(request)
+        if request_adapter.method == "GET" and not self.allow_queries_via_get:
+            return None
+        try:
+            request_data = await self.parse_http_body(request_adapter)
+        except (json.JSONDecodeError, KeyError):
+            return None
+        if not has_incremental_directives(request_data.query):
+            return None
+
+        try:
+            plan = plan_incremental(
+                self.schema, request_data.query, request_data.operation_name, request_data.variables
+            )
+        except IncrementalQueryError as error:
+            return ExecutionResult(data=None, errors=error.errors)
+        if plan is None:
+            return None
+
+        result, subsequent = await execute_incrementally(
+            self.schema,
+            plan,
+            variable_values=request_data.variables,
+            context_value=context,
+            root_value=root_value,
+            operation_name=request_data.operation_name,
+        )
+        if result.data is None:
+            # 처음 응답이 실패하면 (검증 오류 등) 후속 payload 없이 한 번에 응답한다
+            await subsequent.aclose()
+        else:
+            self._incremental = subsequent
+        return result
+
+    async def parse_http_body(self, request: AsyncHTTPRequestAdapter) -> GraphQLRequestData:
+        # incremental 판별에서 먼저 파싱했으면 APQ 를 다시 조회하지 않는다
+        if self._request_data is not None:
+            return self._request_data
+        request_data = await super().parse_http_body(request)
+        request_data.query = await self.persisted_queries.aresolve(
+            request_data.query, await self._get_request_extensions(request)
+        )
+        self._request_data = request_data
+        return request_data
+
+    async def _get_request_extensions(self, request: AsyncHTTPRequestAdapter) -> dict | None:
+        if request.method == "GET":
+            extensions = request.query_params.get("extensions")
+            return self.parse_json(extensions) if extensions else None
+
+        if "application/json" not in (request.content_type or ""):
+            return None
+        body = await request.get_body()
+        # 대부분의 요청에는 extensions 가 없으므로 본문을 다시 파싱하지 않는다
+        if '"extensions"' not in body:
+            return None
+        return self.parse_json(body).get("extensions")
+
     async def process_result(self, request: HttpRequest, result: ExecutionResult) -> GraphQLHTTPResponse:
         return await super().process_result(request, result)
 
+    def encode_json(self, data: object) -> bytes:
+        # HttpResponse 는 bytes 를 그대로 쓰므로 str 로 되돌리지 않는다
+        return self.encoder.encode(data)
+
+    def encode_multipart_data(self, data: Any, separator: str) -> str:
+        # HTTP multipart subscription 은 str 조각을 이어 붙인다
+        return f"\r\n--{separator}\r\nContent-Type: application/json\r\n\r\n{self.encoder.encode(data).decode()}\n"
+
+    def create_response(self, response_data: GraphQLHTTPResponse, sub_response: HttpResponse):
+        if self._incremental is not None:
+            return self._streaming_response(
+                self._stream_incremental({**response_data, "hasNext": True}, self._incremental),
+                sub_response,
+                INCREMENTAL_CONTENT_TYPE,
+            )
+        if self._batch_response is not None:
+            response_data = self._batch_response
+        stream_items = settings.GRAPHQL_RESPONSE_STREAM_ITEMS
+        if stream_items is not None and has_long_list(response_data, stream_items):
+            return self._streaming_response(
+                aiter_encode(self.encoder, response_data, stream_items), sub_response, "application/json"
+            )
+        return super().create_response(response_data, sub_response)
+
+    @staticmethod
+    def _streaming_response(
+        content: AsyncIterator[bytes], sub_response: HttpResponse, content_type: str
+    ) -> StreamingHttpResponse:
+        response = StreamingHttpResponse(content)
+        for name, value in sub_response.items():
+            response[name] = value
+        # sub_response 는 JsonResponse 라 Content-Type 을 덮어쓴다
+        response["Content-Type"] = content_type
+        if sub_response.status_code:
+            response.status_code = sub_response.status_code
+        return response
+
+    async def _stream_incremental(
+        self, initial: dict[str, Any], subsequent: AsyncIterator[dict[str, Any]]
+    ) -> AsyncIterator[bytes]:
+        yield INCREMENTAL_PART_HEADER + self.encode_json(initial)
+        try:
+            async for payload in subsequent:
+                yield INCREMENTAL_PART_HEADER + self.encode_json(payload)
+        finally:
+            await subsequent.aclose()
+        yield INCREMENTAL_END
+
     async def get_context(self, request: HttpRequest, response: HttpResponse):
-        # 세션 ID를 쿠키에서 가져옴
-        session_key = request.COOKIES.get("sessionid")
-
-        if session_key:
-            # 세션 스토어 생성
-            session = SessionStore(session_key=session_key)
-
-            # 세션에서 user_id 가져오기
-            user_id = await sync_to_async(session.get)("_auth_user_id")
-
-            if user_id:
-                # user_id로 사용자 조회
-                try:
-                    user = await sync_to_async(User.objects.get)(id=user_id)
-                except User.DoesNotExist:
-                    user = AnonymousUser()
-            else:
-                user = AnonymousUser()
-        else:
-            user = AnonymousUser()
+        user = await aget_request_user(request)
+        # 권한 클래스가 request.user 를 다시 지연 평가(동기 세션·사용자 조회)하지 않도록 해석한 사용자로 바꿔 둔다
+        request.user = user
 
         context = await super().get_context(request, response)
         context.request = request
         context.user = user
+        context.loaders = ModelLoaders()
+        context.permissions = PermissionCache(user)
         return context
@@ -12,5 +12,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "play_with_gql.settings")
+# 커넥션 풀 크기 등 WSGI 프로필 설정을 쓴다
+os.environ.setdefault("PLAY_WITH_GQL_SERVER_PROFILE", "wsgi")
 
 application = get_wsgi_application()